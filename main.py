@@ -1,6 +1,14 @@
 from dify_plugin import Plugin, DifyPluginEnv
 
-plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
+from tools.admission_control import MAX_REQUEST_TIMEOUT
+from tools.connection_warmup import start_background_warmup
+from tools.plugin_metrics import start_metrics_exporter
+
+plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=MAX_REQUEST_TIMEOUT))
 
 if __name__ == '__main__':
+    # 可选：在后台预热 Lakehouse 连接（LAKEHOUSE_WARMUP=true）
+    start_background_warmup()
+    # 可选：导出 Prometheus 指标（LAKEHOUSE_METRICS_PORT / LAKEHOUSE_METRICS_FILE）
+    start_metrics_exporter()
     plugin.run()
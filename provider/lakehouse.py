@@ -2,7 +2,6 @@ from typing import Any
 
 from dify_plugin import ToolProvider
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
-import clickzetta
 
 
 class LakehouseProvider(ToolProvider):
@@ -10,6 +9,9 @@ class LakehouseProvider(ToolProvider):
         """
         验证 Lakehouse 连接凭据
         """
+        # 延迟导入，避免插件启动时加载 clickzetta 及其依赖
+        import clickzetta
+
         try:
             # 检查必需的凭据字段
             required_fields = ["username", "password", "instance", "service", 
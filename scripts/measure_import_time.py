@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+插件模块导入耗时测量脚本
+每个模块在独立的解释器中通过 -X importtime 导入，统计累计耗时，
+并检查是否在导入阶段就加载了 clickzetta / pandas 等重量级依赖
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 需要测量的插件模块
+PLUGIN_MODULES = [
+    "provider.lakehouse",
+    "tools.lakehouse_connection",
+    "tools.connection_warmup",
+    "tools.vector_tool_mixin",
+    "tools.admission_control",
+    "tools.concurrent_execution",
+    "tools.json_codec",
+    "tools.metadata_filter",
+    "tools.ndjson_reader",
+    "tools.plugin_metrics",
+    "tools.progress",
+    "tools.retry",
+    "tools.statement_log",
+    "tools.tool_timing",
+    "tools.vector_encoding",
+    "tools.vector_rerank",
+    "tools.lakehouse_sql_query",
+    "tools.vector_collection_create",
+    "tools.vector_collection_delete",
+    "tools.vector_collection_list",
+    "tools.vector_collection_optimize",
+    "tools.vector_delete",
+    "tools.vector_insert",
+    "tools.vector_ingest_table",
+    "tools.vector_search",
+]
+
+# 不应在导入阶段被加载的重量级依赖
+HEAVY_MODULES = ["clickzetta", "pandas", "numpy"]
+
+# 子进程中执行的探测代码：导入模块后输出已加载的重量级依赖
+PROBE_CODE = """
+import json, sys
+import {module}
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def measure_module(module: str) -> dict:
+    """在独立进程中导入模块并返回耗时（微秒）和已加载的重量级依赖"""
+    code = PROBE_CODE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True
+    )
+
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1:]}
+
+    # -X importtime 输出格式: "import time: self [us] | cumulative | imported package"
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            total_us = int(parts[1])
+
+    heavy_loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith("["):
+            heavy_loaded = json.loads(line)
+
+    return {"module": module, "cumulative_us": total_us, "heavy_loaded": heavy_loaded}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="测量插件模块的导入耗时")
+    parser.add_argument("modules", nargs="*", help="要测量的模块，默认测量所有插件模块")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出结果")
+    args = parser.parse_args()
+
+    results = [measure_module(m) for m in (args.modules or PLUGIN_MODULES)]
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print("⏱️  ClickZetta Dify Plugin 模块导入耗时")
+    print("=" * 70)
+    print(f"{'模块':<36}{'耗时(ms)':>12}  重量级依赖")
+    print("-" * 70)
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<36}{'失败':>12}  {' '.join(r['error'])}")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "-"
+        print(f"{r['module']:<36}{r['cumulative_us'] / 1000:>12.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
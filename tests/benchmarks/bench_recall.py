@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+向量搜索召回率 / 延迟基准
+生成（或加载）向量数据集，用 NumPy 计算精确的最近邻作为基准答案，
+在不同的距离度量、top_k、过滤条件和 HNSW 索引参数下运行 VectorSearchTool，报告 recall@k 和延迟分位数。
+
+默认在嵌入式引擎（lakehouse_engine）上离线运行，此时搜索是精确的，召回率应为 1.0，
+可用于校验工具和基准本身；--target lakehouse 时使用 LAKEHOUSE_* 环境变量中的凭据连接真实实例。
+
+示例：
+    python tests/benchmarks/bench_recall.py --rows 5000 --dimension 128
+    python tests/benchmarks/bench_recall.py --target lakehouse --index-params 16:128,32:256 --output recall.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import dify_plugin  # noqa: F401  需要先于其他网络库导入以完成 gevent monkey patch
+
+from bench_tools import percentile
+from fake_lakehouse import FAKE_CREDENTIALS, FakeLakehouse
+from lakehouse_engine import LakehouseEngine
+from tools.connection_warmup import get_warmup_config
+from tools.lakehouse_connection import LakehouseConnection
+from tools.vector_collection_create import VectorCollectionCreateTool
+from tools.vector_collection_delete import VectorCollectionDeleteTool
+from tools.vector_insert import VectorInsertTool
+from tools.vector_search import VectorSearchTool
+
+INSERT_BATCH_SIZE = 500
+
+
+def make_dataset(rows: int, dimension: int, clusters: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """生成带簇结构的数据集，返回 (向量, 簇标签)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + rng.normal(scale=0.5, size=(rows, dimension))
+    return vectors.astype(np.float32), labels
+
+
+def load_dataset(path: str) -> np.ndarray:
+    """加载 .npy 或 JSON（二维数组）格式的向量"""
+    if path.endswith(".npy"):
+        vectors = np.load(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            vectors = np.asarray(json.load(f))
+    if vectors.ndim != 2:
+        raise ValueError(f"数据集必须是二维数组，实际形状：{vectors.shape}")
+    return vectors.astype(np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """从数据集中抽样并加噪声生成查询向量"""
+    rng = np.random.default_rng(seed + 1)
+    picked = vectors[rng.choice(len(vectors), size=count, replace=False)]
+    return (picked + rng.normal(scale=0.1, size=picked.shape)).astype(np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str,
+                mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """精确计算每个查询的 top_k 行号（按距离升序）"""
+    base = vectors.astype(np.float64)
+    query = queries.astype(np.float64)
+    if metric == "cosine":
+        base_norm = base / np.maximum(np.linalg.norm(base, axis=1, keepdims=True), 1e-12)
+        query_norm = query / np.maximum(np.linalg.norm(query, axis=1, keepdims=True), 1e-12)
+        distances = 1.0 - query_norm @ base_norm.T
+    elif metric == "l2":
+        distances = (np.sum(query ** 2, axis=1)[:, None] - 2 * query @ base.T + np.sum(base ** 2, axis=1)[None, :])
+    else:
+        raise ValueError(f"不支持的距离度量：{metric}")
+    if mask is not None:
+        distances[:, ~mask] = np.inf
+    k = min(k, int(mask.sum()) if mask is not None else len(base))
+    candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, candidates, axis=1).argsort(axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def recall_at_k(found: List[str], expected: List[str]) -> float:
+    if not expected:
+        return 1.0
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def invoke(tool: Any, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """执行一次工具调用，返回最后一条 JSON 消息"""
+    result: Dict[str, Any] = {}
+    for message in tool.invoke(parameters):
+        if message.type.value == "json":
+            result = message.message.json_object
+    if not result.get("success"):
+        raise RuntimeError(f"Tool call failed: {result.get('error') or result}")
+    return result
+
+
+def parse_index_params(value: str) -> List[Tuple[int, int]]:
+    """解析 "m:ef_construction,..." 形式的索引参数"""
+    params = []
+    for item in value.split(","):
+        if item.strip():
+            m, ef_construction = item.split(":")
+            params.append((int(m), int(ef_construction)))
+    return params
+
+
+def prepare_collection(credentials: Dict[str, Any], collection_name: str, vectors: np.ndarray,
+                       labels: np.ndarray, metric: str, m: int, ef_construction: int) -> None:
+    """建表、按指定参数创建 HNSW 索引并分批写入数据"""
+    invoke(VectorCollectionCreateTool.from_credentials(credentials), {
+        "collection_name": collection_name,
+        "dimension": int(vectors.shape[1]),
+        "create_index": False,
+    })
+
+    schema = credentials.get("schema", "dify")
+    connection = LakehouseConnection().get_connection(credentials)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+        CREATE VECTOR INDEX IF NOT EXISTS idx_{collection_name}_vector
+        ON TABLE {schema}.{collection_name}(vector)
+        PROPERTIES (
+            "distance.function" = "{metric}_distance",
+            "scalar.type" = "f32",
+            "m" = "{m}",
+            "ef.construction" = "{ef_construction}"
+        )
+        """)
+
+    insert_tool = VectorInsertTool.from_credentials(credentials)
+    for start in range(0, len(vectors), INSERT_BATCH_SIZE):
+        end = min(start + INSERT_BATCH_SIZE, len(vectors))
+        invoke(insert_tool, {
+            "collection_name": collection_name,
+            "vectors": json.dumps(vectors[start:end].tolist()),
+            "content": json.dumps([f"row {i}" for i in range(start, end)]),
+            "metadata": json.dumps([{"label": f"cluster_{labels[i]}"} for i in range(start, end)]),
+            "ids": json.dumps([f"row_{i}" for i in range(start, end)]),
+        })
+
+
+def measure(credentials: Dict[str, Any], collection_name: str, vectors: np.ndarray, labels: np.ndarray,
+            queries: np.ndarray, metric: str, top_k: int, filter_label: Optional[int]) -> Dict[str, Any]:
+    """对一组查询测量 recall@k 和延迟"""
+    mask = labels == filter_label if filter_label is not None else None
+    truth = exact_top_k(vectors, queries, top_k, metric, mask)
+    search_tool = VectorSearchTool.from_credentials(credentials)
+
+    parameters = {"collection_name": collection_name, "top_k": top_k, "metric_type": metric}
+    if filter_label is not None:
+        parameters["filter_expr"] = f"metadata['label'] = 'cluster_{filter_label}'"
+
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = invoke(search_tool, dict(parameters, query_vectors=json.dumps(query.tolist())))
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = [hit["id"] for hit in result["results"][0]["results"]]
+        recalls.append(recall_at_k(found, [f"row_{i}" for i in expected]))
+
+    return {
+        "metric": metric,
+        "top_k": top_k,
+        "filter": f"label=cluster_{filter_label}" if filter_label is not None else None,
+        "queries": len(queries),
+        "recall_mean": round(statistics.mean(recalls), 4),
+        "recall_min": round(min(recalls), 4),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 3),
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def run_recall_benchmark(vectors: np.ndarray, labels: np.ndarray, queries: np.ndarray, metrics: List[str],
+                         top_ks: List[int], index_params: List[Tuple[int, int]], filter_label: Optional[int],
+                         target: str = "engine", keep: bool = False) -> List[Dict[str, Any]]:
+    """对每个 (索引参数, 度量) 建一个集合，依次测量各 top_k 和过滤条件"""
+    if target == "lakehouse":
+        credentials = get_warmup_config()
+        if credentials is None:
+            raise RuntimeError("缺少 LAKEHOUSE_USERNAME / LAKEHOUSE_PASSWORD / LAKEHOUSE_INSTANCE 环境变量")
+        credentials["schema"] = os.getenv("LAKEHOUSE_SCHEMA", "dify")
+        fake = None
+    else:
+        credentials = dict(FAKE_CREDENTIALS)
+        fake = FakeLakehouse(engine=LakehouseEngine(schemas=(credentials["schema"],))).install()
+
+    results = []
+    try:
+        for m, ef_construction in index_params:
+            for metric in metrics:
+                collection_name = f"recall_bench_{metric}_m{m}_ef{ef_construction}"
+                prepare_collection(credentials, collection_name, vectors, labels, metric, m, ef_construction)
+                try:
+                    for top_k in top_ks:
+                        for label in ([None, filter_label] if filter_label is not None else [None]):
+                            result = measure(credentials, collection_name, vectors, labels, queries,
+                                             metric, top_k, label)
+                            result["index"] = {"m": m, "ef_construction": ef_construction}
+                            results.append(result)
+                            print(f"m={m:<3} ef={ef_construction:<4} {metric:<6} top_k={top_k:<4} "
+                                  f"filter={result['filter'] or '-':<18} recall={result['recall_mean']:.4f} "
+                                  f"p50={result['latency_ms']['p50']:>9.3f}ms", file=sys.stderr)
+                finally:
+                    if not keep:
+                        invoke(VectorCollectionDeleteTool.from_credentials(credentials),
+                               {"collection_name": collection_name, "confirm": True})
+    finally:
+        if fake is not None:
+            fake.uninstall()
+    return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量搜索召回率 / 延迟基准")
+    parser.add_argument("--target", choices=["engine", "lakehouse"], default="engine",
+                        help="engine: 嵌入式引擎离线运行；lakehouse: 使用 LAKEHOUSE_* 环境变量连接真实实例")
+    parser.add_argument("--dataset", help="向量数据集（.npy 或 JSON 二维数组），不指定时随机生成")
+    parser.add_argument("--rows", type=int, default=2000, help="生成的数据行数")
+    parser.add_argument("--dimension", type=int, default=64, help="生成的向量维度")
+    parser.add_argument("--clusters", type=int, default=10, help="生成数据的簇数量，也用作过滤标签")
+    parser.add_argument("--queries", type=int, default=20, help="查询数量")
+    parser.add_argument("--metrics", default="cosine,l2", help="距离度量（逗号分隔）")
+    parser.add_argument("--top-k", default="10,50", help="top_k 取值（逗号分隔）")
+    parser.add_argument("--index-params", default="16:128", help="HNSW 参数 m:ef_construction（逗号分隔）")
+    parser.add_argument("--filter-label", type=int, default=0, help="额外测量按该簇标签过滤的搜索，-1 表示不测")
+    parser.add_argument("--keep", action="store_true", help="保留测试集合")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    if args.dataset:
+        vectors = load_dataset(args.dataset)
+        labels = np.arange(len(vectors)) % args.clusters
+    else:
+        vectors, labels = make_dataset(args.rows, args.dimension, args.clusters, args.seed)
+    queries = make_queries(vectors, min(args.queries, len(vectors)), args.seed)
+
+    results = run_recall_benchmark(
+        vectors, labels, queries,
+        metrics=[m.strip() for m in args.metrics.split(",") if m.strip()],
+        top_ks=[int(k) for k in args.top_k.split(",") if k.strip()],
+        index_params=parse_index_params(args.index_params),
+        filter_label=args.filter_label if args.filter_label >= 0 else None,
+        target=args.target,
+        keep=args.keep,
+    )
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "dataset": {"rows": int(vectors.shape[0]), "dimension": int(vectors.shape[1]), "source": args.dataset or "generated"},
+        "config": vars(args),
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+插件工具离线基准测试
+使用 fake_lakehouse 中的模拟连接器，测量各工具在不同批量大小和向量维度下的延迟与吞吐量，
+结果以 JSON 输出，可与历史结果对比发现性能回退；
+--engine sqlite 时语句由 lakehouse_engine 中的嵌入式引擎真实执行（暴力计算向量距离）
+
+示例：
+    python tests/benchmarks/bench_tools.py --output bench.json
+    python tests/benchmarks/bench_tools.py --engine sqlite --collection-rows 10000 --tools vector_search
+    python tests/benchmarks/bench_tools.py --baseline bench.json --max-regression 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import dify_plugin  # noqa: F401  需要先于其他网络库导入以完成 gevent monkey patch
+
+from fake_lakehouse import FAKE_CREDENTIALS, FakeLakehouse, FakeLakehouseConfig
+from lakehouse_engine import LakehouseEngine
+from tools.lakehouse_sql_query import LakehouseSQLQueryTool
+from tools.vector_collection_list import VectorCollectionListTool
+from tools.vector_delete import VectorDeleteTool
+from tools.vector_insert import VectorInsertTool
+from tools.vector_search import VectorSearchTool
+
+ALL_TOOLS = ["vector_insert", "vector_search", "vector_delete", "vector_collection_list", "lakehouse_sql_query"]
+ENGINES = ["fake", "sqlite"]
+
+
+def random_vectors(count: int, dimension: int, rng: random.Random) -> List[List[float]]:
+    return [[round(rng.uniform(-1, 1), 6) for _ in range(dimension)] for _ in range(count)]
+
+
+def build_scenario(tool_name: str, batch_size: int, dimension: int, rng: random.Random) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+    """返回 (工具类, 工具参数, 模拟连接器配置覆盖项)"""
+    if tool_name == "vector_insert":
+        return VectorInsertTool, {
+            "collection_name": "bench_collection",
+            "vectors": json.dumps(random_vectors(batch_size, dimension, rng)),
+            "content": json.dumps([f"chunk {i} " * 20 for i in range(batch_size)]),
+            "metadata": json.dumps([{"doc_id": f"doc_{i // 10}", "page": i} for i in range(batch_size)]),
+            "auto_id": True,
+        }, {}
+    if tool_name == "vector_search":
+        return VectorSearchTool, {
+            "collection_name": "bench_collection",
+            "query_vectors": json.dumps(random_vectors(batch_size, dimension, rng)),
+            "top_k": 10,
+        }, {}
+    if tool_name == "vector_delete":
+        return VectorDeleteTool, {
+            "collection_name": "bench_collection",
+            "ids": json.dumps([f"id_{i}" for i in range(batch_size)]),
+        }, {}
+    if tool_name == "vector_collection_list":
+        return VectorCollectionListTool, {}, {"collections": [f"collection_{i}" for i in range(batch_size)]}
+    if tool_name == "lakehouse_sql_query":
+        return LakehouseSQLQueryTool, {
+            "query": "SELECT id, page_content, metadata FROM dify.bench_collection",
+            "max_rows": batch_size,
+        }, {"result_rows": batch_size + 1}
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+
+def build_engine(collections: List[str], dimension: int, collection_rows: int, rng: random.Random) -> LakehouseEngine:
+    """创建嵌入式引擎并为每个集合预置 collection_rows 行数据"""
+    engine = LakehouseEngine(schemas=("dify",))
+    for name in collections:
+        engine.execute(f"CREATE TABLE dify.{name} (id STRING NOT NULL, page_content STRING NOT NULL, "
+                       f"metadata JSON, vector VECTOR(FLOAT, {dimension}) NOT NULL, PRIMARY KEY (id))")
+        engine.execute(f"CREATE VECTOR INDEX idx_{name}_vector ON TABLE dify.{name}(vector)")
+        engine.load_vectors("dify", name, [
+            (f"id_{i}", f"chunk {i}", {"doc_id": f"doc_{i // 10}", "page": i}, vector)
+            for i, vector in enumerate(random_vectors(collection_rows, dimension, rng))
+        ])
+    return engine
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def invoke_once(tool: Any, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """执行一次工具调用，返回最后一条 JSON 消息"""
+    result: Dict[str, Any] = {}
+    for message in tool.invoke(dict(parameters, include_timings=True)):
+        if message.type.value == "json":
+            result = message.message.json_object
+    if not result.get("success"):
+        raise RuntimeError(f"Tool call failed: {result.get('error') or result}")
+    return result
+
+
+def run_scenario(tool_name: str, batch_size: int, dimension: int, iterations: int, warmup: int,
+                 base_config: Dict[str, Any], seed: int, engine: str = "fake",
+                 collection_rows: int = 1000) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    tool_class, parameters, overrides = build_scenario(tool_name, batch_size, dimension, rng)
+    config = FakeLakehouseConfig(**dict(base_config, dimension=dimension, **overrides))
+
+    sql_engine = None
+    if engine == "sqlite":
+        # 维度无关的工具仍需一个合法维度来建表
+        sql_engine = build_engine(config.collections, dimension or 8, collection_rows, rng)
+
+    with FakeLakehouse(config, engine=sql_engine) as fake:
+        tool = tool_class.from_credentials(FAKE_CREDENTIALS)
+        for _ in range(warmup):
+            invoke_once(tool, parameters)
+        fake.clear()
+
+        latencies: List[float] = []
+        phases: Dict[str, List[float]] = {}
+        for _ in range(iterations):
+            start = time.perf_counter()
+            result = invoke_once(tool, parameters)
+            latencies.append((time.perf_counter() - start) * 1000)
+            for phase, value in result.get("timings_ms", {}).items():
+                phases.setdefault(phase, []).append(value)
+
+        statements = list(fake.statements)
+
+    total_seconds = sum(latencies) / 1000
+    return {
+        "tool": tool_name,
+        "engine": engine,
+        "batch_size": batch_size,
+        "dimension": dimension,
+        "iterations": iterations,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 3),
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "calls_per_second": round(iterations / total_seconds, 2) if total_seconds else None,
+        "items_per_second": round(iterations * batch_size / total_seconds, 2) if total_seconds else None,
+        "phase_mean_ms": {phase: round(statistics.mean(values), 3) for phase, values in sorted(phases.items())},
+        "statements_per_call": round(len(statements) / iterations, 2),
+        "sql_bytes_per_call": round(sum(len(s.encode("utf-8")) for s in statements) / iterations),
+    }
+
+
+def scenario_key(result: Dict[str, Any]) -> Tuple[str, str, int, int]:
+    return result["tool"], result.get("engine", "fake"), result["batch_size"], result["dimension"]
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """对比 p50 延迟，返回超出允许回退比例的场景"""
+    baseline_results = {scenario_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(scenario_key(result))
+        if not previous:
+            continue
+        before, after = previous["latency_ms"]["p50"], result["latency_ms"]["p50"]
+        change = (after - before) / before if before else 0.0
+        result["baseline_p50_ms"] = before
+        result["p50_change"] = round(change, 4)
+        if change > max_regression:
+            regressions.append(f"{result['tool']} batch={result['batch_size']} dim={result['dimension']}: "
+                               f"p50 {before:.3f}ms -> {after:.3f}ms ({change:+.1%})")
+    return regressions
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="插件工具离线基准测试")
+    parser.add_argument("--tools", default=",".join(ALL_TOOLS), help="要测试的工具（逗号分隔）")
+    parser.add_argument("--batch-sizes", default="1,10,100", help="批量大小（逗号分隔）")
+    parser.add_argument("--dimensions", default="384,1536", help="向量维度（逗号分隔）")
+    parser.add_argument("--iterations", type=int, default=20, help="每个场景的测量次数")
+    parser.add_argument("--warmup", type=int, default=2, help="每个场景的预热次数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="模拟每条语句的服务端延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="模拟延迟的随机抖动（毫秒）")
+    parser.add_argument("--engine", choices=ENGINES, default="fake",
+                        help="fake: 返回合成结果；sqlite: 在嵌入式引擎中真实执行")
+    parser.add_argument("--collection-rows", type=int, default=1000, help="sqlite 引擎下每个集合预置的行数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    parser.add_argument("--baseline", help="用于对比的历史结果 JSON 文件")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的 p50 回退比例（默认 0.2）")
+    args = parser.parse_args()
+
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    base_config = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "seed": args.seed}
+
+    results = []
+    for tool_name in tools:
+        # 只有插入和搜索与向量维度相关
+        dimensions = parse_int_list(args.dimensions) if tool_name in ("vector_insert", "vector_search") else [0]
+        for dimension in dimensions:
+            for batch_size in parse_int_list(args.batch_sizes):
+                result = run_scenario(tool_name, batch_size, dimension, args.iterations, args.warmup,
+                                      base_config, args.seed, args.engine, args.collection_rows)
+                results.append(result)
+                print(f"{tool_name:<24} batch={batch_size:<6} dim={dimension:<6} "
+                      f"p50={result['latency_ms']['p50']:>9.3f}ms  p95={result['latency_ms']['p95']:>9.3f}ms  "
+                      f"{result['items_per_second'] or 0:>12.1f} items/s", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.max_regression)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "config": dict(vars(args), tools=tools),
+        "results": results,
+        "regressions": regressions,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if regressions:
+        print("性能回退:", file=sys.stderr)
+        for line in regressions:
+            print(f"  - {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
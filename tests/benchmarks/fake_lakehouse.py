@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+本地模拟的 Lakehouse 连接器
+替换 clickzetta.connect，记录执行的语句并按语句类型返回合成结果集，可配置延迟，
+用于在没有 Lakehouse 凭据的环境下测量插件工具自身的开销；
+传入 lakehouse_engine.LakehouseEngine 时语句改由嵌入式引擎真实执行
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+
+
+class FakeLakehouseConfig:
+    """模拟连接器的配置"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        schema: str = "dify",
+        collections: Optional[List[str]] = None,
+        dimension: int = 384,
+        row_count: int = 1000,
+        result_rows: int = 100,
+        seed: int = 42
+    ):
+        # 每条语句的固定延迟和随机抖动（毫秒）
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.schema = schema
+        # SHOW TABLES 返回的集合，以及每个集合的维度和行数
+        self.collections = collections if collections is not None else ["bench_collection"]
+        self.dimension = dimension
+        self.row_count = row_count
+        # 普通 SELECT 返回的行数
+        self.result_rows = result_rows
+        self.seed = seed
+
+
+class FakeCursor:
+    """模拟游标：按语句类型生成结果集"""
+
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+        self._rows: List[Tuple] = []
+        self.description: Optional[List[Tuple]] = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._rows = []
+
+    def execute(self, operation: str, parameters=None, binding_params=None):
+        self._connection.before_execute(operation)
+        columns, rows = self._connection.result_for(operation)
+        self.description = [(name, None, None, None, None, None, None) for name in columns] if columns else None
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size: int = 1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+
+class FakeConnection:
+    """模拟连接：记录语句，生成合成结果"""
+
+    def __init__(self, config: FakeLakehouseConfig, statements: List[str]):
+        self.config = config
+        self.statements = statements
+        self._random = random.Random(config.seed)
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+    def before_execute(self, operation: str) -> None:
+        """记录语句并模拟服务端延迟"""
+        self.statements.append(operation)
+        delay = self.config.latency_ms + (random.uniform(0, self.config.jitter_ms) if self.config.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def result_for(self, operation: str) -> Tuple[List[str], List[Tuple]]:
+        """根据语句类型返回 (列名, 行)"""
+        sql = " ".join(operation.split())
+        lowered = sql.lower()
+        config = self.config
+
+        if lowered == "select 1":
+            return ["1"], [(1,)]
+        if lowered.startswith("select current_schema()"):
+            return ["current_schema()"], [(config.schema,)]
+        if lowered.startswith("select current_vcluster()"):
+            return ["current_vcluster()"], [("default_ap",)]
+        if lowered.startswith("desc schema"):
+            return ["info_name", "info_value"], [("name", config.schema)]
+        if lowered.startswith("desc vcluster"):
+            return ["info_name", "info_value"], [
+                ('"name"', '"bench_vcluster"'),
+                ('"vcluster_type"', '"GENERAL"'),
+                ('"state"', '"RUNNING"')
+            ]
+        if lowered.startswith("show tables"):
+            return ["schema_name", "table_name", "is_view", "is_materialized_view", "is_external", "is_dynamic"], [
+                (config.schema, name, "false", "false", "false", "false") for name in config.collections
+            ]
+        if lowered.startswith("show columns"):
+            table = sql.split()[-1].split(".")[-1]
+            return ["schema_name", "table_name", "column_name", "data_type", "comment"], [
+                (config.schema, table, "id", "string", ""),
+                (config.schema, table, "page_content", "string", ""),
+                (config.schema, table, "metadata", "json", ""),
+                (config.schema, table, "vector", f"vector(float,{config.dimension}) not null", "")
+            ]
+        if lowered.startswith("show index"):
+            return ["index_name", "index_type"], [("idx_vector", "vector")]
+        if lowered.startswith("select count(*)"):
+            return ["count(*)"], [(config.row_count,)]
+        if "_distance(" in lowered:
+            return self._search_result(sql)
+        if lowered.startswith("select"):
+            limit = _LIMIT.search(sql)
+            count = min(int(limit.group(1)), config.result_rows) if limit else config.result_rows
+            return ["id", "name", "score"], [(i, f"row_{i}", i * 0.5) for i in range(count)]
+        # INSERT / DELETE / DDL / use vcluster / optimize 等没有结果集
+        return [], []
+
+    def _search_result(self, sql: str) -> Tuple[List[str], List[Tuple]]:
+        limit = _LIMIT.search(sql)
+        top_k = min(int(limit.group(1)) if limit else 10, self.config.row_count)
+        distances = sorted(self._random.random() for _ in range(top_k))
+        rows = [
+            (f"doc_{i}", f"synthetic chunk {i}", json.dumps({"source": "bench", "index": i}), distance)
+            for i, distance in enumerate(distances)
+        ]
+        return ["id", "page_content", "metadata", "distance"], rows
+
+
+class FakeLakehouse:
+    """
+    安装/卸载模拟连接器
+    用法：
+        with FakeLakehouse(FakeLakehouseConfig(latency_ms=5)) as fake:
+            ...调用工具...
+            print(len(fake.statements))
+    """
+
+    def __init__(self, config: Optional[FakeLakehouseConfig] = None, engine: Any = None):
+        self.config = config or FakeLakehouseConfig()
+        # 嵌入式引擎（LakehouseEngine），为空时返回合成结果
+        self.engine = engine
+        self.statements: List[str] = []
+        self._original_connect = None
+        self._installed_module = False
+
+    def connect(self, **kwargs) -> Any:
+        if self.engine is None:
+            return FakeConnection(self.config, self.statements)
+        connection = self.engine.connect(**kwargs)
+        recorder = FakeConnection(self.config, self.statements)
+        connection.before_execute = recorder.before_execute
+        return connection
+
+    def install(self) -> "FakeLakehouse":
+        try:
+            import clickzetta
+        except ImportError:
+            # 没有安装连接器时注册一个只包含 connect 的模块
+            clickzetta = types.ModuleType("clickzetta")
+            clickzetta.Error = Exception
+            sys.modules["clickzetta"] = clickzetta
+            self._installed_module = True
+        self._original_connect = getattr(clickzetta, "connect", None)
+        clickzetta.connect = self.connect
+        self._reset_shared_connection()
+        return self
+
+    def uninstall(self) -> None:
+        if self._installed_module:
+            sys.modules.pop("clickzetta", None)
+        else:
+            import clickzetta
+            clickzetta.connect = self._original_connect
+        self._reset_shared_connection()
+
+    def clear(self) -> None:
+        self.statements.clear()
+
+    @staticmethod
+    def _reset_shared_connection() -> None:
+        from tools.lakehouse_connection import LakehouseConnection
+        LakehouseConnection().close()
+
+    def __enter__(self) -> "FakeLakehouse":
+        return self.install()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.uninstall()
+
+
+FAKE_CREDENTIALS: Dict[str, Any] = {
+    "username": "bench_user",
+    "password": "bench_password",
+    "instance": "bench_instance",
+    "service": "localhost",
+    "workspace": "bench",
+    "vcluster": "default_ap",
+    "schema": "dify",
+}
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+基于 SQLite 的嵌入式 Lakehouse 引擎
+理解插件工具发出的 Lakehouse SQL 子集（VECTOR(...) 字面量、COSINE_DISTANCE / L2_DISTANCE、
+JSON / DATE / TIMESTAMP '...'、metadata['key']、NAMED_STRUCT / TO_JSON / PARSE_JSON、SHOW TABLES/COLUMNS/INDEX、desc schema / vcluster、optimize 等），
+在内存数据库上以暴力计算向量距离的方式执行，用于无网络环境下的端到端正确性和吞吐量测试
+"""
+
+import re
+import json
+import math
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_VECTOR_LITERAL = re.compile(r"\bVECTOR\s*\(\s*([-+0-9.eE,\s]*)\)", re.IGNORECASE)
+_TYPED_LITERAL_KEYWORD = re.compile(r"\b(?:JSON|DATE|TIMESTAMP)\s*$", re.IGNORECASE)
+_SUBSCRIPT_OPEN = re.compile(r"\b(\w+)\s*\[\s*$")
+_SUBSCRIPT_CLOSE = re.compile(r"^\s*\]")
+_QUALIFIED_NAME = r"(\w+)\.(\w+)"
+
+# Lakehouse 列类型到 SQLite 类型的映射（未列出的类型原样保留）
+_SQLITE_TYPES = {"STRING": "TEXT", "JSON": "TEXT", "VECTOR": "TEXT", "BOOLEAN": "INTEGER", "TIMESTAMP": "TEXT", "DATE": "TEXT"}
+
+
+class LakehouseEngineError(Exception):
+    """引擎执行错误，消息格式尽量贴近 Lakehouse"""
+
+
+def _split_literals(sql: str) -> List[Tuple[bool, str]]:
+    """把 SQL 切分为 (是否字符串字面量, 文本) 片段，避免改写字面量内部的内容"""
+    segments = []
+    position = 0
+    for match in _STRING_LITERAL.finditer(sql):
+        if match.start() > position:
+            segments.append((False, sql[position:match.start()]))
+        segments.append((True, match.group(0)))
+        position = match.end()
+    if position < len(sql):
+        segments.append((False, sql[position:]))
+    return segments
+
+
+def _vector_literal(values: str) -> str:
+    numbers = [float(v) for v in values.split(",") if v.strip()]
+    return "'" + json.dumps(numbers) + "'"
+
+
+def translate_sql(sql: str) -> str:
+    """把 Lakehouse 方言翻译为 SQLite 可执行的 SQL"""
+    segments = _split_literals(sql)
+    output: List[str] = []
+    index = 0
+    while index < len(segments):
+        is_literal, text = segments[index]
+        if is_literal:
+            output.append(text)
+            index += 1
+            continue
+
+        text = _VECTOR_LITERAL.sub(lambda m: _vector_literal(m.group(1)), text)
+        following = segments[index + 1] if index + 1 < len(segments) else None
+
+        # metadata['key'] -> json_extract(metadata, '$."key"')
+        subscript = _SUBSCRIPT_OPEN.search(text)
+        after = segments[index + 2] if index + 2 < len(segments) else None
+        if subscript and following and following[0] and after and not after[0] and _SUBSCRIPT_CLOSE.match(after[1]):
+            key = following[1][1:-1].replace("''", "'").replace('"', '\\"')
+            output.append(text[:subscript.start()])
+            output.append(f"json_extract({subscript.group(1)}, '$.\"{key}\"')")
+            segments[index + 2] = (False, _SUBSCRIPT_CLOSE.sub("", after[1], count=1))
+            index += 2
+            continue
+
+        # JSON '...' / DATE '...' / TIMESTAMP '...' -> '...'
+        if following and following[0]:
+            text = _TYPED_LITERAL_KEYWORD.sub("", text)
+        output.append(text)
+        index += 1
+    return "".join(output)
+
+
+def _parse_vector(value: Any) -> Optional[List[float]]:
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+class _VectorCache:
+    """解析后的向量缓存，避免每次距离计算都重新解析 JSON 文本"""
+
+    def __init__(self, capacity: int = 200000):
+        self._capacity = capacity
+        self._items: Dict[str, Any] = {}
+
+    def get(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            vector = _parse_vector(value)
+            return np.asarray(vector, dtype=np.float64) if np is not None and vector is not None else vector
+        vector = self._items.get(value)
+        if vector is None:
+            parsed = _parse_vector(value)
+            vector = np.asarray(parsed, dtype=np.float64) if np is not None else parsed
+            if len(self._items) >= self._capacity:
+                self._items.clear()
+            self._items[value] = vector
+        return vector
+
+
+class LakehouseEngine:
+    """嵌入式 Lakehouse 引擎：每个 schema 对应一个 attach 的内存数据库"""
+
+    def __init__(self, schemas: Tuple[str, ...] = ("dify",), current_schema: str = "dify",
+                 vclusters: Optional[Dict[str, Dict[str, str]]] = None):
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._vectors = _VectorCache()
+        self._db.create_function("COSINE_DISTANCE", 2, self._cosine_distance, deterministic=True)
+        self._db.create_function("L2_DISTANCE", 2, self._l2_distance, deterministic=True)
+        # 源表导入用到的 JSON 构造函数：结构体直接以 JSON 文本表示
+        self._db.create_function("NAMED_STRUCT", -1, self._named_struct, deterministic=True)
+        self._db.create_function("TO_JSON", 1, lambda value: value, deterministic=True)
+        self._db.create_function("PARSE_JSON", 1, lambda value: value, deterministic=True)
+        self.schemas: List[str] = []
+        # (schema, table) -> {"columns": [(名称, 声明类型)], "comments": {列名: 注释}, "indexes": [(名称, 类型, 列)], "properties": 建表尾部子句, "ddl": 建表语句}
+        self.catalog: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.current_schema = current_schema
+        self.vclusters = vclusters or {
+            "default_ap": {"vcluster_type": "ANALYTICS", "state": "RUNNING"},
+            "default": {"vcluster_type": "GENERAL", "state": "RUNNING"},
+        }
+        self.current_vcluster = "default_ap"
+        self.optimized: List[str] = []
+        for schema in schemas:
+            self.create_schema(schema)
+
+    # ------------------------------------------------------------------ 距离函数
+
+    def _cosine_distance(self, left: Any, right: Any) -> Optional[float]:
+        a, b = self._vectors.get(left), self._vectors.get(right)
+        if a is None or b is None:
+            return None
+        if len(a) != len(b):
+            raise LakehouseEngineError(f"Vector dimension mismatch: {len(a)} vs {len(b)}")
+        if np is not None:
+            norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+            return 1.0 - float(np.dot(a, b)) / norm if norm else 1.0
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return 1.0 - dot / norm if norm else 1.0
+
+    def _l2_distance(self, left: Any, right: Any) -> Optional[float]:
+        a, b = self._vectors.get(left), self._vectors.get(right)
+        if a is None or b is None:
+            return None
+        if len(a) != len(b):
+            raise LakehouseEngineError(f"Vector dimension mismatch: {len(a)} vs {len(b)}")
+        if np is not None:
+            return float(np.linalg.norm(a - b))
+        return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+    @staticmethod
+    def _named_struct(*args: Any) -> str:
+        if len(args) % 2:
+            raise LakehouseEngineError("named_struct expects an even number of arguments")
+        return json.dumps(dict(zip(args[0::2], args[1::2])), ensure_ascii=False)
+
+    # ------------------------------------------------------------------ 目录
+
+    def create_schema(self, schema: str) -> None:
+        with self._lock:
+            if schema not in self.schemas:
+                self._db.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+                self.schemas.append(schema)
+
+    def _table_entry(self, schema: str, table: str) -> Dict[str, Any]:
+        entry = self.catalog.get((schema.lower(), table.lower()))
+        if entry is None:
+            raise LakehouseEngineError(f"Table or view not found: {schema}.{table}")
+        return entry
+
+    def _resolve(self, name: str) -> Tuple[str, str]:
+        if "." in name:
+            schema, table = name.split(".", 1)
+            return schema, table
+        return self.current_schema, name
+
+    # ------------------------------------------------------------------ 执行
+
+    def execute(self, sql: str) -> Tuple[List[str], List[Tuple], int]:
+        """执行一条语句，返回 (列名, 行, 影响行数)"""
+        statement = " ".join(sql.strip().rstrip(";").split())
+        lowered = statement.lower()
+        with self._lock:
+            for prefix, handler in self._handlers():
+                if lowered.startswith(prefix):
+                    return handler(statement)
+            return self._run_native(translate_sql(sql))
+
+    def _handlers(self):
+        return [
+            ("select current_schema()", lambda s: (["current_schema()"], [(self.current_schema,)], 1)),
+            ("select current_vcluster()", lambda s: (["current_vcluster()"], [(self.current_vcluster,)], 1)),
+            ("use vcluster", self._use_vcluster),
+            ("desc schema", self._desc_schema),
+            ("describe schema", self._desc_schema),
+            ("desc vcluster", self._desc_vcluster),
+            ("describe vcluster", self._desc_vcluster),
+            ("show tables", self._show_tables),
+            ("show columns", self._show_columns),
+            ("show index", self._show_index),
+            ("show create table", self._show_create_table),
+            ("create vector index", self._create_index),
+            ("create inverted index", self._create_index),
+            ("create table", self._create_table),
+            ("drop table", self._drop_table),
+            ("optimize", self._optimize),
+        ]
+
+    def _run_native(self, sql: str) -> Tuple[List[str], List[Tuple], int]:
+        try:
+            cursor = self._db.execute(sql)
+        except sqlite3.Error as e:
+            message = str(e)
+            if message.startswith("no such table"):
+                raise LakehouseEngineError(f"Table or view not found: {message.split(':', 1)[-1].strip()}") from e
+            raise LakehouseEngineError(message) from e
+        columns = [d[0] for d in cursor.description] if cursor.description else []
+        rows = cursor.fetchall() if columns else []
+        self._db.commit()
+        return columns, rows, len(rows) if columns else cursor.rowcount
+
+    def _use_vcluster(self, statement: str):
+        name = statement.split()[-1]
+        if name.lower() not in {v.lower() for v in self.vclusters}:
+            raise LakehouseEngineError(f"Virtual cluster not found: {name}")
+        self.current_vcluster = name
+        return [], [], 0
+
+    def _desc_schema(self, statement: str):
+        name = statement.split()[-1]
+        if name.lower() not in {s.lower() for s in self.schemas}:
+            raise LakehouseEngineError(f"Schema not found: {name}")
+        tables = sum(1 for schema, _ in self.catalog if schema == name.lower())
+        return ["info_name", "info_value"], [("name", name), ("type", "MANAGED"), ("table_count", str(tables))], 3
+
+    def _desc_vcluster(self, statement: str):
+        name = statement.split()[-1]
+        for vcluster, info in self.vclusters.items():
+            if vcluster.lower() == name.lower():
+                rows = [('"name"', f'"{vcluster}"')] + [(f'"{k}"', f'"{v}"') for k, v in info.items()]
+                return ["info_name", "info_value"], rows, len(rows)
+        raise LakehouseEngineError(f"Virtual cluster not found: {name}")
+
+    def _show_tables(self, statement: str):
+        match = re.match(r"show tables(?: in (\w+))?(?: like '((?:[^']|'')*)')?$", statement, re.IGNORECASE)
+        if not match:
+            raise LakehouseEngineError(f"Syntax error: {statement}")
+        schema = (match.group(1) or self.current_schema).lower()
+        pattern = match.group(2)
+        if schema not in {s.lower() for s in self.schemas}:
+            raise LakehouseEngineError(f"Schema not found: {schema}")
+        rows = []
+        for (table_schema, table), _ in sorted(self.catalog.items()):
+            if table_schema != schema:
+                continue
+            if pattern is not None and not re.fullmatch(pattern.replace("%", ".*").replace("_", "."), table, re.IGNORECASE):
+                continue
+            rows.append((schema, table, "false", "false", "false", "false"))
+        columns = ["schema_name", "table_name", "is_view", "is_materialized_view", "is_external", "is_dynamic"]
+        return columns, rows, len(rows)
+
+    def _show_columns(self, statement: str):
+        schema, table = self._resolve(statement.split()[-1])
+        entry = self._table_entry(schema, table)
+        comments = entry.get("comments", {})
+        rows = [(schema, table, name, declared, comments.get(name.lower(), "")) for name, declared in entry["columns"]]
+        return ["schema_name", "table_name", "column_name", "data_type", "comment"], rows, len(rows)
+
+    def _show_index(self, statement: str):
+        schema, table = self._resolve(statement.split()[-1])
+        entry = self._table_entry(schema, table)
+        rows = [(name, index_type, column) for name, index_type, column in entry["indexes"]]
+        return ["index_name", "index_type", "column_name"], rows, len(rows)
+
+    def _show_create_table(self, statement: str):
+        schema, table = self._resolve(statement.split()[-1])
+        entry = self._table_entry(schema, table)
+        return ["createtab_stmt"], [(entry["ddl"],)], 1
+
+    def _create_index(self, statement: str):
+        match = re.match(
+            rf"create (vector|inverted) index (?:if not exists )?(\w+) on table {_QUALIFIED_NAME}\s*\(\s*(\w+)\s*\)",
+            statement, re.IGNORECASE)
+        if not match:
+            raise LakehouseEngineError(f"Syntax error: {statement}")
+        index_type, name, schema, table, column = match.groups()
+        entry = self._table_entry(schema, table)
+        if column.lower() not in {c.lower() for c, _ in entry["columns"]}:
+            raise LakehouseEngineError(f"Column not found: {column}")
+        if name.lower() not in {i[0].lower() for i in entry["indexes"]}:
+            entry["indexes"].append((name, index_type.lower(), column))
+        return [], [], 0
+
+    def _create_table(self, statement: str):
+        match = re.match(rf"create table (if not exists )?{_QUALIFIED_NAME}\s*\(", statement, re.IGNORECASE)
+        if not match:
+            raise LakehouseEngineError(f"Syntax error: {statement}")
+        if_not_exists, schema, table = match.groups()
+        if schema.lower() not in {s.lower() for s in self.schemas}:
+            raise LakehouseEngineError(f"Schema not found: {schema}")
+
+        body, tail = self._split_parenthesized(statement, match.end() - 1)
+        columns: List[Tuple[str, str]] = []
+        comments: Dict[str, str] = {}
+        sqlite_columns: List[str] = []
+        for definition in self._split_top_level(body):
+            definition = definition.strip()
+            if re.match(r"primary key", definition, re.IGNORECASE):
+                sqlite_columns.append(definition)
+                continue
+            parts = definition.split(None, 1)
+            if len(parts) != 2:
+                raise LakehouseEngineError(f"Syntax error in column definition: {definition}")
+            name, declared = parts
+            comment = re.search(r"\s+comment\s+'((?:[^']|'')*)'", declared, re.IGNORECASE)
+            if comment:
+                comments[name.lower()] = comment.group(1).replace("''", "'")
+                declared = declared[:comment.start()] + declared[comment.end():]
+            base_type = re.match(r"\w+", declared).group(0).upper()
+            columns.append((name, re.sub(r"\s*,\s*", ",", declared.lower())))
+            sqlite_type = _SQLITE_TYPES.get(base_type, base_type)
+            not_null = " NOT NULL" if re.search(r"not null", declared, re.IGNORECASE) else ""
+            default = re.search(r"\bdefault\s+('(?:[^']|'')*'|[-\w.]+)", declared, re.IGNORECASE)
+            default = f" DEFAULT {default.group(1)}" if default else ""
+            sqlite_columns.append(f"{name} {sqlite_type}{not_null}{default}")
+
+        if tail.strip() and not re.match(r"(partitioned by|clustered by|properties|comment)", tail.strip(), re.IGNORECASE):
+            raise LakehouseEngineError(f"Syntax error near: {tail.strip()[:50]}")
+
+        key = (schema.lower(), table.lower())
+        if key in self.catalog:
+            if if_not_exists:
+                return [], [], 0
+            raise LakehouseEngineError(f"Table already exists: {schema}.{table}")
+        self._db.execute(f"CREATE TABLE {schema}.{table} ({', '.join(sqlite_columns)})")
+        self.catalog[key] = {"columns": columns, "comments": comments, "indexes": [], "properties": tail.strip(),
+                             "ddl": statement}
+        return [], [], 0
+
+    def _drop_table(self, statement: str):
+        match = re.match(rf"drop table (if exists )?{_QUALIFIED_NAME}$", statement, re.IGNORECASE)
+        if not match:
+            raise LakehouseEngineError(f"Syntax error: {statement}")
+        if_exists, schema, table = match.groups()
+        key = (schema.lower(), table.lower())
+        if key not in self.catalog:
+            if if_exists:
+                return [], [], 0
+            raise LakehouseEngineError(f"Table or view not found: {schema}.{table}")
+        self._db.execute(f"DROP TABLE {schema}.{table}")
+        del self.catalog[key]
+        return [], [], 0
+
+    def _optimize(self, statement: str):
+        schema, table = self._resolve(statement.split()[-1])
+        self._table_entry(schema, table)
+        self.optimized.append(f"{schema}.{table}@{self.current_vcluster}")
+        return [], [], 0
+
+    @staticmethod
+    def _split_parenthesized(statement: str, open_index: int) -> Tuple[str, str]:
+        """返回从 open_index 处左括号到匹配右括号之间的内容，以及右括号之后的部分"""
+        depth = 0
+        for position in range(open_index, len(statement)):
+            char = statement[position]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    return statement[open_index + 1:position], statement[position + 1:]
+        raise LakehouseEngineError("Syntax error: unbalanced parentheses")
+
+    @staticmethod
+    def _split_top_level(body: str) -> List[str]:
+        parts, depth, current = [], 0, []
+        for char in body:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            if char == "," and depth == 0:
+                parts.append("".join(current))
+                current = []
+            else:
+                current.append(char)
+        if "".join(current).strip():
+            parts.append("".join(current))
+        return parts
+
+    # ------------------------------------------------------------------ 数据加载
+
+    def load_vectors(self, schema: str, table: str, rows: List[Tuple[Any, str, Dict[str, Any], List[float]]]) -> None:
+        """绕过 SQL 直接批量写入 (id, page_content, metadata, vector)，用于准备基准数据"""
+        with self._lock:
+            self._table_entry(schema, table)
+            self._db.executemany(
+                f"INSERT INTO {schema}.{table} (id, page_content, metadata, vector) VALUES (?, ?, ?, ?)",
+                [(row_id, content, json.dumps(metadata, ensure_ascii=False), json.dumps(vector))
+                 for row_id, content, metadata, vector in rows]
+            )
+            self._db.commit()
+
+    # ------------------------------------------------------------------ 连接器接口
+
+    def connect(self, **kwargs) -> "EngineConnection":
+        return EngineConnection(self)
+
+
+class EngineCursor:
+    """DB-API 风格的游标"""
+
+    def __init__(self, connection: "EngineConnection"):
+        self._connection = connection
+        self._rows: List[Tuple] = []
+        self.description: Optional[List[Tuple]] = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._rows = []
+
+    def execute(self, operation: str, parameters=None, binding_params=None):
+        self._connection.before_execute(operation)
+        columns, rows, rowcount = self._connection.engine.execute(operation)
+        self.description = [(name, None, None, None, None, None, None) for name in columns] if columns else None
+        self._rows = list(rows)
+        self.rowcount = rowcount
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size: int = 1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+
+class EngineConnection:
+    """嵌入式引擎的连接；before_execute 可被替换以记录语句或注入延迟"""
+
+    def __init__(self, engine: LakehouseEngine):
+        self.engine = engine
+
+    def before_execute(self, operation: str) -> None:
+        pass
+
+    def cursor(self) -> EngineCursor:
+        return EngineCursor(self)
+
+    def close(self):
+        pass
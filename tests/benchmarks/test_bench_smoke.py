@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+基准测试冒烟测试：使用模拟连接器运行每个工具，确保离线基准可用
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_recall import exact_top_k, make_dataset, make_queries, run_recall_benchmark
+from bench_tools import ALL_TOOLS, compare_with_baseline, run_scenario
+
+
+def test_all_tools_run_offline():
+    """每个工具都能在模拟连接器上成功执行"""
+    
+    print("=== 离线基准冒烟测试 ===")
+    
+    for tool_name in ALL_TOOLS:
+        result = run_scenario(tool_name, batch_size=3, dimension=8, iterations=2, warmup=1,
+                              base_config={}, seed=1)
+        print(f"{tool_name}: p50={result['latency_ms']['p50']}ms, 语句数={result['statements_per_call']}")
+        
+        assert result["iterations"] == 2
+        assert result["statements_per_call"] >= 1
+        assert "total" in result["phase_mean_ms"]
+    
+    print("✅ 所有工具均可离线运行")
+
+
+def test_all_tools_run_on_embedded_engine():
+    """每个工具都能在嵌入式引擎上真实执行"""
+    
+    print("\n=== 嵌入式引擎基准冒烟测试 ===")
+    
+    for tool_name in ALL_TOOLS:
+        result = run_scenario(tool_name, batch_size=3, dimension=8, iterations=2, warmup=1,
+                              base_config={}, seed=1, engine="sqlite", collection_rows=50)
+        print(f"{tool_name}: p50={result['latency_ms']['p50']}ms, 语句数={result['statements_per_call']}")
+        
+        assert result["engine"] == "sqlite"
+        assert result["statements_per_call"] >= 1
+    
+    print("✅ 所有工具均可在嵌入式引擎上运行")
+
+
+def test_recall_harness_offline():
+    """嵌入式引擎是精确搜索，召回率应为 1.0"""
+    
+    print("\n=== 召回率基准冒烟测试 ===")
+    
+    vectors, labels = make_dataset(rows=300, dimension=16, clusters=4, seed=3)
+    queries = make_queries(vectors, 5, seed=3)
+    
+    # 基准答案：查询向量由数据集中的点加噪声得到，最近邻应在同簇中
+    truth = exact_top_k(vectors, queries, 5, "l2")
+    assert truth.shape == (5, 5)
+    
+    results = run_recall_benchmark(vectors, labels, queries, metrics=["cosine", "l2"], top_ks=[5],
+                                   index_params=[(16, 128)], filter_label=1)
+    for result in results:
+        print(f"{result['metric']} filter={result['filter']}: recall={result['recall_mean']}")
+    
+    assert len(results) == 4
+    assert all(result["recall_mean"] == 1.0 for result in results)
+    
+    print("✅ 召回率基准冒烟测试通过")
+
+
+def test_compare_with_baseline():
+    """超过允许比例的 p50 回退会被报告"""
+    
+    print("\n=== 测试基准对比 ===")
+    
+    baseline = {"results": [{"tool": "vector_search", "batch_size": 1, "dimension": 8, "latency_ms": {"p50": 1.0}}]}
+    results = [{"tool": "vector_search", "batch_size": 1, "dimension": 8, "latency_ms": {"p50": 1.5}}]
+    
+    regressions = compare_with_baseline(results, baseline, max_regression=0.2)
+    print(f"回退: {regressions}")
+    
+    assert len(regressions) == 1
+    assert results[0]["p50_change"] == 0.5
+    assert compare_with_baseline(results, baseline, max_regression=0.6) == []
+    
+    print("✅ 基准对比测试通过")
+
+
+if __name__ == "__main__":
+    test_all_tools_run_offline()
+    test_all_tools_run_on_embedded_engine()
+    test_recall_harness_offline()
+    test_compare_with_baseline()
@@ -0,0 +1,851 @@
+#!/usr/bin/env python3
+"""
+嵌入式 Lakehouse 引擎测试：所有工具在内存数据库上端到端执行，并验证结果正确性
+"""
+
+import sys
+import json
+import base64
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import dify_plugin  # noqa: F401
+
+from fake_lakehouse import FAKE_CREDENTIALS, FakeLakehouse
+from lakehouse_engine import LakehouseEngine, LakehouseEngineError, translate_sql
+from tools import progress, retry
+from tools.connection_warmup import warm_up_connection
+from tools.lakehouse_connection import LakehouseConnection
+from tools.plugin_metrics import metrics
+from tools.lakehouse_sql_query import LakehouseSQLQueryTool
+from tools.vector_collection_create import VectorCollectionCreateTool
+from tools.vector_collection_delete import VectorCollectionDeleteTool
+from tools.vector_collection_list import VectorCollectionListTool
+from tools.vector_collection_optimize import VectorCollectionOptimizeTool
+from tools.vector_delete import VectorDeleteTool
+from tools.vector_ingest_table import VectorIngestTableTool
+from tools.vector_insert import VectorInsertTool
+from tools.vector_search import VectorSearchTool
+
+
+def invoke(tool_class, parameters):
+    """调用工具并返回最后一条 JSON 消息"""
+    tool = tool_class.from_credentials(FAKE_CREDENTIALS)
+    result = {}
+    for message in tool.invoke(parameters):
+        if message.type.value == "json":
+            result = message.message.json_object
+    return result
+
+
+def test_translate_sql():
+    """方言翻译只改写字面量之外的部分"""
+
+    print("=== 测试方言翻译 ===")
+
+    sql = ("SELECT COSINE_DISTANCE(vector, VECTOR(1,0.5)) FROM s.t "
+           "WHERE metadata['doc_id'] = 'VECTOR(1)' AND page_content = 'JSON ''x'''")
+    translated = translate_sql(sql)
+    print(f"翻译结果: {translated}")
+
+    assert "'[1.0, 0.5]'" in translated
+    assert "json_extract(metadata, '$.\"doc_id\"') = 'VECTOR(1)'" in translated
+    assert translated.endswith("page_content = 'JSON ''x'''")
+    assert translate_sql("INSERT INTO s.t VALUES (JSON '{\"a\": 1}')") == "INSERT INTO s.t VALUES ('{\"a\": 1}')"
+
+    print("✅ 方言翻译测试通过")
+
+
+def test_tools_end_to_end():
+    """建表、插入、搜索、过滤、删除、列表、优化、查询、删表完整流程"""
+
+    print("\n=== 测试工具端到端流程 ===")
+
+    rng = random.Random(7)
+    dimension = 16
+    vectors = [[rng.uniform(-1, 1) for _ in range(dimension)] for _ in range(50)]
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        result = invoke(VectorCollectionCreateTool, {
+            "collection_name": "docs", "dimension": dimension, "metadata_fields": "category:string"
+        })
+        assert result["success"], result
+
+        result = invoke(VectorInsertTool, {
+            "collection_name": "docs",
+            "vectors": json.dumps(vectors),
+            "content": json.dumps([f"chunk {i}" for i in range(50)]),
+            "metadata": json.dumps([{"doc_id": f"doc_{i % 5}", "page": i} for i in range(50)]),
+            "ids": json.dumps([f"id_{i}" for i in range(50)]),
+        })
+        assert result["success"], result
+        assert result["inserted_count"] == 50
+
+        # 以第 17 个向量查询，最近邻应是它自己
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 5
+        })
+        hits = result["results"][0]["results"]
+        print(f"搜索结果: {[(h['id'], round(h['distance'], 4)) for h in hits]}")
+        assert hits[0]["id"] == "id_17"
+        assert abs(hits[0]["distance"]) < 1e-9
+        assert [h["distance"] for h in hits] == sorted(h["distance"] for h in hits)
+        assert hits[0]["metadata"] == {"doc_id": "doc_2", "page": 17}
+
+        # 多个查询向量并发执行，结果按输入顺序返回
+        query_ids = [3, 41, 17, 8, 29, 0]
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps([vectors[i] for i in query_ids]), "top_k": 1
+        })
+        assert [r["query_index"] for r in result["results"]] == list(range(len(query_ids)))
+        assert [r["results"][0]["id"] for r in result["results"]] == [f"id_{i}" for i in query_ids]
+
+        # 只返回 id 和距离时不拉取 page_content / metadata
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 5, "return_fields": "id"
+        })
+        assert result["return_fields"] == ["id"]
+        assert [set(h) for h in result["results"][0]["results"]] == [{"id", "distance"}] * 5
+        assert "page_content" not in fake.statements[-1] and "metadata" not in fake.statements[-1]
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 1,
+            "return_fields": "metadata", "parse_metadata": False
+        })
+        assert json.loads(result["results"][0]["results"][0]["metadata"]) == {"doc_id": "doc_2", "page": 17}
+        assert "page_content" not in result["results"][0]["results"][0]
+
+        # base64 编码的小端 float32 查询向量与 JSON 查询结果一致
+        encoded = base64.b64encode(struct.pack(f"<{len(vectors[17])}f", *vectors[17])).decode("ascii")
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": encoded, "vector_encoding": "base64_float32", "top_k": 5
+        })
+        assert [h["id"] for h in result["results"][0]["results"]] == [h["id"] for h in hits]
+        nearest = hits
+
+        # 精确重排：嵌入式引擎本身是精确搜索，重排后的顺序应与直接搜索一致
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 5,
+            "rerank": True, "rerank_factor": 3
+        })
+        reranked = result["results"][0]
+        assert reranked["candidate_count"] == 15
+        assert [h["id"] for h in reranked["results"]] == [h["id"] for h in hits]
+        assert "vector" not in reranked["results"][0]
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 5,
+            "mmr": True, "mmr_lambda": 0.3, "rerank_factor": 4
+        })
+        diversified = result["results"][0]
+        assert diversified["results"][0]["id"] == "id_17"
+        assert len(diversified["results"]) == 5
+        assert diversified["redundant_dropped"] == len({h["id"] for h in hits} - {h["id"] for h in diversified["results"]})
+
+        # 非法的 rerank_factor / top_k 返回错误消息，而不是抛出异常
+        tool = VectorSearchTool.from_credentials(FAKE_CREDENTIALS)
+        for bad in ({"rerank": True, "rerank_factor": "abc"}, {"mmr": True, "rerank_factor": 0}, {"top_k": "ten"}):
+            messages = list(tool.invoke({"collection_name": "docs", "query_vectors": json.dumps(vectors[17]),
+                                         "top_k": 5, **bad}))
+            assert [m.type.value for m in messages] == ["text"]
+            assert messages[0].message.text.startswith("错误：") and "必须是正整数" in messages[0].message.text
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 50,
+            "metric_type": "l2", "filter_expr": "metadata['doc_id'] = 'doc_3'"
+        })
+        hits = result["results"][0]["results"]
+        assert len(hits) == 10
+        assert all(h["metadata"]["doc_id"] == "doc_3" for h in hits)
+
+        # 距离阈值在 SQL 中生效：只返回阈值内的行
+        threshold = (nearest[2]["distance"] + nearest[3]["distance"]) / 2
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 10,
+            "min_similarity": 1 - threshold
+        })
+        assert abs(result["distance_threshold"] - threshold) < 1e-12
+        assert [h["id"] for h in result["results"][0]["results"]] == [h["id"] for h in nearest[:3]]
+        assert "<= " in fake.statements[-1]
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "metric_type": "l2",
+            "min_similarity": 0.5
+        })
+        assert result == {}
+
+        # 结构化过滤条件：metadata JSON 字段的相等和数值范围
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "top_k": 50,
+            "metadata_filter": json.dumps({"and": [
+                {"field": "doc_id", "op": "in", "value": ["doc_2", "doc_4"]},
+                {"field": "page", "op": "range", "gte": 10, "lt": 30}
+            ]})
+        })
+        pages = sorted(h["metadata"]["page"] for h in result["results"][0]["results"])
+        assert pages == [12, 14, 17, 19, 22, 24, 27, 29]
+        result = invoke(VectorSearchTool, {
+            "collection_name": "docs", "query_vectors": json.dumps(vectors[17]), "metadata_filter": "{\"bad\": "
+        })
+        assert result == {}
+
+        result = invoke(VectorDeleteTool, {"collection_name": "docs", "filter_expr": "metadata['doc_id'] = 'doc_0'"})
+        assert result["deleted_count"] == 10
+        result = invoke(VectorDeleteTool, {"collection_name": "docs", "ids": json.dumps(["id_1", "missing"])})
+        assert result["deleted_count"] == 1
+
+        result = invoke(VectorCollectionListTool, {})
+        assert result["success"], result
+        collection = result["collections"][0]
+        print(f"集合列表: {collection}")
+        assert collection["name"] == "docs"
+        assert collection["dimension"] == dimension
+        assert collection["vector_count"] == 39
+        assert collection["has_index"]
+
+        result = invoke(VectorCollectionOptimizeTool, {"collection_name": "docs", "optimize_vcluster": "default"})
+        assert result["success"], result
+        assert fake.engine.optimized == ["dify.docs@default"]
+        assert fake.engine.current_vcluster == "default_ap"
+
+        result = invoke(LakehouseSQLQueryTool, {
+            "query": "SELECT metadata['doc_id'] AS doc_id, COUNT(*) AS n FROM dify.docs GROUP BY 1 ORDER BY 1"
+        })
+        assert result["success"], result
+        print(f"SQL 查询结果: {result['data']}")
+        assert result["data"][0] == {"doc_id": "doc_1", "n": 9}
+
+        result = invoke(VectorCollectionDeleteTool, {"collection_name": "docs", "confirm": True})
+        assert result["success"], result
+        assert invoke(VectorCollectionListTool, {})["collections"] == []
+
+        print(f"共执行 {len(fake.statements)} 条语句")
+
+    print("✅ 工具端到端测试通过")
+
+
+def test_typed_columns():
+    """插入时把 metadata 键写入类型化列，结构化过滤优先按列过滤"""
+
+    print("\n=== 测试类型化列 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        result = invoke(VectorCollectionCreateTool, {
+            "collection_name": "typed", "dimension": 2, "create_index": False,
+            "metadata_fields": "category:STRING, page:BIGINT, published:DATE",
+            "partition_by": "category", "cluster_by": "page", "cluster_buckets": 8
+        })
+        assert result["success"], result
+        assert "PARTITIONED BY (category)" in fake.statements[-1]
+        assert "CLUSTERED BY (page) INTO 8 BUCKETS" in fake.statements[-1]
+        assert "PRIMARY KEY (id, category)" in fake.statements[-1]
+
+        result = invoke(VectorCollectionCreateTool, {
+            "collection_name": "bad", "dimension": 2, "metadata_fields": "page:BIGINT", "cluster_by": "missing"
+        })
+        assert result == {}
+
+        result = invoke(VectorInsertTool, {
+            "collection_name": "typed",
+            "vectors": json.dumps([[1, 0], [0, 1], [1, 1]]),
+            "content": json.dumps(["a", "b", "c"]),
+            "metadata": json.dumps([
+                {"Category": "news", "page": 3, "published": "2024-01-02"},
+                {"category": "blog", "page": "x"},
+                {"category": "news", "page": 7, "extra": True},
+            ]),
+            "ids": json.dumps(["a", "b", "c"]),
+        })
+        assert result["success"], result
+        assert result["typed_columns"] == ["category", "page", "published"]
+        assert result["typed_conversion_failures"] == 1
+
+        _, rows, _ = fake.engine.execute("SELECT category, page, published FROM dify.typed ORDER BY id")
+        print(f"类型化列: {rows}")
+        assert rows == [
+            ("news", 3, "2024-01-02"), ("blog", None, None), ("news", 7, None)
+        ]
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "typed", "query_vectors": "[1, 0]",
+            "metadata_filter": json.dumps({"and": [{"category": "news"}, {"field": "page", "op": "gte", "value": 5}]})
+        })
+        assert [h["id"] for h in result["results"][0]["results"]] == ["c"]
+        assert "category = 'news'" in fake.statements[-1]
+        assert "metadata[" not in fake.statements[-1]
+
+        # 用户在已有集合上自行添加的列不是类型化列：写入时不出现在列列表中，NOT NULL 约束和默认值照常生效
+        fake.engine.execute("CREATE TABLE dify.extra (id STRING NOT NULL, page_content STRING NOT NULL, metadata JSON, "
+                            "vector VECTOR(FLOAT, 2) NOT NULL, page BIGINT COMMENT 'dify metadata field', "
+                            "priority INT NOT NULL DEFAULT 5, PRIMARY KEY (id))")
+        fake.clear()
+        result = invoke(VectorInsertTool, {
+            "collection_name": "extra", "vectors": "[[1, 0]]", "content": '["a"]', "ids": '["a"]',
+            "metadata": json.dumps({"page": 2})
+        })
+        assert result["success"], result
+        assert result["typed_columns"] == ["page"]
+        assert "priority" not in fake.statements[-1]
+        _, rows, _ = fake.engine.execute("SELECT page, priority FROM dify.extra")
+        assert rows == [(2, 5)]
+
+    print("✅ 类型化列测试通过")
+
+
+def test_partitioned_collection():
+    """按租户分区的集合：插入写入分区键，搜索和删除只涉及指定分区"""
+
+    print("\n=== 测试分区集合 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        result = invoke(VectorCollectionCreateTool, {
+            "collection_name": "tenants", "dimension": 2, "create_index": False,
+            "metadata_fields": "tenant:STRING", "partition_by": "tenant"
+        })
+        assert result["success"], result
+
+        for tenant, ids in (("t1", ["a", "b"]), ("t2", ["c", "d"])):
+            result = invoke(VectorInsertTool, {
+                "collection_name": "tenants", "vectors": json.dumps([[1, 0], [0.9, 0.1]]),
+                "content": json.dumps(ids), "ids": json.dumps(ids), "partition_value": tenant
+            })
+            assert result["success"], result
+            assert result["partition_column"] == "tenant"
+
+        # 分区集合中缺少分区值的记录在执行前被拒绝
+        result = invoke(VectorInsertTool, {
+            "collection_name": "tenants", "vectors": "[[1, 0]]", "content": '["e"]', "ids": '["e"]'
+        })
+        assert not result["success"]
+        assert "tenant" in result["error"]
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "tenants", "query_vectors": "[1, 0]", "partition_values": '["t2"]'
+        })
+        assert {h["id"] for h in result["results"][0]["results"]} == {"c", "d"}
+        assert result["partition_values"] == ["t2"]
+        assert "tenant IN ('t2')" in fake.statements[-1]
+
+        result = invoke(VectorDeleteTool, {
+            "collection_name": "tenants", "ids": '["a", "c"]', "partition_values": "t1"
+        })
+        assert result["deleted_count"] == 1
+
+        result = invoke(VectorDeleteTool, {"collection_name": "tenants", "partition_values": "t2"})
+        assert result["deleted_count"] == 2
+        assert result["method"] == "partition"
+
+        _, rows, _ = fake.engine.execute("SELECT id FROM dify.tenants")
+        assert rows == [("b",)]
+
+        # 未分区的集合不能按分区搜索
+        invoke(VectorCollectionCreateTool, {"collection_name": "plain", "dimension": 2, "create_index": False})
+        result = invoke(VectorSearchTool, {
+            "collection_name": "plain", "query_vectors": "[1, 0]", "partition_values": "t1"
+        })
+        assert not result["success"]
+
+    print("✅ 分区集合测试通过")
+
+
+def test_ingest_from_table():
+    """INSERT ... SELECT 从源表导入，按 ID 范围分批，按水位增量导入"""
+
+    print("\n=== 测试源表导入 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        fake.engine.execute("CREATE TABLE dify.source_docs (doc_key STRING, body STRING, emb VECTOR(FLOAT, 2), "
+                            "category STRING, seq BIGINT)")
+        for i in range(10):
+            fake.engine.execute(f"INSERT INTO dify.source_docs VALUES ('k{i:02d}', 'text {i}', VECTOR({i + 1},1), "
+                                f"'{'news' if i % 2 else 'blog'}', {i})")
+
+        result = invoke(VectorCollectionCreateTool, {
+            "collection_name": "imported", "dimension": 2, "create_index": False, "metadata_fields": "category:STRING"
+        })
+        assert result["success"], result
+
+        params = {
+            "collection_name": "imported", "source_table": "source_docs", "id_column": "doc_key",
+            "content_column": "body", "vector_column": "emb", "metadata_columns": "category, seq",
+            "watermark_column": "seq", "watermark_from": "", "batch_size": 4
+        }
+        fake.engine.execute("DELETE FROM dify.source_docs WHERE seq >= 8")
+        result = invoke(VectorIngestTableTool, params)
+        print(f"首次导入: {result}")
+        assert result["inserted_count"] == 8
+        assert result["batches"] == 2
+        assert result["next_watermark"] == 7
+        inserts = [s for s in fake.statements if s.startswith("INSERT INTO dify.imported")]
+        assert len(inserts) == 2 and "doc_key <= 'k03'" in inserts[0]
+
+        # 增量导入只处理水位之后的新行
+        for i in (8, 9):
+            fake.engine.execute(f"INSERT INTO dify.source_docs VALUES ('k{i:02d}', 'text {i}', VECTOR({i + 1},1), "
+                                f"'news', {i})")
+        result = invoke(VectorIngestTableTool, dict(params, watermark_from=str(result["next_watermark"])))
+        assert result["inserted_count"] == 2
+        assert result["next_watermark"] == 9
+
+        result = invoke(VectorIngestTableTool, dict(params, watermark_from="9"))
+        assert result["inserted_count"] == 0
+
+        _, rows, _ = fake.engine.execute("SELECT id, page_content, category, metadata FROM dify.imported ORDER BY id")
+        assert len(rows) == 10
+        assert rows[1][:3] == ("k01", "text 1", "news")
+        assert json.loads(rows[1][3]) == {"category": "news", "seq": 1}
+
+        result = invoke(VectorSearchTool, {
+            "collection_name": "imported", "query_vectors": "[10, 1]", "top_k": 1, "metadata_filter": '{"category": "news"}'
+        })
+        assert result["results"][0]["results"][0]["id"] == "k09"
+
+        result = invoke(VectorIngestTableTool, dict(params, id_column="doc_key; DROP TABLE x"))
+        assert result == {}
+
+    print("✅ 源表导入测试通过")
+
+
+def test_incremental_sync():
+    """sync 模式：记录水位，替换变更的行，按删除标记删除"""
+
+    print("\n=== 测试增量同步 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        fake.engine.execute("CREATE TABLE dify.kb_chunks (chunk_id BIGINT, body STRING, emb VECTOR(FLOAT, 2), "
+                            "version BIGINT, deleted BOOLEAN)")
+        fake.engine.execute("INSERT INTO dify.kb_chunks VALUES "
+                            "(1, 'a', VECTOR(1,0), 1, FALSE), (2, 'b', VECTOR(0,1), 2, FALSE), (3, 'c', VECTOR(1,1), 3, FALSE)")
+        invoke(VectorCollectionCreateTool, {"collection_name": "kb", "dimension": 2, "create_index": False})
+
+        params = {
+            "collection_name": "kb", "source_table": "kb_chunks", "id_column": "chunk_id", "content_column": "body",
+            "vector_column": "emb", "watermark_column": "version", "tombstone_column": "deleted",
+            "mode": "sync", "batch_size": 2
+        }
+        result = invoke(VectorIngestTableTool, params)
+        print(f"首次同步: {result}")
+        assert result["inserted_count"] == 3 and result["next_watermark"] == 3
+
+        # 修改 1、删除 2、新增 4；水位从状态表读取
+        fake.engine.execute("UPDATE dify.kb_chunks SET body = 'a2', version = 4 WHERE chunk_id = 1")
+        fake.engine.execute("UPDATE dify.kb_chunks SET deleted = TRUE, version = 5 WHERE chunk_id = 2")
+        fake.engine.execute("INSERT INTO dify.kb_chunks VALUES (4, 'd', VECTOR(2,1), 6, FALSE)")
+        result = invoke(VectorIngestTableTool, params)
+        print(f"增量同步: {result}")
+        assert result["inserted_count"] == 2
+        assert result["deleted_count"] == 1
+        assert result["next_watermark"] == 6
+        assert any(s.startswith("SELECT MAX(version)") and "version > 3" in s for s in fake.statements)
+
+        _, rows, _ = fake.engine.execute("SELECT id, page_content FROM dify.kb ORDER BY id")
+        assert [(int(r[0]), r[1]) for r in rows] == [(1, "a2"), (3, "c"), (4, "d")]
+
+        result = invoke(VectorIngestTableTool, params)
+        assert result["inserted_count"] == 0 and result["next_watermark"] == 6
+
+        # 参数中的起始水位是字符串，按水位列的类型（BIGINT）输出为数字字面量
+        invoke(VectorCollectionCreateTool, {"collection_name": "kb_tail", "dimension": 2, "create_index": False})
+        fake.clear()
+        result = invoke(VectorIngestTableTool, dict(params, collection_name="kb_tail", mode="append",
+                                                    tombstone_column="", watermark_from="5"))
+        print(f"指定起始水位: {result}")
+        assert result["success"] and result["inserted_count"] == 1 and result["next_watermark"] == 6
+        assert any("version > 5" in s for s in fake.statements)
+        assert not any("version > '5'" in s for s in fake.statements)
+        _, rows, _ = fake.engine.execute("SELECT id FROM dify.kb_tail")
+        assert [int(r[0]) for r in rows] == [4]
+
+        result = invoke(VectorIngestTableTool, dict(params, collection_name="kb_tail", mode="append",
+                                                    tombstone_column="", watermark_from="abc"))
+        assert not result["success"] and "水位列 version 的类型" in result["error"]
+
+        # 字符串水位列：状态表中补零的水位按字符串比较，不会被当作数字
+        fake.engine.execute("CREATE TABLE dify.padded (chunk_id BIGINT, body STRING, emb VECTOR(FLOAT, 2), seq STRING)")
+        fake.engine.execute("INSERT INTO dify.padded VALUES (1, 'a', VECTOR(1,0), '0009'), (2, 'b', VECTOR(0,1), '0012')")
+        invoke(VectorCollectionCreateTool, {"collection_name": "kb_padded", "dimension": 2, "create_index": False})
+        padded_params = dict(params, collection_name="kb_padded", source_table="padded", watermark_column="seq",
+                             tombstone_column="")
+        result = invoke(VectorIngestTableTool, padded_params)
+        assert result["inserted_count"] == 2 and result["next_watermark"] == "0012"
+        fake.engine.execute("INSERT INTO dify.padded VALUES (3, 'c', VECTOR(1,1), '0013')")
+        fake.clear()
+        result = invoke(VectorIngestTableTool, padded_params)
+        print(f"字符串水位: {result}")
+        assert result["inserted_count"] == 1 and result["next_watermark"] == "0013"
+        assert any("seq > '0012'" in s for s in fake.statements)
+
+        # 删除标记列只能用于 sync 模式
+        assert invoke(VectorIngestTableTool, dict(params, mode="append")) == {}
+
+    print("✅ 增量同步测试通过")
+
+
+def _serve_file(content: bytes):
+    """在本地 HTTP 服务上提供文件内容，返回 (服务, URL)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/rows.jsonl"
+
+
+def test_insert_from_file():
+    """vector_insert 从 NDJSON 文件流式读取并分批写入"""
+
+    print("\n=== 测试文件输入 ===")
+
+    lines = [json.dumps({"id": f"f{i}", "content": f"text {i}", "metadata": {"page": i}, "vector": [1, i]})
+             for i in range(7)]
+    lines.insert(3, "")
+    lines.append(json.dumps({"content": "auto", "vector": [0, 1]}))
+    server, url = _serve_file(("\n".join(lines) + "\n").encode("utf-8"))
+    file_param = {"dify_model_identity": "__dify__file__", "url": url, "type": "document",
+                  "filename": "rows.jsonl", "extension": ".jsonl", "mime_type": "application/jsonl"}
+    try:
+        with FakeLakehouse(engine=LakehouseEngine()) as fake:
+            invoke(VectorCollectionCreateTool, {"collection_name": "files", "dimension": 2, "create_index": False})
+
+            result = invoke(VectorInsertTool, {
+                "collection_name": "files", "data_file": dict(file_param), "batch_size": 3, "auto_id": True
+            })
+            print(f"文件写入: {result}")
+            assert result["success"], result
+            assert result["inserted_count"] == 8
+            assert result["batches"] == 3
+            assert result["ids"] is None
+            assert len([s for s in fake.statements if s.lstrip().startswith("INSERT INTO dify.files")]) == 3
+
+            _, rows, _ = fake.engine.execute("SELECT id, metadata FROM dify.files WHERE id = 'f4'")
+            assert json.loads(rows[0][1]) == {"page": 4}
+
+            # 缺少 id 且未启用自动生成时报告出错的行号，此前的批次已写入
+            invoke(VectorCollectionCreateTool, {"collection_name": "files2", "dimension": 2, "create_index": False})
+            result = invoke(VectorInsertTool, {
+                "collection_name": "files2", "data_file": dict(file_param), "batch_size": 3
+            })
+            assert not result["success"]
+            assert "第 9 行" in result["error"]
+            assert result["inserted_count"] == 6
+    finally:
+        server.shutdown()
+
+    # 整数 ID 与自动生成的 ID 混合：结果消息只列出生成的 ID，写入成功后不会因为拼接 ID 而报错
+    lines = [json.dumps({"id": i, "content": f"int {i}", "vector": [1, i]}) for i in range(3)]
+    lines.append(json.dumps({"content": "auto", "vector": [0, 1]}))
+    server, url = _serve_file(("\n".join(lines) + "\n").encode("utf-8"))
+    try:
+        with FakeLakehouse(engine=LakehouseEngine()):
+            invoke(VectorCollectionCreateTool, {"collection_name": "int_ids", "dimension": 2, "create_index": False})
+            tool = VectorInsertTool.from_credentials(FAKE_CREDENTIALS)
+            messages = list(tool.invoke({"collection_name": "int_ids", "data_file": dict(file_param, url=url),
+                                         "auto_id": True}))
+            result = messages[-1].message.json_object
+            assert result["success"], result
+            assert result["inserted_count"] == 4
+            summary = [m.message.text for m in messages if m.type.value == "text"][-1]
+            generated = summary.split("生成的 ID: ")[1]
+            assert "," not in generated and len(generated) == 36
+    finally:
+        server.shutdown()
+
+    print("✅ 文件输入测试通过")
+
+
+def test_resumable_insert():
+    """带 ingest_key 的写入：批次检查点、续传跳过已完成的批次、临时错误重试"""
+
+    print("\n=== 测试可续传写入 ===")
+
+    original_delay = retry.RETRY_BASE_DELAY
+    retry.RETRY_BASE_DELAY = 0
+    try:
+        vectors = [[1, i] for i in range(10)]
+        params = {
+            "collection_name": "resumable", "vectors": json.dumps(vectors),
+            "content": json.dumps([f"text {i}" for i in range(10)]), "auto_id": True,
+            "ingest_key": "job-1", "batch_size": 4
+        }
+        with FakeLakehouse(engine=LakehouseEngine()) as fake:
+            invoke(VectorCollectionCreateTool, {"collection_name": "resumable", "dimension": 2, "create_index": False})
+            engine_execute = fake.engine.execute
+            failures = {"fatal": 1, "transient": 0}
+
+            def flaky_execute(sql):
+                if sql.lstrip().startswith("INSERT INTO dify.resumable"):
+                    inserted = engine_execute("SELECT COUNT(*) FROM dify.resumable")[1][0][0]
+                    if inserted == 4 and failures["fatal"]:
+                        failures["fatal"] -= 1
+                        raise LakehouseEngineError("Syntax error")
+                    if failures["transient"]:
+                        failures["transient"] -= 1
+                        raise LakehouseEngineError("Connection reset by peer")
+                return engine_execute(sql)
+
+            fake.engine.execute = flaky_execute
+
+            # 第二批失败：第一批已写入并记录检查点
+            result = invoke(VectorInsertTool, dict(params))
+            print(f"首次写入: {result}")
+            assert not result["success"]
+            assert result["inserted_count"] == 4 and result["resumable"]
+
+            # 使用相同输入重试：跳过第一批，第二批遇到一次临时错误后重试成功
+            failures["transient"] = 1
+            result = invoke(VectorInsertTool, dict(params))
+            print(f"续传写入: {result}")
+            assert result["success"], result
+            assert result["skipped_batches"] == 1
+            assert result["inserted_count"] == 6
+            assert result["retries"] == 1
+            assert len(result["ids"]) == 10
+
+            _, rows, _ = engine_execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM dify.resumable")
+            assert rows == [(10, 10)]
+
+            result = invoke(VectorInsertTool, dict(params))
+            assert result["skipped_batches"] == 3 and result["inserted_count"] == 0
+
+            # 消息中含有类似状态码的数字也不算临时错误，不重试、不重写批次
+            failures["digits"] = 1
+
+            def missing_table_execute(sql):
+                if sql.lstrip().startswith("INSERT INTO dify.resumable") and failures["digits"]:
+                    failures["digits"] -= 1
+                    raise LakehouseEngineError("Table dify.t_4291 not found")
+                return engine_execute(sql)
+
+            fake.engine.execute = missing_table_execute
+            result = invoke(VectorInsertTool, dict(params, ingest_key="job-2"))
+            assert not result["success"] and result["retries"] == 0
+            fake.engine.execute = engine_execute
+
+            # 非法的 max_retries 返回错误提示，而不是抛出异常
+            tool = VectorInsertTool.from_credentials(FAKE_CREDENTIALS)
+            texts = [m.message.text for m in tool.invoke(dict(params, max_retries="three")) if m.type.value == "text"]
+            assert texts == ["错误：max_retries 必须是非负整数：three"]
+    finally:
+        retry.RETRY_BASE_DELAY = original_delay
+
+    print("✅ 可续传写入测试通过")
+
+
+def test_reconnect_on_network_error():
+    """网络中断：幂等语句换用新连接后自动重试，写入语句不重试，语法错误返回错误分类"""
+
+    print("\n=== 测试断线重连 ===")
+
+    original_delay = retry.RETRY_BASE_DELAY
+    retry.RETRY_BASE_DELAY = 0
+    try:
+        with FakeLakehouse(engine=LakehouseEngine()) as fake:
+            invoke(VectorCollectionCreateTool, {"collection_name": "flaky", "dimension": 2, "create_index": False})
+            invoke(VectorInsertTool, {"collection_name": "flaky", "vectors": "[[1, 0], [0, 1]]",
+                                      "content": '["a", "b"]', "ids": '["a", "b"]'})
+            engine_execute = fake.engine.execute
+            failures = {"search": 0, "insert": 0}
+
+            def flaky_execute(sql):
+                if "COSINE_DISTANCE" in sql and failures["search"]:
+                    failures["search"] -= 1
+                    raise LakehouseEngineError("Connection reset by peer")
+                if sql.lstrip().startswith("INSERT INTO dify.flaky") and failures["insert"]:
+                    failures["insert"] -= 1
+                    raise LakehouseEngineError("Connection reset by peer")
+                return engine_execute(sql)
+
+            fake.engine.execute = flaky_execute
+            reconnects = metrics.counter_value("reconnects_total")
+
+            # 搜索语句失败两次：每次都重建连接后重试，结果中给出重试次数
+            failures["search"] = 2
+            result = invoke(VectorSearchTool, {"collection_name": "flaky", "query_vectors": "[1, 0]", "top_k": 1})
+            print(f"重试后的搜索结果: {result}")
+            assert result["success"], result
+            assert result["statement_retries"] == 2
+            assert result["results"][0]["results"][0]["id"] == "a"
+            assert metrics.counter_value("reconnects_total") == reconnects + 2
+
+            # 重试次数耗尽
+            failures["search"] = retry.DEFAULT_MAX_RETRIES + 1
+            result = invoke(VectorSearchTool, {"collection_name": "flaky", "query_vectors": "[1, 0]"})
+            assert not result["success"] and result["error_type"] == "network"
+            failures["search"] = 0
+
+            # 写入语句不自动重试
+            failures["insert"] = 1
+            result = invoke(VectorInsertTool, {"collection_name": "flaky", "vectors": "[[1, 1]]",
+                                               "content": '["c"]', "ids": '["c"]'})
+            assert not result["success"] and result["error_type"] == "network"
+            assert "statement_retries" not in result
+            assert failures["insert"] == 0
+            _, rows, _ = engine_execute("SELECT COUNT(*) FROM dify.flaky")
+            assert rows == [(2,)]
+
+            # 语法错误不重试
+            result = invoke(LakehouseSQLQueryTool, {"query": "SELECT FROM WHERE"})
+            print(f"语法错误: {result}")
+            assert not result["success"] and "statement_retries" not in result
+    finally:
+        retry.RETRY_BASE_DELAY = original_delay
+
+    print("✅ 断线重连测试通过")
+
+
+def test_progress_messages():
+    """分批写入、按 ID 删除和列出集合时逐批产出进度消息"""
+
+    print("\n=== 测试进度消息 ===")
+
+    def invoke_texts(tool_class, parameters):
+        tool = tool_class.from_credentials(FAKE_CREDENTIALS)
+        texts, result = [], {}
+        for message in tool.invoke(parameters):
+            if message.type.value == "text":
+                texts.append(message.message.text)
+            elif message.type.value == "json":
+                result = message.message.json_object
+        return texts, result
+
+    original_interval = progress.PROGRESS_INTERVAL
+    progress.PROGRESS_INTERVAL = 0
+    try:
+        with FakeLakehouse(engine=LakehouseEngine()) as fake:
+            invoke(VectorCollectionCreateTool, {"collection_name": "progress", "dimension": 2, "create_index": False})
+            ids = [f"p{i}" for i in range(10)]
+            texts, result = invoke_texts(VectorInsertTool, {
+                "collection_name": "progress", "vectors": json.dumps([[1, i] for i in range(10)]),
+                "content": json.dumps(ids), "ids": json.dumps(ids), "batch_size": 4
+            })
+            print(f"写入进度: {texts}")
+            assert result["success"] and result["inserted_count"] == 10
+            # 10 行分 3 批，最后一批完成后直接给出结果
+            progress_texts = [t for t in texts if t.startswith("⏳")]
+            assert len(progress_texts) == 2 and texts[:2] == progress_texts
+            assert texts[0].startswith("⏳ 已处理 4 / 10 行（40%），第 1 批")
+            assert "预计剩余" in texts[1] and "8 / 10" in texts[1]
+
+            texts, _ = invoke_texts(VectorInsertTool, {
+                "collection_name": "progress", "vectors": "[[0, 1]]", "content": '["x"]', "ids": '["x"]',
+                "progress": False, "batch_size": 1
+            })
+            assert not any(t.startswith("⏳") for t in texts)
+
+            delete_module = sys.modules[VectorDeleteTool.__module__]
+            original_batch_size = delete_module.DELETE_BATCH_SIZE
+            delete_module.DELETE_BATCH_SIZE = 3
+            engine_execute = fake.engine.execute
+            try:
+                fake.clear()
+                texts, result = invoke_texts(VectorDeleteTool, {"collection_name": "progress", "ids": json.dumps(ids[:7])})
+                statements = list(fake.statements)
+
+                # 分批删除中途失败：结果中报告此前的批次已删除的数量
+                def failing_execute(sql):
+                    if sql.startswith("DELETE") and "'p9'" in sql:
+                        raise LakehouseEngineError("Syntax error")
+                    return engine_execute(sql)
+
+                fake.engine.execute = failing_execute
+                _, failed = invoke_texts(VectorDeleteTool, {"collection_name": "progress", "ids": json.dumps(ids)})
+                assert not failed["success"] and failed["deleted_count"] == 2
+            finally:
+                fake.engine.execute = engine_execute
+                delete_module.DELETE_BATCH_SIZE = original_batch_size
+            print(f"删除进度: {texts}")
+            assert result["success"] and result["deleted_count"] == 7
+            assert sum(1 for sql in statements if sql.startswith("DELETE")) == 3
+            # 统计也按批进行，不会对全部 ID 拼出一条 IN (...)
+            count_statements = [sql for sql in statements if sql.startswith("SELECT COUNT(*)")]
+            assert len(count_statements) == 3 and all(sql.count("'p") <= 3 for sql in count_statements)
+            assert [t[:20] for t in texts if t.startswith("⏳")] == ["⏳ 已处理 3 / 7 个 ID（42%", "⏳ 已处理 6 / 7 个 ID（85%"]
+
+            for name in ("progress_b", "progress_c"):
+                invoke(VectorCollectionCreateTool, {"collection_name": name, "dimension": 2, "create_index": False})
+            texts, result = invoke_texts(VectorCollectionListTool, {})
+            print(f"列表进度: {texts[:-1]}")
+            assert result["total_count"] == 3
+            assert texts[0].startswith("⏳ 已检查 1 / 3 张表（33%），找到 1 个向量集合")
+    finally:
+        progress.PROGRESS_INTERVAL = original_interval
+
+    print("✅ 进度消息测试通过")
+
+
+def test_liveness_probe_for_writes():
+    """只读工具可以跳过近期确认过的存活检查，写入类工具总是先检查，避免写入语句落在已断开的连接上"""
+
+    print("\n=== 测试写入前的存活检查 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()) as fake:
+        invoke(VectorCollectionCreateTool, {"collection_name": "probe", "dimension": 2, "create_index": False})
+        invoke(VectorInsertTool, {"collection_name": "probe", "vectors": "[[1, 0]]", "content": '["a"]', "ids": '["a"]'})
+
+        def probes():
+            return sum(1 for sql in fake.statements if sql.strip().lower() == "select 1")
+
+        fake.clear()
+        invoke(VectorSearchTool, {"collection_name": "probe", "query_vectors": "[1, 0]"})
+        invoke(VectorCollectionListTool, {})
+        assert probes() == 0
+
+        fake.clear()
+        result = invoke(VectorDeleteTool, {"collection_name": "probe", "ids": '["a"]'})
+        assert result["success"] and probes() == 1
+        invoke(VectorInsertTool, {"collection_name": "probe", "vectors": "[[0, 1]]", "content": '["b"]', "ids": '["b"]'})
+        assert probes() == 2
+
+    print("✅ 写入前的存活检查测试通过")
+
+
+def test_connection_follows_call_config():
+    """预热用环境变量凭据建立的连接指向其他实例时，工具调用按自己的凭据重新连接，不复用预热的连接和元数据缓存"""
+
+    print("\n=== 测试连接配置变化 ===")
+
+    with FakeLakehouse(engine=LakehouseEngine()):
+        warm_up_connection(dict(FAKE_CREDENTIALS, instance="env_instance", workspace="env_workspace"))
+        conn_manager = LakehouseConnection()
+        assert conn_manager._connection_identity[1:3] == ("env_instance", "env_workspace")
+        assert conn_manager._metadata_cache
+
+        created = metrics.counter_value("connections_created_total")
+        result = invoke(VectorCollectionListTool, {})
+        assert result["success"]
+        assert metrics.counter_value("connections_created_total") == created + 1
+        assert conn_manager._connection_identity[1:3] == ("bench_instance", "bench")
+
+        # 配置相同的调用继续复用连接
+        invoke(VectorCollectionListTool, {})
+        assert metrics.counter_value("connections_created_total") == created + 1
+
+    print("✅ 连接配置变化测试通过")
+
+
+if __name__ == "__main__":
+    test_translate_sql()
+    test_tools_end_to_end()
+    test_typed_columns()
+    test_partitioned_collection()
+    test_ingest_from_table()
+    test_incremental_sync()
+    test_insert_from_file()
+    test_resumable_insert()
+    test_reconnect_on_network_error()
+    test_progress_messages()
+    test_liveness_probe_for_writes()
+    test_connection_follows_call_config()
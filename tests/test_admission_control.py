@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+测试按 vcluster 的语句准入控制
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.admission_control import AdmissionController, AdmissionRejected
+from tools.plugin_metrics import metrics
+
+
+def test_queue_full_rejected():
+    """名额用满后排队，队列已满时立即拒绝；不同 vcluster 互不影响"""
+
+    print("=== 测试队列已满时拒绝 ===")
+
+    controller = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=5)
+    controller.acquire("ap")
+
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.acquire("ap")))
+    waiter.start()
+    while controller._slots_for("ap").queued == 0:
+        time.sleep(0.001)
+
+    rejections = metrics.counter_value("admission_rejections_total", vcluster="ap", reason="queue_full")
+    start = time.monotonic()
+    try:
+        controller.acquire("ap")
+        assert False, "队列已满时应拒绝"
+    except AdmissionRejected as e:
+        print(f"拒绝信息: {e}")
+        assert e.reason == "queue_full" and "ap" in str(e)
+    assert time.monotonic() - start < 0.5
+    assert metrics.counter_value("admission_rejections_total", vcluster="ap", reason="queue_full") == rejections + 1
+
+    # 其他 vcluster 不受影响
+    assert controller.acquire("gp") == 0.0
+    controller.release("gp")
+
+    # 释放名额后排队的语句获得执行
+    time.sleep(0.05)
+    controller.release("ap")
+    waiter.join(2)
+    assert len(admitted) == 1 and admitted[0] >= 0.05
+    controller.release("ap")
+    assert controller._slots_for("ap").in_flight == 0
+
+    print("✅ 队列已满拒绝测试通过")
+
+
+def test_queue_timeout():
+    """排队超过期限时放弃，不占用名额"""
+
+    print("\n=== 测试排队超时 ===")
+
+    controller = AdmissionController(max_in_flight=1, max_queued=10, queue_timeout=5)
+    controller.acquire("ap")
+    try:
+        controller.acquire("ap", timeout=0.05)
+        assert False, "排队超时应拒绝"
+    except AdmissionRejected as e:
+        assert e.reason == "timeout"
+    slots = controller._slots_for("ap")
+    assert slots.in_flight == 1 and slots.queued == 0
+    controller.release("ap")
+
+    # 不限制并发时直接通过
+    unlimited = AdmissionController(max_in_flight=0)
+    for _ in range(100):
+        assert unlimited.acquire("ap") == 0.0
+
+    print("✅ 排队超时测试通过")
+
+
+def test_max_in_flight():
+    """并发执行数不超过上限"""
+
+    print("\n=== 测试并发上限 ===")
+
+    controller = AdmissionController(max_in_flight=3, max_queued=100, queue_timeout=5)
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def statement():
+        with controller.admit("ap"):
+            with lock:
+                state["current"] += 1
+                state["peak"] = max(state["peak"], state["current"])
+            time.sleep(0.01)
+            with lock:
+                state["current"] -= 1
+
+    threads = [threading.Thread(target=statement) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    print(f"峰值并发: {state['peak']}")
+    assert state["peak"] == 3
+    assert controller._slots_for("ap").in_flight == 0
+
+    print("✅ 并发上限测试通过")
+
+
+if __name__ == "__main__":
+    test_queue_full_rejected()
+    test_queue_timeout()
+    test_max_in_flight()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试共享执行器上的并发任务执行
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.concurrent_execution import run_concurrently
+from tools.tool_timing import ToolTimer, current_timer, timed_phase, use_timer
+
+
+def test_run_concurrently():
+    """结果按输入顺序返回，并发数不超过上限，任务中可以取到调用方的计时器"""
+
+    print("=== 测试并发执行 ===")
+
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+    timer = ToolTimer("vector_search")
+
+    def task(value):
+        def run():
+            assert current_timer() is timer
+            with lock:
+                state["current"] += 1
+                state["peak"] = max(state["peak"], state["current"])
+            # 越靠前的任务越晚结束
+            time.sleep(0.002 * (10 - value))
+            with lock:
+                state["current"] -= 1
+            return value * value
+        return run
+
+    with use_timer(timer):
+        results = run_concurrently([task(i) for i in range(10)], max_concurrency=3)
+    print(f"结果: {results}, 峰值并发: {state['peak']}")
+    assert results == [i * i for i in range(10)]
+    assert 1 < state["peak"] <= 3
+    assert current_timer() is None
+
+    assert run_concurrently([]) == []
+    assert run_concurrently([lambda: 1, lambda: 2], max_concurrency=1) == [1, 2]
+
+    print("✅ 并发执行测试通过")
+
+
+def test_run_concurrently_error():
+    """任务失败后不再启动新任务，已启动的任务结束后抛出异常"""
+
+    print("\n=== 测试并发执行失败 ===")
+
+    started = []
+
+    def task(value):
+        def run():
+            started.append(value)
+            if value == 1:
+                raise ValueError("bad query")
+            time.sleep(0.01)
+            return value
+        return run
+
+    try:
+        run_concurrently([task(i) for i in range(20)], max_concurrency=2)
+        assert False, "任务失败时应抛出异常"
+    except ValueError as e:
+        assert str(e) == "bad query"
+    print(f"已启动的任务: {sorted(started)}")
+    assert len(started) < 20
+
+    print("✅ 并发执行失败测试通过")
+
+
+
+def test_concurrent_phase_timings():
+    """并发任务中的阶段记为 <阶段>_cumulative，并发部分按墙钟时间记一次，阶段耗时之和不超过总耗时"""
+
+    print("\n=== 测试并发任务的耗时统计 ===")
+
+    timer = ToolTimer("vector_search")
+
+    def task():
+        with timed_phase("execute"):
+            time.sleep(0.02)
+        for _ in range(100):
+            timer.count_retry()
+
+    with use_timer(timer):
+        run_concurrently([task] * 4, max_concurrency=4)
+    timings = timer.timings_ms()
+    print(f"耗时: {timings}")
+    assert "execute" not in timings
+    assert timings["execute_cumulative"] >= 80
+    assert timings["concurrent"] < timings["execute_cumulative"]
+    assert sum(v for k, v in timings.items() if k != "total" and not k.endswith("_cumulative")) <= timings["total"]
+    assert timer.statement_retries == 400
+
+    print("✅ 并发任务的耗时统计测试通过")
+
+
+if __name__ == "__main__":
+    test_run_concurrently()
+    test_run_concurrently_error()
+    test_concurrent_phase_timings()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+测试导入耗时脚本覆盖全部插件模块
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from measure_import_time import PLUGIN_MODULES, measure_module
+
+
+def test_plugin_modules_complete():
+    """tools 下新增的模块都要加入 PLUGIN_MODULES，否则导入阶段加载重量级依赖时无法发现"""
+
+    print("=== 测试导入耗时脚本的模块列表 ===")
+
+    modules = {f"tools.{path.stem}" for path in (PROJECT_ROOT / "tools").glob("*.py") if path.stem != "__init__"}
+    missing = sorted(modules - set(PLUGIN_MODULES))
+    print(f"未覆盖的模块: {missing}")
+    assert not missing
+
+    print("✅ 导入耗时脚本模块列表测试通过")
+
+
+def test_light_modules_skip_heavy_dependencies():
+    """不依赖 dify_plugin 的公共模块导入时不加载 clickzetta / pandas / numpy"""
+
+    print("\n=== 测试公共模块的导入 ===")
+
+    for module in ("tools.json_codec", "tools.vector_encoding", "tools.vector_rerank", "tools.ndjson_reader"):
+        result = measure_module(module)
+        print(f"{module}: {result}")
+        assert "error" not in result and result["heavy_loaded"] == []
+
+    print("✅ 公共模块的导入测试通过")
+
+
+if __name__ == "__main__":
+    test_plugin_modules_complete()
+    test_light_modules_skip_heavy_dependencies()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试可插拔的 JSON 编解码层
+"""
+
+import os
+import sys
+import importlib
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools import json_codec
+
+
+def _with_backend(name):
+    """按指定后端重新加载 json_codec，返回实际使用的模块"""
+    os.environ["LAKEHOUSE_JSON_BACKEND"] = name
+    try:
+        return importlib.reload(json_codec)
+    finally:
+        os.environ.pop("LAKEHOUSE_JSON_BACKEND", None)
+
+
+def test_backends_round_trip():
+    """各后端的解析和序列化结果一致，未安装的后端回退到标准库"""
+
+    print("=== 测试 JSON 后端 ===")
+
+    try:
+        for name in json_codec.JSON_BACKENDS:
+            codec = _with_backend(name)
+            print(f"{name} -> {codec.BACKEND}")
+
+            metadata = {"title": "文档'1", "page": 3, "tags": ["a", "b"], "ok": True, "score": 0.5}
+            text = codec.dumps(metadata)
+            assert "文档" in text
+            assert codec.loads(text) == metadata
+            assert codec.loads(codec.dumps({1: "x"})) == {"1": "x"}
+
+            try:
+                codec.loads("{bad")
+                assert False, "格式错误时应抛出 ValueError"
+            except ValueError:
+                pass
+    finally:
+        importlib.reload(json_codec)
+
+    print("✅ JSON 后端测试通过")
+
+
+def test_float_array_fast_path():
+    """向量解析：单个向量、向量数组以及元素为 JSON 字符串的数组"""
+
+    print("\n=== 测试向量解析 ===")
+
+    try:
+        for name in ("json", json_codec.JSON_BACKENDS[0]):
+            codec = _with_backend(name)
+            assert codec.loads_float_array("[0.5, -1, 2e-3]") == [0.5, -1.0, 0.002]
+            assert codec.loads_float_array(b"[1,2]") == [1.0, 2.0]
+            assert codec.loads_float_array("[]") == []
+            assert codec.loads_float_array("[ 0 , -0.0 ,1E+2]") == [0.0, 0.0, 100.0]
+            assert codec.loads_vectors("[0.1, 0.2]") == [[0.1, 0.2]]
+            assert codec.loads_vectors("[[1, 2], [3, 4]]") == [[1.0, 2.0], [3.0, 4.0]]
+            assert codec.loads_vectors(["[1, 2]", "[3, 4]"]) == [[1.0, 2.0], [3.0, 4.0]]
+
+            # 非法的 JSON 数字和非有限值不能进入快速路径，也不能写入数据库
+            for bad in ('[1, "x"]', "[1, [2]]", "[1_000, 2]", "[nan, 1]", "[inf]", "[Infinity, 1]", "[NaN]",
+                        "[1e999]", "[+1, 2]", "[.5]"):
+                try:
+                    codec.loads_float_array(bad)
+                    assert False, f"{bad} 应解析失败"
+                except (TypeError, ValueError):
+                    pass
+    finally:
+        importlib.reload(json_codec)
+
+    print("✅ 向量解析测试通过")
+
+
+if __name__ == "__main__":
+    test_backends_round_trip()
+    test_float_array_fast_path()
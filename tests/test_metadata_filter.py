@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试结构化过滤条件的编译
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.metadata_filter import FilterError, compile_filter, parse_filter, typed_column_literal
+
+
+def test_compile_prefers_typed_columns():
+    """类型化列直接过滤，其余字段读取 metadata JSON，数字比较显式转换类型"""
+    
+    print("=== 测试过滤条件编译 ===")
+    
+    spec = parse_filter('''{"and": [
+        {"field": "category", "op": "eq", "value": "news"},
+        {"field": "page", "op": "range", "gte": 1, "lt": 10},
+        {"or": [{"field": "lang", "op": "in", "value": ["zh", "en"]}, {"not": {"field": "id", "value": "x"}}]}
+    ]}''')
+    compiled = compile_filter(spec, {"category": "string"})
+    print(f"SQL: {compiled.sql}")
+    print(f"参数: {compiled.params}")
+    
+    assert compiled.sql == (
+        "(category = ? AND (CAST(metadata[?] AS DOUBLE) >= ? AND CAST(metadata[?] AS DOUBLE) < ?) "
+        "AND (metadata[?] IN (?, ?) OR NOT (id = ?)))"
+    )
+    assert compiled.params == ["news", "page", 1, "page", 10, "lang", "zh", "en", "x"]
+    assert compiled.typed_fields == ["category", "id"]
+    assert compiled.metadata_fields == ["page", "lang"]
+    
+    print("✅ 过滤条件编译测试通过")
+
+
+def test_render_escapes_literals():
+    """值中的引号、反斜杠和问号不会破坏语句"""
+    
+    print("\n=== 测试字面量转义 ===")
+    
+    compiled = compile_filter({"title": "it's a ? \\", "flag": True, "tags": ["a", "b"]})
+    rendered = compiled.render()
+    print(f"渲染结果: {rendered}")
+    
+    assert rendered == (
+        "(metadata['title'] = 'it''s a ? \\\\' AND CAST(metadata['flag'] AS BOOLEAN) = TRUE "
+        "AND metadata['tags'] IN ('a', 'b'))"
+    )
+    assert compile_filter({"field": "deleted_at", "op": "eq", "value": None}).render() == "metadata['deleted_at'] IS NULL"
+    
+    print("✅ 字面量转义测试通过")
+
+
+def test_invalid_filters():
+    """无效的条件给出明确错误"""
+    
+    print("\n=== 测试无效过滤条件 ===")
+    
+    invalid = [
+        "not json",
+        "[1, 2]",
+        {"field": "page", "op": "like", "value": "x"},
+        {"field": "page", "op": "in", "value": []},
+        {"field": "page", "op": "range"},
+        {"field": "page", "value": {"nested": 1}},
+        {"and": []},
+        {"field": "vector", "value": "x"},
+        {"field": "bad name", "value": "x"},
+    ]
+    for spec in invalid:
+        try:
+            compile_filter(parse_filter(spec), {"bad name": "string"})
+        except FilterError as e:
+            print(f"  {spec!r}: {e}")
+        else:
+            assert False, f"应当拒绝：{spec!r}"
+    
+    assert parse_filter("") is None
+    
+    print("✅ 无效过滤条件测试通过")
+
+
+def test_typed_column_literal():
+    """metadata 值按类型化列的类型转换为字面量"""
+    
+    print("\n=== 测试类型化列字面量 ===")
+    
+    assert typed_column_literal("42", "bigint") == "42"
+    assert typed_column_literal(2.5, "double") == "2.5"
+    assert typed_column_literal("it's", "string") == "'it''s'"
+    assert typed_column_literal(True, "string") == "'true'"
+    assert typed_column_literal("true", "boolean") == "TRUE"
+    assert typed_column_literal("2024-01-02", "date") == "DATE '2024-01-02'"
+    assert typed_column_literal(None, "bigint") == "NULL"
+    
+    for value, data_type in (("x", "bigint"), (1.5, "int"), (True, "double"), ("yes", "boolean"), (20240102, "date")):
+        try:
+            typed_column_literal(value, data_type)
+        except ValueError:
+            pass
+        else:
+            assert False, f"应当拒绝：{value!r} -> {data_type}"
+    
+    print("✅ 类型化列字面量测试通过")
+
+
+if __name__ == "__main__":
+    test_compile_prefers_typed_columns()
+    test_render_escapes_literals()
+    test_invalid_filters()
+    test_typed_column_literal()
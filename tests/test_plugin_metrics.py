@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试插件指标聚合与 Prometheus 文本导出
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.plugin_metrics import METRIC_DEFINITIONS, LatencyHistogram, MetricsRegistry
+
+
+def test_latency_histogram():
+    """测试直方图分桶"""
+    
+    print("=== 测试延迟直方图 ===")
+    
+    histogram = LatencyHistogram(buckets=(10, 100))
+    for value in [1, 10, 50, 1000]:
+        histogram.observe(value)
+    
+    snapshot = histogram.snapshot()
+    print(f"直方图快照: {snapshot}")
+    
+    # 桶上界包含等于的值：1、10 -> 第一个桶，50 -> 第二个桶，1000 -> +Inf
+    assert snapshot["counts"] == [2, 1, 1]
+    assert snapshot["count"] == 4
+    assert snapshot["sum_ms"] == 1061
+    
+    print("✅ 延迟直方图测试通过")
+
+
+def test_counters_and_gauges():
+    """测试计数器按标签累加"""
+    
+    print("\n=== 测试计数器 ===")
+    
+    registry = MetricsRegistry()
+    registry.inc("tool_calls_total", tool="vector_search")
+    registry.inc("tool_calls_total", tool="vector_search")
+    registry.inc("rows_inserted_total", 100, tool="vector_insert")
+    
+    assert registry.counter_value("tool_calls_total", tool="vector_search") == 2
+    assert registry.counter_value("rows_inserted_total", tool="vector_insert") == 100
+    assert registry.counter_value("tool_calls_total", tool="vector_insert") == 0
+    
+    print("✅ 计数器测试通过")
+
+
+def test_render_prometheus():
+    """测试 Prometheus 文本格式"""
+    
+    print("\n=== 测试 Prometheus 导出 ===")
+    
+    registry = MetricsRegistry()
+    registry.inc("tool_calls_total", tool="vector_search")
+    registry.add_gauge("tool_in_flight", 1, tool="vector_search")
+    registry.observe("tool_phase_duration_milliseconds", 42, tool="vector_search", phase="execute")
+    
+    text = registry.render_prometheus()
+    print(text)
+    
+    assert "# TYPE clickzetta_dify_tool_calls_total counter" in text
+    assert 'clickzetta_dify_tool_calls_total{tool="vector_search"} 1' in text
+    assert 'clickzetta_dify_tool_in_flight{tool="vector_search"} 1' in text
+    assert 'clickzetta_dify_tool_phase_duration_milliseconds_bucket{phase="execute",tool="vector_search",le="25"} 0' in text
+    assert 'clickzetta_dify_tool_phase_duration_milliseconds_bucket{phase="execute",tool="vector_search",le="50"} 1' in text
+    assert 'clickzetta_dify_tool_phase_duration_milliseconds_bucket{phase="execute",tool="vector_search",le="+Inf"} 1' in text
+    assert 'clickzetta_dify_tool_phase_duration_milliseconds_count{phase="execute",tool="vector_search"} 1' in text
+    
+    print("✅ Prometheus 导出测试通过")
+
+
+def test_admission_metric_types():
+    """准入控制指标按声明的类型导出，直方图不落入 untyped"""
+    
+    print("\n=== 测试准入控制指标类型 ===")
+    
+    registry = MetricsRegistry()
+    registry.add_gauge("admission_in_flight", 1, vcluster="default_ap")
+    registry.add_gauge("admission_queued", 2, vcluster="default_ap")
+    registry.observe("admission_wait_milliseconds", 30, vcluster="default_ap")
+    registry.inc("admission_rejections_total", vcluster="default_ap", reason="queue_full")
+    
+    text = registry.render_prometheus()
+    assert "untyped" not in text
+    assert "# TYPE clickzetta_dify_admission_in_flight gauge" in text
+    assert "# TYPE clickzetta_dify_admission_queued gauge" in text
+    assert "# TYPE clickzetta_dify_admission_wait_milliseconds histogram" in text
+    assert "# TYPE clickzetta_dify_admission_rejections_total counter" in text
+    assert 'clickzetta_dify_admission_wait_milliseconds_count{vcluster="default_ap"} 1' in text
+    
+    print("✅ 准入控制指标类型测试通过")
+
+
+
+def test_all_metrics_registered():
+    """工具代码中记录的每个指标都在 METRIC_DEFINITIONS 中声明了匹配的类型"""
+    
+    print("\n=== 测试指标声明 ===")
+    
+    expected_types = {"inc": "counter", "add_gauge": "gauge", "observe": "histogram"}
+    pattern = re.compile(r"metrics\.(inc|add_gauge|observe)\(\s*\"(\w+)\"")
+    used = {}
+    for path in (Path(__file__).parent.parent / "tools").glob("*.py"):
+        for method, name in pattern.findall(path.read_text(encoding="utf-8")):
+            used[name] = expected_types[method]
+    print(f"使用的指标: {sorted(used)}")
+    
+    assert "statement_retries_total" in used
+    for name, metric_type in used.items():
+        assert name in METRIC_DEFINITIONS, f"指标 {name} 未声明"
+        assert METRIC_DEFINITIONS[name][0] == metric_type, f"指标 {name} 的类型应为 {metric_type}"
+    
+    print("✅ 指标声明测试通过")
+
+
+if __name__ == "__main__":
+    test_latency_histogram()
+    test_counters_and_gauges()
+    test_render_prometheus()
+    test_admission_metric_types()
+    test_all_metrics_registered()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+测试长时间操作的进度消息
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.progress import ProgressReporter
+
+
+def test_progress_reporter():
+    """按间隔报告进度，全部完成和关闭时不报告"""
+
+    print("=== 测试进度报告 ===")
+
+    reporter = ProgressReporter("已处理", "行", 100, interval=0)
+    text = reporter.advance(25, "第 1 批")
+    print(f"进度: {text}")
+    assert text.startswith("⏳ 已处理 25 / 100 行（25%），第 1 批，已用 ")
+    assert "预计剩余" in text
+    assert reporter.advance(75) is None
+    assert reporter.done == 100
+
+    # 总量未知时只报告已完成数量
+    reporter = ProgressReporter("已处理", "行", interval=0)
+    text = reporter.advance(5000)
+    assert text.startswith("⏳ 已处理 5,000 行，已用 ") and "预计剩余" not in text
+
+    # 报告间隔内不重复报告
+    reporter = ProgressReporter("已检查", "张表", 10, interval=0.05)
+    assert reporter.advance(1) is None
+    time.sleep(0.06)
+    assert reporter.advance(1) is not None
+    assert reporter.advance(1) is None
+
+    assert ProgressReporter("已处理", "行", 10, enabled=False, interval=0).advance(1) is None
+
+    print("✅ 进度报告测试通过")
+
+
+if __name__ == "__main__":
+    test_progress_reporter()
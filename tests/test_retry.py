@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试临时错误的识别和指数退避重试
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools import retry
+from tools.retry import (
+    backoff_delay, call_with_retry, classify_error, is_idempotent_statement, is_transient_error
+)
+
+
+def test_is_transient_error():
+    """超时、连接中断等视为临时错误，语法错误等不重试"""
+
+    print("=== 测试临时错误识别 ===")
+
+    assert is_transient_error(TimeoutError("read"))
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(Exception("Connection reset by peer"))
+    assert is_transient_error(Exception("HTTP 503 Service Unavailable"))
+    assert not is_transient_error(Exception("Syntax error at line 1"))
+    assert not is_transient_error(ValueError("table not found"))
+
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.5, 8.0) <= min(8.0, 0.5 * 2 ** attempt)
+
+    print("✅ 临时错误识别测试通过")
+
+
+def test_classify_error():
+    """连接器错误分类，以及可安全重复执行的语句"""
+
+    print("\n=== 测试错误分类 ===")
+
+    assert classify_error(ConnectionResetError()) == "network"
+    assert classify_error(Exception("read timed out")) == "network"
+    assert classify_error(Exception("HTTP 429 Too Many Requests")) == "throttle"
+    assert classify_error(Exception("Authentication failed: invalid credentials")) == "auth"
+    assert classify_error(Exception("Syntax error at line 1: connection")) == "syntax"
+    assert classify_error(Exception("division by zero")) == "other"
+
+    # 连接器的作业超时不重试，否则每次重试都会再跑一遍同样长的作业
+    job_timeout = Exception("clickzetta sql job 2024_abc timeout after 120 seconds. killed by sdk.")
+    assert classify_error(job_timeout) == "job_timeout"
+    assert not is_transient_error(job_timeout)
+    # 其他原因终止的作业或连接不算作业超时
+    assert classify_error(Exception("Job 42 was killed by user")) == "other"
+    assert classify_error(Exception("connection killed")) != "job_timeout"
+
+    # 状态码只在 HTTP 上下文中识别，表名、ID 中的数字不算
+    assert classify_error(Exception("Table dify.t_4291 not found")) == "other"
+    assert not is_transient_error(Exception("Table dify.t_4291 not found"))
+    assert not is_transient_error(Exception("id doc_503 already exists"))
+    assert classify_error(Exception("status code: 429")) == "throttle"
+    assert classify_error(Exception("HTTP/1.1 504")) == "network"
+    assert classify_error(Exception("502 Bad Gateway")) == "network"
+    assert not is_transient_error(Exception("403 Forbidden"))
+
+    assert is_idempotent_statement("  select 1")
+    assert is_idempotent_statement("SHOW TABLES IN dify")
+    assert is_idempotent_statement("use vcluster default_ap")
+    assert is_idempotent_statement("CREATE VECTOR INDEX IF NOT EXISTS idx ON TABLE t(vector)")
+    assert is_idempotent_statement("DROP TABLE IF EXISTS dify.docs")
+    assert not is_idempotent_statement("INSERT INTO dify.docs VALUES ('a')")
+    assert not is_idempotent_statement("DELETE FROM dify.docs WHERE id = 'a'")
+    assert not is_idempotent_statement("CREATE TABLE dify.docs (id STRING)")
+    assert not is_idempotent_statement("selectivity")
+
+    # WITH 语句按 CTE 之后的主语句判断
+    assert is_idempotent_statement("WITH a AS (SELECT 1), b (x) AS (SELECT ')' FROM a) SELECT * FROM b")
+    assert not is_idempotent_statement("WITH src AS (SELECT * FROM t WHERE (x > 1)) INSERT INTO dify.docs SELECT * FROM src")
+    assert not is_idempotent_statement("with recursive r as (select 1) delete from dify.docs")
+    assert not is_idempotent_statement("WITH broken AS (SELECT 1")
+
+    print("✅ 错误分类测试通过")
+
+
+def test_call_with_retry():
+    """临时错误按次数重试，非临时错误立即抛出"""
+
+    print("\n=== 测试重试 ===")
+
+    original_delay = retry.RETRY_BASE_DELAY
+    retry.RETRY_BASE_DELAY = 0
+    try:
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise TimeoutError("timed out")
+            return "ok"
+
+        retried = []
+        assert call_with_retry(flaky, 3, on_retry=lambda n, e: retried.append(n)) == "ok"
+        assert retried == [1, 2]
+
+        attempts.clear()
+        try:
+            call_with_retry(flaky, 1)
+            assert False, "重试耗尽后应抛出原错误"
+        except TimeoutError:
+            pass
+        assert len(attempts) == 2
+
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ValueError("Syntax error")
+
+        try:
+            call_with_retry(broken, 5)
+            assert False, "非临时错误应直接抛出"
+        except ValueError:
+            pass
+        assert len(calls) == 1
+    finally:
+        retry.RETRY_BASE_DELAY = original_delay
+
+    print("✅ 重试测试通过")
+
+
+if __name__ == "__main__":
+    test_is_transient_error()
+    test_classify_error()
+    test_call_with_retry()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试慢语句日志的语句指纹
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.statement_log import fingerprint_sql
+
+
+def test_vector_insert_fingerprint():
+    """批量插入语句：向量、字符串和 JSON 字面量被去掉，重复的值列表被合并"""
+    
+    print("=== 测试插入语句指纹 ===")
+    
+    vector = ",".join(["0.0123"] * 1536)
+    values = ",".join(
+        f"('id_{i}', 'it''s chunk {i}', JSON '{{\"page\": {i}}}', VECTOR({vector}))"
+        for i in range(100)
+    )
+    sql = f"INSERT INTO dify.docs (id, page_content, metadata, vector) VALUES {values}"
+    
+    fingerprint = fingerprint_sql(sql)
+    print(f"原始长度: {len(sql)}")
+    print(f"指纹: {fingerprint}")
+    
+    assert "0.0123" not in fingerprint
+    assert "VECTOR(?)" in fingerprint
+    assert fingerprint.count("VECTOR(?)") == 1
+    assert len(fingerprint) < 200
+    
+    print("✅ 插入语句指纹测试通过")
+
+
+def test_search_fingerprint():
+    """搜索语句：保留元数据键名和函数名，去掉过滤值和 LIMIT"""
+    
+    print("\n=== 测试搜索语句指纹 ===")
+    
+    sql = """
+    SELECT id, page_content, metadata,
+           COSINE_DISTANCE(vector, VECTOR(0.1,-0.2,3e-05)) AS distance
+    FROM dify.docs
+     WHERE metadata['category'] = 'news' AND id IN ('a', 'b', 'c')
+    ORDER BY distance
+    LIMIT 10
+    """
+    
+    fingerprint = fingerprint_sql(sql)
+    print(f"指纹: {fingerprint}")
+    
+    assert fingerprint == (
+        "SELECT id, page_content, metadata, COSINE_DISTANCE(vector, VECTOR(?)) AS distance "
+        "FROM dify.docs WHERE metadata['category'] = ? AND id IN (?, ...) ORDER BY distance LIMIT ?"
+    )
+    
+    print("✅ 搜索语句指纹测试通过")
+
+
+def test_identifiers_preserved():
+    """标识符中的数字和 DDL 中的 VECTOR 类型不受影响"""
+    
+    print("\n=== 测试标识符保留 ===")
+    
+    fingerprint = fingerprint_sql("CREATE TABLE dify.t_2024 (vector VECTOR(FLOAT, 384))")
+    print(f"指纹: {fingerprint}")
+    
+    assert "dify.t_2024" in fingerprint
+    assert "VECTOR(FLOAT, ?)" in fingerprint
+    
+    print("✅ 标识符保留测试通过")
+
+
+if __name__ == "__main__":
+    test_vector_insert_fingerprint()
+    test_search_fingerprint()
+    test_identifiers_preserved()
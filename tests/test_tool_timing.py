@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试工具耗时统计逻辑
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.plugin_metrics import metrics
+from tools.tool_timing import ToolTimer, current_timer, timed_phase, get_timing_snapshot
+
+
+def test_tool_timer_phases():
+    """测试阶段耗时累加"""
+    
+    print("\n=== 测试阶段耗时 ===")
+    
+    timer = ToolTimer("test_tool")
+    with timer.phase("execute"):
+        time.sleep(0.01)
+    with timer.phase("execute"):
+        time.sleep(0.01)
+    
+    timings = timer.timings_ms()
+    print(f"耗时明细: {timings}")
+    
+    assert timings["execute"] >= 20
+    assert timings["total"] >= timings["execute"]
+    
+    print("✅ 阶段耗时测试通过")
+
+
+def test_timed_phase_without_timer():
+    """不在工具调用中时 timed_phase 不记录任何内容"""
+    
+    print("\n=== 测试无计时器时的阶段记录 ===")
+    
+    assert current_timer() is None
+    with timed_phase("execute"):
+        pass
+    
+    print("✅ 无计时器时不报错")
+
+
+def test_timing_snapshot():
+    """测试按工具和阶段聚合"""
+    
+    print("\n=== 测试耗时聚合 ===")
+    
+    metrics.reset()
+    for _ in range(2):
+        timer = ToolTimer("vector_search")
+        with timer.phase("execute"):
+            pass
+        timer.record()
+    
+    snapshot = get_timing_snapshot()
+    print(f"聚合结果: {list(snapshot['vector_search'].keys())}")
+    
+    assert snapshot["vector_search"]["execute"]["count"] == 2
+    assert snapshot["vector_search"]["total"]["count"] == 2
+    
+    print("✅ 耗时聚合测试通过")
+
+
+if __name__ == "__main__":
+    test_tool_timer_phases()
+    test_timed_phase_without_timer()
+    test_timing_snapshot()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+测试向量参数的编码解析
+"""
+
+import sys
+import base64
+import struct
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.vector_encoding import format_vector, parse_vectors
+
+
+def _encode(values):
+    return base64.b64encode(struct.pack(f"<{len(values)}f", *values)).decode("ascii")
+
+
+def test_base64_float32():
+    """base64 编码的小端 float32：单个向量和按维度拆分的矩阵"""
+
+    print("=== 测试 base64 float32 向量 ===")
+
+    single = parse_vectors(_encode([0.5, -1.0, 2.0]), "base64_float32")
+    assert single.shape == (1, 3)
+    assert single[0].tolist() == [0.5, -1.0, 2.0]
+
+    matrix = parse_vectors(_encode([1, 2, 3, 4, 5, 6]), "base64_float32", 3)
+    print(f"矩阵: {matrix.tolist()}")
+    assert matrix.tolist() == [[1, 2, 3], [4, 5, 6]]
+    # 行是解码缓冲区的视图，没有复制
+    assert matrix[1].base is not None
+    assert format_vector(matrix[0]) == "VECTOR(1.0,2.0,3.0)"
+
+    for data, dimension in (("not base64!", None), (_encode([1, 2, 3]), 2),
+                            (base64.b64encode(b"\x00\x00\x80").decode(), None),
+                            (_encode([float("nan")]), None)):
+        try:
+            parse_vectors(data, "base64_float32", dimension)
+            assert False, f"{data} 应解析失败"
+        except ValueError:
+            pass
+
+    try:
+        parse_vectors("[1, 2]", "float16")
+        assert False, "不支持的编码应报错"
+    except ValueError:
+        pass
+
+    assert parse_vectors("[1, 2]") == [[1.0, 2.0]]
+
+    print("✅ base64 float32 向量测试通过")
+
+
+if __name__ == "__main__":
+    test_base64_float32()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试候选结果的精确重排
+"""
+
+import sys
+import math
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.vector_rerank import exact_distances, mmr_select, parse_vector, rerank_exact
+
+
+def test_exact_distances():
+    """距离定义与 SQL 中的 COSINE_DISTANCE / L2_DISTANCE 一致"""
+    
+    print("=== 测试精确距离 ===")
+    
+    query = [1.0, 0.0]
+    candidates = [[1.0, 0.0], [0.0, 2.0], [-1.0, 0.0], [0.0, 0.0]]
+    
+    cosine = exact_distances(query, candidates, "cosine")
+    l2 = exact_distances(query, candidates, "l2")
+    print(f"cosine: {cosine.tolist()}, l2: {l2.tolist()}")
+    
+    assert cosine.tolist() == [0.0, 1.0, 2.0, 1.0]
+    assert l2.tolist() == [0.0, math.sqrt(5), 2.0, 1.0]
+    
+    try:
+        exact_distances(query, [[1.0, 2.0, 3.0]], "l2")
+        assert False, "维度不一致时应报错"
+    except ValueError:
+        pass
+    
+    print("✅ 精确距离测试通过")
+
+
+def test_rerank_exact():
+    """近似结果按精确距离重新排序，截取 top_k 并覆盖 distance"""
+    
+    print("\n=== 测试精确重排 ===")
+    
+    # 模拟索引返回的近似顺序：distance 为近似值，顺序不准确
+    candidates = [
+        {"id": "a", "distance": 0.10, "vector": parse_vector("[0.0, 1.0]")},
+        {"id": "b", "distance": 0.20, "vector": parse_vector("[1.0, 0.1]")},
+        {"id": "c", "distance": 0.30, "vector": [1.0, 0.0]},
+    ]
+    
+    reranked = rerank_exact([1.0, 0.0], candidates, "cosine", top_k=2)
+    print(f"重排结果: {[(r['id'], round(r['distance'], 4)) for r in reranked]}")
+    
+    assert [r["id"] for r in reranked] == ["c", "b"]
+    assert reranked[0]["distance"] == 0.0
+    assert rerank_exact([1.0, 0.0], [], "l2", top_k=5) == []
+    
+    print("✅ 精确重排测试通过")
+
+
+def test_mmr_select():
+    """近似重复的候选被多样性更高的候选替换"""
+    
+    print("\n=== 测试 MMR 多样化 ===")
+    
+    candidates = [
+        {"id": "a", "vector": [1.0, 0.10]},
+        {"id": "a_copy", "vector": [1.0, 0.11]},
+        {"id": "b", "vector": [0.6, 0.8]},
+    ]
+    
+    selected, dropped = mmr_select([1.0, 0.0], candidates, top_k=2, lambda_mult=0.3)
+    print(f"选择结果: {[c['id'] for c in selected]}, 剔除: {dropped}")
+    assert [c["id"] for c in selected] == ["a", "b"]
+    assert dropped == 1
+    
+    # lambda=1 时只看相关性，等同于按相似度排序
+    selected, dropped = mmr_select([1.0, 0.0], candidates, top_k=2, lambda_mult=1.0)
+    assert [c["id"] for c in selected] == ["a", "a_copy"]
+    assert dropped == 0
+    
+    print("✅ MMR 多样化测试通过")
+
+
+if __name__ == "__main__":
+    test_exact_distances()
+    test_rerank_exact()
+    test_mmr_select()
@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from tools.plugin_metrics import metrics
+from tools.retry import ERROR_THROTTLE
+from tools.tool_timing import current_timer, timed_phase
+
+logger = logging.getLogger(__name__)
+
+# Dify 插件单次请求的超时时间（秒），与 main.py 中的 DifyPluginEnv 配置一致
+MAX_REQUEST_TIMEOUT = 120
+# 排队等待至少为工具留出的时间（秒），超时前返回明确的错误而不是被 Dify 中断
+DEADLINE_MARGIN = 5.0
+
+# 每个 vcluster 同时执行的语句数上限（0 表示不限制）、排队语句数上限和最长排队时间（秒）
+MAX_IN_FLIGHT = int(os.getenv("LAKEHOUSE_MAX_IN_FLIGHT", "16"))
+MAX_QUEUED = int(os.getenv("LAKEHOUSE_MAX_QUEUED", "128"))
+QUEUE_TIMEOUT = float(os.getenv("LAKEHOUSE_QUEUE_TIMEOUT", "60"))
+
+
+class AdmissionRejected(Exception):
+    """vcluster 繁忙，语句未被接纳"""
+
+    def __init__(self, message: str, vcluster: str, reason: str):
+        super().__init__(message)
+        self.vcluster = vcluster
+        self.reason = reason
+
+
+class _VclusterSlots:
+    """单个 vcluster 的执行名额和等待队列"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+
+
+class AdmissionController:
+    """
+    客户端准入控制：每个 vcluster 最多同时执行 max_in_flight 条语句，
+    超出的语句按到达顺序排队，队列已满时立即拒绝，等待超过期限时放弃
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queued: int = MAX_QUEUED,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots: Dict[str, _VclusterSlots] = {}
+
+    def _slots_for(self, vcluster: str) -> _VclusterSlots:
+        with self._lock:
+            slots = self._slots.get(vcluster)
+            if slots is None:
+                slots = self._slots[vcluster] = _VclusterSlots()
+            return slots
+
+    def _wait_budget(self) -> float:
+        """本次最多可以排队的秒数：不超过 queue_timeout，也不超过当前工具调用剩余的请求时间"""
+        budget = self.queue_timeout
+        timer = current_timer()
+        if timer is not None:
+            budget = min(budget, MAX_REQUEST_TIMEOUT - DEADLINE_MARGIN - timer.elapsed_ms() / 1000)
+        return budget
+
+    def acquire(self, vcluster: str, timeout: Optional[float] = None) -> float:
+        """获取执行名额，返回排队等待的秒数；队列已满或等待超时时抛出 AdmissionRejected"""
+        if self.max_in_flight <= 0:
+            return 0.0
+        timeout = self._wait_budget() if timeout is None else timeout
+        slots = self._slots_for(vcluster)
+        start = time.monotonic()
+        with slots.condition:
+            # 有其他语句在排队时新来的语句也要排队，保持先到先得
+            if slots.in_flight < self.max_in_flight and slots.queued == 0:
+                slots.in_flight += 1
+                metrics.add_gauge("admission_in_flight", 1, vcluster=vcluster)
+                return 0.0
+            if slots.queued >= self.max_queued:
+                self._reject(vcluster, "queue_full",
+                             f"vcluster {vcluster} 繁忙：{slots.in_flight} 条语句正在执行，"
+                             f"{slots.queued} 条在排队，已达上限，请稍后重试")
+
+            slots.queued += 1
+            metrics.add_gauge("admission_queued", 1, vcluster=vcluster)
+            try:
+                deadline = start + max(0.0, timeout)
+                while slots.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(vcluster, "timeout",
+                                     f"vcluster {vcluster} 繁忙：排队 {time.monotonic() - start:.1f} 秒仍未轮到执行，"
+                                     f"请稍后重试")
+                    slots.condition.wait(remaining)
+                slots.in_flight += 1
+                metrics.add_gauge("admission_in_flight", 1, vcluster=vcluster)
+            finally:
+                slots.queued -= 1
+                metrics.add_gauge("admission_queued", -1, vcluster=vcluster)
+
+        waited = time.monotonic() - start
+        metrics.observe("admission_wait_milliseconds", waited * 1000, vcluster=vcluster)
+        return waited
+
+    def release(self, vcluster: str) -> None:
+        """归还执行名额，唤醒排在最前面的语句"""
+        if self.max_in_flight <= 0:
+            return
+        slots = self._slots_for(vcluster)
+        with slots.condition:
+            slots.in_flight -= 1
+            metrics.add_gauge("admission_in_flight", -1, vcluster=vcluster)
+            slots.condition.notify()
+
+    @contextmanager
+    def admit(self, vcluster: str):
+        """在获得执行名额期间执行语句"""
+        with timed_phase("admission_wait"):
+            self.acquire(vcluster)
+        try:
+            yield
+        finally:
+            self.release(vcluster)
+
+    @staticmethod
+    def _reject(vcluster: str, reason: str, message: str) -> None:
+        metrics.inc("admission_rejections_total", vcluster=vcluster, reason=reason)
+        timer = current_timer()
+        if timer is not None:
+            timer.error_type = ERROR_THROTTLE
+        logger.warning(f"Admission rejected ({reason}): {message}")
+        raise AdmissionRejected(message, vcluster, reason)
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+from tools.tool_timing import current_timer, timed_phase, use_timer
+
+T = TypeVar("T")
+
+# 进程内共享执行器的工作线程数；插件运行时对 threading 打了 gevent 补丁，工作线程实际是协程，
+# 阻塞在连接器网络 I/O 上时会让出执行权，开销只是协程栈
+EXECUTOR_WORKERS = int(os.getenv("LAKEHOUSE_EXECUTOR_WORKERS", "32"))
+# 单次工具调用内同时执行的语句数上限
+QUERY_CONCURRENCY = int(os.getenv("LAKEHOUSE_QUERY_CONCURRENCY", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的执行器（首次使用时创建）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="lakehouse-io")
+        return _executor
+
+
+def run_concurrently(tasks: Sequence[Callable[[], T]], max_concurrency: int = QUERY_CONCURRENCY) -> List[T]:
+    """
+    在共享执行器中并发执行相互独立的任务，同时最多 max_concurrency 个，按输入顺序返回结果
+    任务在调用方工具调用的计时器上下文中执行，任务中的阶段耗时记为 <阶段>_cumulative，
+    整个并发部分的墙钟时间记为 concurrent 阶段；任一任务失败后不再启动新任务，
+    等待已启动的任务结束后抛出最先失败的异常
+    """
+    if len(tasks) <= 1 or max_concurrency <= 1:
+        return [task() for task in tasks]
+
+    timer = current_timer()
+
+    def run(task: Callable[[], T]) -> T:
+        with use_timer(timer, concurrent=True):
+            return task()
+
+    executor = get_executor()
+    results: Dict[int, T] = {}
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    error: Optional[BaseException] = None
+    with timed_phase("concurrent"):
+        while pending or (next_index < len(tasks) and error is None):
+            while error is None and next_index < len(tasks) and len(pending) < max_concurrency:
+                pending[executor.submit(run, tasks[next_index])] = next_index
+                next_index += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                else:
+                    results[index] = future.result()
+    if error is not None:
+        raise error
+    return [results[index] for index in range(len(tasks))]
@@ -0,0 +1,65 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from tools.lakehouse_connection import LakehouseConnection
+from tools.vector_tool_mixin import VectorToolMixin
+
+logger = logging.getLogger(__name__)
+
+
+def get_warmup_config() -> Optional[Dict[str, Any]]:
+    """从环境变量读取预热用的连接配置，缺少必需凭据时返回 None"""
+    config = {
+        "username": os.getenv("LAKEHOUSE_USERNAME"),
+        "password": os.getenv("LAKEHOUSE_PASSWORD"),
+        "instance": os.getenv("LAKEHOUSE_INSTANCE"),
+        "service": os.getenv("LAKEHOUSE_SERVICE", "api.clickzetta.com"),
+        "workspace": os.getenv("LAKEHOUSE_WORKSPACE", "quick_start"),
+        "vcluster": os.getenv("LAKEHOUSE_VCLUSTER", "default_ap"),
+    }
+    if not all(config[key] for key in ("username", "password", "instance")):
+        return None
+    return config
+
+
+def warm_up_connection(config: Dict[str, Any], schema: Optional[str] = None) -> None:
+    """建立 Lakehouse 连接并预取 schema 元数据缓存"""
+    start = time.monotonic()
+    connection = LakehouseConnection().get_connection(config)
+    
+    # 复用工具的 schema 查询逻辑，结果写入 LakehouseConnection 的元数据缓存
+    probe = VectorToolMixin()
+    with connection.cursor() as cursor:
+        current_schema = probe._get_current_schema(cursor)
+        for schema_name in {current_schema, schema or current_schema}:
+            probe._validate_schema(cursor, schema_name)
+    
+    logger.info(f"Lakehouse connection warmed up in {time.monotonic() - start:.2f}s")
+
+
+def start_background_warmup() -> Optional[threading.Thread]:
+    """
+    在后台线程中预热连接
+    需要设置 LAKEHOUSE_WARMUP=true 且提供 LAKEHOUSE_USERNAME/PASSWORD/INSTANCE 环境变量
+    """
+    if os.getenv("LAKEHOUSE_WARMUP", "false").lower() not in ("1", "true", "yes"):
+        return None
+    
+    config = get_warmup_config()
+    if config is None:
+        logger.warning("LAKEHOUSE_WARMUP is enabled but Lakehouse credentials are missing, skipping warm-up")
+        return None
+    
+    def _run():
+        try:
+            warm_up_connection(config, os.getenv("LAKEHOUSE_SCHEMA"))
+        except Exception as e:
+            # 预热失败不影响插件启动，首次调用工具时会重新建立连接
+            logger.warning(f"Lakehouse connection warm-up failed: {str(e)}")
+    
+    thread = threading.Thread(target=_run, name="lakehouse-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import math
+import logging
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+# 可选的 JSON 后端，按顺序尝试；可用 LAKEHOUSE_JSON_BACKEND 指定 orjson / ujson / json
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+
+def _load_backend(preferred: str):
+    candidates = [preferred] if preferred in JSON_BACKENDS else list(JSON_BACKENDS)
+    if preferred and preferred not in JSON_BACKENDS:
+        logger.warning(f"未知的 JSON 后端 {preferred}，自动选择可用的后端")
+    for name in candidates:
+        if name == "json":
+            return name, json
+        try:
+            return name, __import__(name)
+        except ImportError:
+            continue
+    # 指定的后端未安装时回退到标准库
+    logger.warning(f"JSON 后端 {preferred} 未安装，使用标准库 json")
+    return "json", json
+
+
+BACKEND, _backend = _load_backend(os.getenv("LAKEHOUSE_JSON_BACKEND", "").strip().lower())
+
+# 逗号分隔的 JSON 数字（不接受 float() 额外支持的 nan、inf、Infinity、1_000 等写法）
+_JSON_NUMBER = r"\s*-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?\s*"
+_JSON_NUMBER_LIST = re.compile(rf"{_JSON_NUMBER}(?:,{_JSON_NUMBER})*")
+
+
+def loads(data: Any) -> Any:
+    """解析 JSON 文本（str 或 bytes），格式错误时抛出 ValueError"""
+    return _backend.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """序列化为 JSON 字符串，非 ASCII 字符保持原样（等价于 ensure_ascii=False）"""
+    if BACKEND == "orjson":
+        try:
+            return _backend.dumps(obj, option=_backend.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如超过 64 位的整数）交给标准库处理
+            return json.dumps(obj, ensure_ascii=False)
+    if BACKEND == "ujson":
+        return _backend.dumps(obj, ensure_ascii=False)
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _finite_floats(values: Any) -> List[float]:
+    """转换为浮点数列表，NaN 和无穷大（包括溢出的 1e999）不能写入向量列"""
+    result = [float(v) for v in values]
+    if not all(math.isfinite(v) for v in result):
+        raise ValueError("向量中包含 NaN 或无穷大")
+    return result
+
+
+def loads_float_array(text: Any) -> List[float]:
+    """
+    解析单个向量，如 "[0.1, 0.2, ...]"
+    使用标准库时，元素都是合法 JSON 数字的一维数组走拆分 + float() 的快速路径，避免逐字符的通用 JSON 解析；
+    其余输入交给 JSON 解析器报错
+    """
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode("utf-8")
+    if not isinstance(text, str):
+        return _finite_floats(text)
+    if BACKEND == "json":
+        stripped = text.strip()
+        if stripped.startswith("[") and stripped.endswith("]") and "[" not in stripped[1:]:
+            body = stripped[1:-1]
+            if not body.strip():
+                return []
+            if _JSON_NUMBER_LIST.fullmatch(body):
+                return _finite_floats(body.split(","))
+    values = loads(text)
+    if not isinstance(values, list):
+        raise ValueError("向量必须是数字数组")
+    return _finite_floats(values)
+
+
+def loads_vectors(data: Any) -> List[List[float]]:
+    """
+    解析一个或多个向量：单个向量 [..]、向量数组 [[..], [..]]，或元素为 JSON 字符串的数组
+    每个向量只解析一次
+    """
+    if isinstance(data, (str, bytes, bytearray)):
+        data = loads(data)
+    if not isinstance(data, list) or not data:
+        raise ValueError("向量数据必须是非空数组")
+    if not isinstance(data[0], (list, str)):
+        return [_finite_floats(data)]
+    return [loads_float_array(v) for v in data]
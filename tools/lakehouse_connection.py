@@ -1,7 +1,13 @@
 import os
+import time
 import logging
-from typing import Optional, Dict, Any
-import clickzetta
+import threading
+from typing import Optional, Dict, Any, Tuple
+
+from tools.plugin_metrics import metrics
+from tools.retry import call_with_retry
+from tools.statement_log import STATEMENT_MAX_RETRIES, InstrumentedConnection
+from tools.tool_timing import current_timer, timed_phase
 
 logger = logging.getLogger(__name__)
 
@@ -10,31 +16,117 @@ class LakehouseConnection:
     
     _instance = None
     _connection: Optional[Any] = None
+    # 当前连接的身份（服务地址、实例、工作空间、schema、vcluster、用户），调用的配置不同时重建连接
+    _connection_identity: Optional[Tuple[Any, ...]] = None
+    _lock = threading.Lock()
+    
+    # 元数据缓存（当前 schema、已验证的 schema 等），随连接重建而清空
+    _metadata_cache: Dict[str, Tuple[float, Any]] = {}
+    METADATA_CACHE_TTL = float(os.getenv("LAKEHOUSE_METADATA_CACHE_TTL", "300"))
+    
+    # 只读调用距上次确认连接可用不足该时间（秒）时跳过 SELECT 1 存活检查，避免每次调用都在锁内多一次往返，
+    # 期间连接中断由只读语句的自动重连重试处理；写入语句不会自动重试，写入调用总是先检查
+    LIVENESS_CHECK_INTERVAL = float(os.getenv("LAKEHOUSE_LIVENESS_CHECK_INTERVAL", "30"))
+    _last_verified = 0.0
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
-    def get_connection(self, config: Dict[str, Any]) -> Any:
-        """获取或创建 Lakehouse 连接"""
-        if self._connection is None or not self._is_connection_alive():
-            self._connection = self._create_connection(config)
+    def get_connection(self, config: Dict[str, Any], read_only: bool = False) -> Any:
+        """
+        获取或创建 Lakehouse 连接（返回的连接会记录慢语句，按 vcluster 做准入控制，网络中断后自动重建）
+        read_only 为 true 表示调用方只执行查询，可以跳过近期已确认过的存活检查
+        已有连接（例如启动预热时用环境变量凭据建立的连接）与本次调用的配置指向不同的实例、工作空间、
+        schema、vcluster 或用户时，关闭该连接并清空元数据缓存，按本次配置重新连接
+        """
+        identity = self._connection_identity_for(config)
+        wait_start = time.perf_counter()
+        with self._lock:
+            metrics.observe("connection_wait_milliseconds", (time.perf_counter() - wait_start) * 1000)
+            metrics.inc("connection_checkouts_total")
+            if self._connection is not None and self._connection_identity != identity:
+                logger.info("Lakehouse connection config changed, reconnecting")
+                self._close_connection()
+            with timed_phase("liveness_probe"):
+                alive = self._is_connection_alive(skip_if_recent=read_only)
+            if not alive:
+                self._close_connection()
+                self._open_connection(config)
+            return InstrumentedConnection(self._connection, lambda stale: self.reconnect(config, stale),
+                                          config.get("vcluster") or "default_ap")
+    
+    def reconnect(self, config: Dict[str, Any], stale: Any) -> Any:
+        """
+        丢弃已中断的连接 stale 并建立新连接
+        其他线程已经重建过连接时直接返回当前连接，避免并发重连互相覆盖
+        """
+        with self._lock:
+            if self._connection is not None and self._connection is not stale:
+                return self._connection
+            logger.warning("Lakehouse connection lost, reconnecting")
+            self._close_connection()
+            metrics.inc("reconnects_total")
+            return self._open_connection(config)
+    
+    def _open_connection(self, config: Dict[str, Any]) -> Any:
+        """建立连接，临时错误按指数退避重试；调用方需持有锁"""
+        def count_retry(attempt: int, error: BaseException) -> None:
+            timer = current_timer()
+            if timer is not None:
+                timer.count_retry()
+        
+        with timed_phase("connect"):
+            self._connection = call_with_retry(lambda: self._create_connection(config),
+                                               STATEMENT_MAX_RETRIES, on_retry=count_retry)
+        self._connection_identity = self._connection_identity_for(config)
+        self._last_verified = time.monotonic()
+        metrics.inc("connections_created_total")
         return self._connection
     
+    def get_metadata(self, key: str) -> Any:
+        """读取未过期的元数据缓存，不存在时返回 None"""
+        entry = self._metadata_cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.METADATA_CACHE_TTL:
+            self._metadata_cache.pop(key, None)
+            entry = None
+        if entry is None:
+            metrics.inc("metadata_cache_misses_total")
+            return None
+        metrics.inc("metadata_cache_hits_total")
+        return entry[1]
+    
+    def set_metadata(self, key: str, value: Any) -> None:
+        """写入元数据缓存"""
+        self._metadata_cache[key] = (time.monotonic(), value)
+    
+    def invalidate_metadata(self, key: str) -> None:
+        """删除元数据缓存（表结构变化后调用）"""
+        self._metadata_cache.pop(key, None)
+    
+    @staticmethod
+    def _connection_params(config: Dict[str, Any]) -> Dict[str, Any]:
+        """从配置或环境变量获取连接参数"""
+        return {
+            "username": config.get("username") or os.getenv("LAKEHOUSE_USERNAME"),
+            "password": config.get("password") or os.getenv("LAKEHOUSE_PASSWORD"),
+            "instance": config.get("instance") or os.getenv("LAKEHOUSE_INSTANCE"),
+            "service": config.get("service", "api.clickzetta.com"),
+            "workspace": config.get("workspace", "quick_start"),
+            "vcluster": config.get("vcluster", "default_ap"),
+            "schema": config.get("schema", "dify"),
+        }
+    
+    def _connection_identity_for(self, config: Dict[str, Any]) -> Tuple[Any, ...]:
+        """连接的身份：决定连接指向哪个实例的哪个工作空间、以什么用户执行（不含密码）"""
+        params = self._connection_params(config)
+        return tuple(params[key] for key in ("service", "instance", "workspace", "schema", "vcluster", "username"))
+    
     def _create_connection(self, config: Dict[str, Any]) -> Any:
         """创建新的 Lakehouse 连接"""
         try:
-            # 从配置或环境变量获取连接参数
-            conn_params = {
-                "username": config.get("username") or os.getenv("LAKEHOUSE_USERNAME"),
-                "password": config.get("password") or os.getenv("LAKEHOUSE_PASSWORD"),
-                "instance": config.get("instance") or os.getenv("LAKEHOUSE_INSTANCE"),
-                "service": config.get("service", "api.clickzetta.com"),
-                "workspace": config.get("workspace", "quick_start"),
-                "vcluster": config.get("vcluster", "default_ap"),
-                "schema": config.get("schema", "dify"),
-            }
+            conn_params = self._connection_params(config)
             
             # 验证必需参数
             required_params = ["username", "password", "instance"]
@@ -42,6 +134,9 @@ class LakehouseConnection:
                 if not conn_params.get(param):
                     raise ValueError(f"Missing required parameter: {param}")
             
+            # 延迟导入 clickzetta（会连带加载 pandas 等重量级依赖），缩短插件冷启动时间
+            import clickzetta
+
             logger.info(f"Connecting to Lakehouse instance: {conn_params['instance']}")
             connection = clickzetta.connect(**conn_params)
             
@@ -57,24 +152,35 @@ class LakehouseConnection:
             logger.error(f"Failed to connect to Lakehouse: {str(e)}")
             raise
     
-    def _is_connection_alive(self) -> bool:
-        """检查连接是否仍然有效"""
+    def _is_connection_alive(self, skip_if_recent: bool = False) -> bool:
+        """检查连接是否仍然有效；skip_if_recent 时距上次确认不足 LIVENESS_CHECK_INTERVAL 秒直接视为有效"""
         if self._connection is None:
             return False
+        if skip_if_recent and time.monotonic() - self._last_verified < self.LIVENESS_CHECK_INTERVAL:
+            return True
         
         try:
             with self._connection.cursor() as cursor:
                 cursor.execute("SELECT 1")
                 cursor.fetchone()
+            self._last_verified = time.monotonic()
             return True
-        except:
+        except Exception as e:
+            logger.info(f"Lakehouse connection is no longer alive: {str(e)}")
             return False
     
-    def close(self):
-        """关闭连接"""
-        if self._connection:
+    def _close_connection(self) -> None:
+        """关闭当前连接并清空元数据缓存；关闭失败只记录日志（连接多半已经断开）"""
+        if self._connection is not None:
             try:
                 self._connection.close()
-            except:
-                pass
-            self._connection = None
\ No newline at end of file
+            except Exception as e:
+                logger.warning(f"Failed to close Lakehouse connection: {str(e)}")
+            self._connection = None
+        self._connection_identity = None
+        self._metadata_cache.clear()
+    
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self._close_connection()
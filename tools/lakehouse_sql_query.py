@@ -1,15 +1,17 @@
 from collections.abc import Generator
 from typing import Any, Dict, List
-import pandas as pd
 import json
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.lakehouse_connection import LakehouseConnection
+from tools.plugin_metrics import metrics
+from tools.tool_timing import timed_invoke, timed_phase
 
 class LakehouseSQLQueryTool(Tool):
     """Clickzetta Lakehouse SQL 查询工具"""
     
+    @timed_invoke("lakehouse_sql_query")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         query = tool_parameters.get("query", "").strip()
@@ -31,29 +33,35 @@ class LakehouseSQLQueryTool(Tool):
             # 执行查询
             with connection.cursor() as cursor:
                 # 设置查询超时
-                if timeout:
-                    cursor.execute(query, parameters={'hints': {'sdk.job.timeout': timeout}})
-                else:
-                    cursor.execute(query)
+                with timed_phase("execute"):
+                    if timeout:
+                        cursor.execute(query, parameters={'hints': {'sdk.job.timeout': timeout}})
+                    else:
+                        cursor.execute(query)
                 
                 # 获取查询结果
                 if cursor.description:  # 有返回结果的查询
                     columns = [desc[0] for desc in cursor.description]
                     
                     # 获取指定行数的数据
-                    rows = []
-                    for i in range(max_rows):
-                        row = cursor.fetchone()
-                        if row is None:
-                            break
-                        rows.append(row)
+                    with timed_phase("fetch"):
+                        rows = []
+                        for i in range(max_rows):
+                            row = cursor.fetchone()
+                            if row is None:
+                                break
+                            rows.append(row)
+                        has_more = cursor.fetchone() is not None
                     
-                    # 转换为 DataFrame 便于处理
-                    df = pd.DataFrame(rows, columns=columns)
+                    # 转换为 DataFrame 便于处理（pandas 仅在有结果集时才导入）
+                    with timed_phase("convert"):
+                        import pandas as pd
+                        df = pd.DataFrame(rows, columns=columns)
+                        data = df.to_dict(orient='records')
                     
                     # 统计信息
                     total_rows = len(rows)
-                    has_more = cursor.fetchone() is not None
+                    metrics.inc("rows_returned_total", total_rows, tool="lakehouse_sql_query")
                     
                     # 生成结果消息
                     result = {
@@ -61,7 +69,7 @@ class LakehouseSQLQueryTool(Tool):
                         "columns": columns,
                         "row_count": total_rows,
                         "has_more_rows": has_more,
-                        "data": df.to_dict(orient='records'),
+                        "data": data,
                         "query": query
                     }
                     
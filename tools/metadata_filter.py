@@ -0,0 +1,272 @@
+import re
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools import json_codec
+
+# 集合的固定列
+CORE_COLUMNS = ("id", "page_content", "metadata", "vector")
+# 创建集合时为 metadata_fields 声明的列添加的注释；只有带该注释的列才按类型化列读写，
+# 用户自行添加的其他列（可能是 NOT NULL 或带默认值）不会被写入 NULL
+TYPED_COLUMN_COMMENT = "dify metadata field"
+# 可以直接过滤的固定列
+FILTERABLE_CORE_COLUMNS = ("id", "page_content")
+
+# 比较运算符
+_COMPARISONS = {"eq": "=", "ne": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+# range 中允许的边界
+_RANGE_BOUNDS = ("gt", "gte", "lt", "lte")
+# in 列表的最大长度
+MAX_IN_VALUES = 1000
+# 嵌套深度上限
+MAX_DEPTH = 10
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class FilterError(ValueError):
+    """结构化过滤条件无效"""
+
+
+class CompiledFilter:
+    """编译后的过滤条件：带 ? 占位符的 SQL 片段和对应的参数（SQL 片段中只有校验过的列名，不含用户输入的字面量）"""
+
+    def __init__(self, sql: str, params: List[Any], typed_fields: List[str], metadata_fields: List[str]):
+        self.sql = sql
+        self.params = params
+        # 命中类型化列的字段和回退到 metadata JSON 的字段，便于判断过滤能否利用列裁剪
+        self.typed_fields = typed_fields
+        self.metadata_fields = metadata_fields
+
+    def render(self) -> str:
+        """将参数转义为 SQL 字面量后代入占位符"""
+        parts = self.sql.split("?")
+        if len(parts) != len(self.params) + 1:
+            raise FilterError("占位符数量与参数数量不一致")
+        rendered = [parts[0]]
+        for param, part in zip(self.params, parts[1:]):
+            rendered.append(sql_literal(param))
+            rendered.append(part)
+        return "".join(rendered)
+
+
+def sql_literal(value: Any) -> str:
+    """将 Python 值转为 SQL 字面量（字符串中的单引号和反斜杠会被转义）"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise FilterError(f"不支持的数值：{value}")
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("\\", "\\\\").replace("'", "''") + "'"
+    raise FilterError(f"不支持的值类型：{type(value).__name__}")
+
+
+def parse_filter(value: Any) -> Optional[Dict[str, Any]]:
+    """解析 JSON 字符串形式的过滤条件，空值返回 None"""
+    if value is None or value == "" or value == {}:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json_codec.loads(value)
+        except ValueError as e:
+            raise FilterError(f"过滤条件不是合法的 JSON：{str(e)}")
+    if not isinstance(value, dict):
+        raise FilterError("过滤条件必须是 JSON 对象")
+    return value
+
+
+class _Compiler:
+    def __init__(self, typed_columns: Dict[str, str]):
+        self.typed_columns = {name.lower(): data_type.lower() for name, data_type in typed_columns.items()}
+        self.params: List[Any] = []
+        self.typed_fields: List[str] = []
+        self.metadata_fields: List[str] = []
+
+    def compile(self, node: Any, depth: int = 0) -> str:
+        if depth > MAX_DEPTH:
+            raise FilterError(f"过滤条件嵌套超过 {MAX_DEPTH} 层")
+        if not isinstance(node, dict) or not node:
+            raise FilterError(f"无效的过滤条件：{json.dumps(node, ensure_ascii=False)}")
+
+        if "and" in node or "or" in node:
+            operator = "and" if "and" in node else "or"
+            if len(node) != 1:
+                raise FilterError(f"{operator} 节点不能包含其他键")
+            children = node[operator]
+            if not isinstance(children, list) or not children:
+                raise FilterError(f"{operator} 的值必须是非空数组")
+            compiled = [self.compile(child, depth + 1) for child in children]
+            if len(compiled) == 1:
+                return compiled[0]
+            return "(" + f" {operator.upper()} ".join(compiled) + ")"
+
+        if "not" in node:
+            if len(node) != 1:
+                raise FilterError("not 节点不能包含其他键")
+            return f"NOT ({self.compile(node['not'], depth + 1)})"
+
+        if "field" in node:
+            return self._predicate(node)
+
+        # 简写：{"category": "news", "page": 3} 表示各字段相等的 AND，数组值表示 in
+        predicates = []
+        for field, value in node.items():
+            op = "in" if isinstance(value, list) else "eq"
+            predicates.append(self._predicate({"field": field, "op": op, "value": value}))
+        return predicates[0] if len(predicates) == 1 else "(" + " AND ".join(predicates) + ")"
+
+    def _predicate(self, node: Dict[str, Any]) -> str:
+        field = node.get("field")
+        op = str(node.get("op", "eq")).lower()
+        if not isinstance(field, str) or not field:
+            raise FilterError("field 必须是非空字符串")
+
+        if op in _COMPARISONS:
+            value = self._scalar(node.get("value"), field)
+            if value is None:
+                if op == "eq":
+                    return f"{self._column(field, None)} IS NULL"
+                if op == "ne":
+                    return f"{self._column(field, None)} IS NOT NULL"
+                raise FilterError(f"{field}: {op} 不支持 null")
+            return f"{self._column(field, value)} {_COMPARISONS[op]} {self._param(value)}"
+
+        if op in ("in", "not_in"):
+            values = node.get("value")
+            if not isinstance(values, list) or not values:
+                raise FilterError(f"{field}: {op} 的值必须是非空数组")
+            if len(values) > MAX_IN_VALUES:
+                raise FilterError(f"{field}: {op} 最多支持 {MAX_IN_VALUES} 个值")
+            values = [self._scalar(v, field) for v in values]
+            if any(v is None for v in values):
+                raise FilterError(f"{field}: {op} 不支持 null")
+            column = self._column(field, values[0])
+            placeholders = ", ".join(self._param(v) for v in values)
+            return f"{column} {'IN' if op == 'in' else 'NOT IN'} ({placeholders})"
+
+        if op == "range":
+            bounds = {key: self._scalar(node[key], field) for key in _RANGE_BOUNDS if key in node}
+            if not bounds or any(v is None or isinstance(v, bool) for v in bounds.values()):
+                raise FilterError(f"{field}: range 需要 gt/gte/lt/lte 中至少一个非空边界")
+            # 每个边界单独生成列表达式，保证占位符与参数一一对应
+            predicates = [f"{self._column(field, value)} {_COMPARISONS[key]} {self._param(value)}"
+                          for key, value in bounds.items()]
+            return predicates[0] if len(predicates) == 1 else "(" + " AND ".join(predicates) + ")"
+
+        raise FilterError(f"{field}: 不支持的运算符 {op}，支持 eq/ne/gt/gte/lt/lte/in/not_in/range")
+
+    def _scalar(self, value: Any, field: str) -> Any:
+        if value is None or isinstance(value, (str, bool, int, float)):
+            return value
+        raise FilterError(f"{field}: 值必须是字符串、数字、布尔值或 null")
+
+    def _param(self, value: Any) -> str:
+        self.params.append(value)
+        return "?"
+
+    def _column(self, field: str, sample: Any) -> str:
+        """优先使用类型化列和固定列，否则回退为 metadata JSON 字段"""
+        name = field.lower()
+        if name in self.typed_columns or name in FILTERABLE_CORE_COLUMNS:
+            if not _IDENTIFIER.match(field):
+                raise FilterError(f"无效的列名：{field}")
+            self.typed_fields.append(field)
+            return field
+        if name in ("metadata", "vector"):
+            raise FilterError(f"不能直接过滤 {field} 列")
+
+        self.metadata_fields.append(field)
+        accessor = f"metadata[{self._param(field)}]"
+        # JSON 字段与数字、布尔值比较时显式转换类型
+        if isinstance(sample, bool):
+            return f"CAST({accessor} AS BOOLEAN)"
+        if isinstance(sample, (int, float)):
+            return f"CAST({accessor} AS DOUBLE)"
+        return accessor
+
+
+def compile_filter(spec: Dict[str, Any], typed_columns: Optional[Dict[str, str]] = None) -> CompiledFilter:
+    """
+    将结构化过滤条件编译为 SQL 谓词，例如：
+        {"and": [{"field": "category", "op": "eq", "value": "news"},
+                 {"field": "page", "op": "range", "gte": 1, "lt": 10}]}
+    typed_columns 为集合中的类型化列（列名 -> 类型），这些字段直接按列过滤，其余字段读取 metadata JSON
+    """
+    compiler = _Compiler(typed_columns or {})
+    sql = compiler.compile(spec)
+    return CompiledFilter(sql, compiler.params, list(dict.fromkeys(compiler.typed_fields)),
+                          list(dict.fromkeys(compiler.metadata_fields)))
+
+
+def parse_partition_values(value: Any) -> List[Any]:
+    """解析分区值：JSON 数组、单个值或逗号分隔的字符串，空值返回空列表"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith("["):
+            try:
+                value = json_codec.loads(stripped)
+            except ValueError as e:
+                raise FilterError(f"分区值不是合法的 JSON 数组：{str(e)}")
+        else:
+            value = [v.strip() for v in stripped.split(",") if v.strip()]
+    if not isinstance(value, list):
+        value = [value]
+    if len(value) > MAX_IN_VALUES:
+        raise FilterError(f"分区值最多支持 {MAX_IN_VALUES} 个")
+    for item in value:
+        if item is None or not isinstance(item, (str, int, float)) or isinstance(item, bool):
+            raise FilterError(f"无效的分区值：{item!r}")
+    return value
+
+
+def typed_column_literal(value: Any, data_type: str) -> str:
+    """
+    将 metadata 中的值转换为类型化列的 SQL 字面量
+    无法转换时抛出 ValueError，由调用方决定写入 NULL
+    """
+    if value is None:
+        return "NULL"
+    base_type = re.match(r"[a-z]*", data_type.lower()).group(0)
+    if base_type in ("int", "bigint", "tinyint", "smallint"):
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(f"{value!r} 不是整数")
+        return str(int(value))
+    if base_type in ("float", "double", "decimal"):
+        if isinstance(value, bool):
+            raise ValueError(f"{value!r} 不是数字")
+        return sql_literal(float(value))
+    if base_type == "boolean":
+        if isinstance(value, bool):
+            return sql_literal(value)
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return sql_literal(value.lower() == "true")
+        raise ValueError(f"{value!r} 不是布尔值")
+    if base_type in ("date", "timestamp"):
+        if not isinstance(value, str):
+            raise ValueError(f"{value!r} 不是日期字符串")
+        return f"{base_type.upper()} {sql_literal(value)}"
+    if isinstance(value, (dict, list)):
+        return sql_literal(json_codec.dumps(value))
+    return sql_literal(value if isinstance(value, str) else json_codec.dumps(value))
+
+
+def typed_columns_from_show_columns(rows: List[Tuple]) -> Dict[str, str]:
+    """
+    从 SHOW COLUMNS 的结果中提取类型化列（schema_name, table_name, column_name, data_type, comment）
+    只包含注释为 TYPED_COLUMN_COMMENT 的列，即创建集合时通过 metadata_fields 声明的列
+    """
+    columns = {}
+    for row in rows:
+        if (len(row) >= 5 and row[2] and str(row[2]).lower() not in CORE_COLUMNS
+                and str(row[4] or "") == TYPED_COLUMN_COMMENT):
+            columns[str(row[2])] = str(row[3])
+    return columns
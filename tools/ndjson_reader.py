@@ -0,0 +1,60 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from tools import json_codec
+
+# 流式读取文件时每次从网络读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_file_lines(file: Any) -> Iterator[bytes]:
+    """
+    逐行读取 Dify 文件：内容已加载时直接按行切分，否则通过文件 URL 流式下载，
+    内存占用与文件大小无关
+    """
+    blob = getattr(file, "_blob", None)
+    if blob is not None:
+        yield from blob.splitlines()
+        return
+
+    import httpx
+
+    try:
+        with httpx.stream("GET", file.url) as response:
+            response.raise_for_status()
+            pending = b""
+            for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+                pending += chunk
+                lines = pending.split(b"\n")
+                pending = lines.pop()
+                yield from lines
+            if pending:
+                yield pending
+    except httpx.UnsupportedProtocol as e:
+        raise ValueError(f"无效的文件地址 '{file.url}'：{str(e)}，请检查 FILES_URL 环境变量")
+
+
+def iter_ndjson_records(lines: Iterable[bytes]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """解析 NDJSON / JSONL，逐条产出 (行号, 记录)，跳过空行"""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json_codec.loads(line)
+        except ValueError as e:
+            raise ValueError(f"第 {line_no} 行不是合法的 JSON：{str(e)}")
+        if not isinstance(record, dict):
+            raise ValueError(f"第 {line_no} 行必须是 JSON 对象")
+        yield line_no, record
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """按固定大小分批，最后一批可能不足 size 个"""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,224 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "clickzetta_dify_"
+
+# 延迟直方图的桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+# 指标名称 -> (类型, 说明)
+METRIC_DEFINITIONS = {
+    "tool_calls_total": ("counter", "Tool invocations"),
+    "tool_errors_total": ("counter", "Tool invocations that failed"),
+    "tool_in_flight": ("gauge", "Tool invocations currently running"),
+    "tool_phase_duration_milliseconds": ("histogram", "Duration of tool invocation phases"),
+    "rows_inserted_total": ("counter", "Rows inserted into collections"),
+    "rows_returned_total": ("counter", "Rows returned to Dify"),
+    "sql_bytes_sent_total": ("counter", "Bytes of SQL text sent to Lakehouse"),
+    "slow_statements_total": ("counter", "Statements slower than LAKEHOUSE_SLOW_STATEMENT_MS"),
+    "connection_checkouts_total": ("counter", "Shared connection checkouts"),
+    "connection_wait_milliseconds": ("histogram", "Time spent waiting for the shared connection"),
+    "connections_created_total": ("counter", "Lakehouse connections established"),
+    "reconnects_total": ("counter", "Shared connections re-established after a network error"),
+    "statement_errors_total": ("counter", "Failed statement executions by error type"),
+    "statement_retries_total": ("counter", "Automatic statement retries by error type"),
+    "metadata_cache_hits_total": ("counter", "Schema metadata cache hits"),
+    "metadata_cache_misses_total": ("counter", "Schema metadata cache misses"),
+    "admission_in_flight": ("gauge", "Statements currently executing per vcluster"),
+    "admission_queued": ("gauge", "Statements waiting for an execution slot per vcluster"),
+    "admission_wait_milliseconds": ("histogram", "Time statements spent queued for an execution slot"),
+    "admission_rejections_total": ("counter", "Statements rejected by admission control"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（毫秒）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum_ms": round(self.sum, 3)
+        }
+
+
+class MetricsRegistry:
+    """插件进程内的计数器、仪表和直方图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, LatencyHistogram]] = {}
+
+    @staticmethod
+    def _label_key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """计数器累加"""
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        """仪表增减"""
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    def observe(self, name: str, value_ms: float, **labels) -> None:
+        """直方图记录一次观测值（毫秒）"""
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = LatencyHistogram()
+            histogram.observe(value_ms)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(self._label_key(labels), 0)
+
+    def histogram_snapshot(self, name: str) -> Dict[LabelKey, Dict[str, Any]]:
+        with self._lock:
+            return {key: histogram.snapshot() for key, histogram in self._histograms.get(name, {}).items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式导出所有指标"""
+        lines = []
+        with self._lock:
+            names = sorted(set(self._counters) | set(self._gauges) | set(self._histograms))
+            for name in names:
+                metric_type, help_text = METRIC_DEFINITIONS.get(name, ("untyped", name))
+                full_name = METRIC_PREFIX + name
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+
+                for source in (self._counters, self._gauges):
+                    for key, value in sorted(source.get(name, {}).items()):
+                        lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+                for key, histogram in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_key = key + (("le", _format_value(bound)),)
+                        lines.append(f"{full_name}_bucket{_format_labels(bucket_key)} {cumulative}")
+                    bucket_key = key + (("le", "+Inf"),)
+                    lines.append(f"{full_name}_bucket{_format_labels(bucket_key)} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = []
+    for label, value in key:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{label}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(round(value, 6))
+
+
+metrics = MetricsRegistry()
+
+
+def write_metrics_file(path: str) -> None:
+    """将指标写入文件（先写临时文件再替换，避免读到不完整的内容）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(metrics.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求频繁，不写访问日志
+        pass
+
+
+def start_metrics_exporter() -> Optional[threading.Thread]:
+    """
+    按环境变量启动指标导出：
+    - LAKEHOUSE_METRICS_PORT: 在 LAKEHOUSE_METRICS_HOST（默认 127.0.0.1）上提供 /metrics 接口
+    - LAKEHOUSE_METRICS_FILE: 每隔 LAKEHOUSE_METRICS_INTERVAL 秒（默认 15）写入一次文件
+    """
+    port = os.getenv("LAKEHOUSE_METRICS_PORT")
+    path = os.getenv("LAKEHOUSE_METRICS_FILE")
+    thread = None
+
+    if port:
+        host = os.getenv("LAKEHOUSE_METRICS_HOST", "127.0.0.1")
+        try:
+            server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to start metrics endpoint on {host}:{port}: {str(e)}")
+        else:
+            thread = threading.Thread(target=server.serve_forever, name="lakehouse-metrics-http", daemon=True)
+            thread.start()
+            logger.info(f"Serving plugin metrics on http://{host}:{port}/metrics")
+
+    if path:
+        interval = float(os.getenv("LAKEHOUSE_METRICS_INTERVAL", "15"))
+
+        def _write_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_metrics_file(path)
+                except Exception as e:
+                    logger.warning(f"Failed to write metrics file {path}: {str(e)}")
+
+        thread = threading.Thread(target=_write_loop, name="lakehouse-metrics-file", daemon=True)
+        thread.start()
+
+    return thread
@@ -0,0 +1,51 @@
+import os
+import time
+from typing import Optional
+
+# 两条进度消息之间的最小间隔（秒），0 表示每批都报告；在该时间内完成的操作不产生进度消息
+PROGRESS_INTERVAL = float(os.getenv("LAKEHOUSE_PROGRESS_INTERVAL", "1"))
+
+
+class ProgressReporter:
+    """
+    长时间操作的进度：已完成数量、已用时间，以及总量已知时按当前速度估算的剩余时间
+    用法：每完成一批调用 advance，返回值不为 None 时作为文本消息产出
+    """
+
+    def __init__(self, action: str, unit: str, total: Optional[int] = None, enabled: bool = True,
+                 interval: Optional[float] = None):
+        self.action = action
+        self.unit = unit
+        self.total = total
+        self.enabled = enabled
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.done = 0
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    def advance(self, count: int, note: str = "") -> Optional[str]:
+        """记录新完成的数量，到了报告间隔时返回进度文本；全部完成时不报告（随后会产出最终结果）"""
+        self.done += count
+        if not self.enabled:
+            return None
+        if self.total is not None and self.done >= self.total:
+            return None
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return None
+        self._last_report = now
+        return self.render(now, note)
+
+    def render(self, now: Optional[float] = None, note: str = "") -> str:
+        elapsed = (time.monotonic() if now is None else now) - self._start
+        if self.total:
+            text = f"⏳ {self.action} {self.done:,} / {self.total:,} {self.unit}（{self.done * 100 // self.total}%）"
+        else:
+            text = f"⏳ {self.action} {self.done:,} {self.unit}"
+        if note:
+            text += f"，{note}"
+        text += f"，已用 {elapsed:.1f} 秒"
+        if self.total and self.done:
+            remaining = elapsed * (self.total - self.done) / self.done
+            text += f"，预计剩余 {remaining:.1f} 秒"
+        return text + "\n"
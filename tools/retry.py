@@ -0,0 +1,133 @@
+import re
+import time
+import random
+import logging
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认重试次数和退避时间（秒），实际等待为 base * 2^n 加随机抖动，不超过上限
+DEFAULT_MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# 连接器错误分类：网络中断需要重建连接后重试，限流只需退避重试，
+# 认证错误、SQL 错误和连接器的作业超时（重试只会再跑一遍同样长的作业）不重试
+ERROR_NETWORK = "network"
+ERROR_THROTTLE = "throttle"
+ERROR_AUTH = "auth"
+ERROR_SYNTAX = "syntax"
+ERROR_JOB_TIMEOUT = "job_timeout"
+ERROR_OTHER = "other"
+
+
+def _http_status(*codes: str) -> str:
+    """只匹配 HTTP 状态上下文中的状态码（如 "HTTP 503"、"status code: 429"），避免匹配表名、ID 中的数字"""
+    return r"\b(?:http(?:/[\d.]+)?|status(?:[ _]code)?|code)\W{0,3}(?:%s)\b" % "|".join(codes)
+
+
+# 按顺序匹配错误消息（小写），先匹配到的分类生效
+ERROR_PATTERNS = tuple((category, re.compile("|".join(patterns))) for category, patterns in (
+    # 连接器的作业超时（"clickzetta sql job ... timeout after N seconds. killed by sdk."）
+    (ERROR_JOB_TIMEOUT, (r"killed by sdk", r"\bsql job\b[^\n]*\btimeout after \d+ seconds\b")),
+    (ERROR_SYNTAX, (r"syntax error", r"parse error", r"parseexception", r"cannot resolve", r"semantic")),
+    (ERROR_AUTH, (r"unauthorized", r"forbidden", r"authentication", r"access denied", r"permission denied",
+                  r"invalid credentials", r"token expired")),
+    (ERROR_THROTTLE, (r"too many requests", r"service unavailable", r"temporarily unavailable", r"try again",
+                      r"rate limit", r"throttl", r"concurrency limit", _http_status("429", "503"))),
+    (ERROR_NETWORK, (r"timeout", r"timed out", r"connection reset", r"connection refused", r"connection aborted",
+                     r"connection closed", r"broken pipe", r"remote end closed", r"network is unreachable",
+                     r"bad gateway", _http_status("502", "504"))),
+))
+
+# 重复执行结果不变的语句（只读语句、会话设置、带 IF [NOT] EXISTS 的 DDL）；WITH 语句按 CTE 之后的主语句判断
+_IDEMPOTENT_STATEMENT = re.compile(
+    r"^\s*(?:(?:select|show|desc|describe|explain|use|set)\b"
+    r"|create\s+(?:vector\s+|inverted\s+)?(?:table|index|schema)\s+if\s+not\s+exists\b"
+    r"|drop\s+(?:table|index|schema)\s+if\s+exists\b)",
+    re.IGNORECASE
+)
+_WITH_CLAUSE = re.compile(r"\s*with\s+(?:recursive\s+)?", re.IGNORECASE)
+_CTE_HEAD = re.compile(r"\s*`?\w+`?\s*(?:\([^()]*\)\s*)?as\s*\(", re.IGNORECASE)
+_CTE_SEPARATOR = re.compile(r"\s*,")
+
+
+def classify_error(error: BaseException) -> str:
+    """将连接器错误归类为 network / throttle / auth / syntax / job_timeout / other"""
+    message = str(error).lower()
+    for category, pattern in ERROR_PATTERNS:
+        if pattern.search(message):
+            return category
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return ERROR_NETWORK
+    return ERROR_OTHER
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """判断错误是否为超时、网络中断、限流等可重试的临时错误"""
+    return classify_error(error) in (ERROR_NETWORK, ERROR_THROTTLE)
+
+
+def _main_statement(sql: str) -> str:
+    """跳过 WITH 子句中的 CTE 定义，返回主语句；无法解析时返回空字符串（按非幂等处理）"""
+    match = _WITH_CLAUSE.match(sql)
+    if not match:
+        return sql
+    pos = match.end()
+    while True:
+        head = _CTE_HEAD.match(sql, pos)
+        if not head:
+            return ""
+        # 找到 CTE 定义的右括号，跳过字符串和引号标识符中的括号
+        depth, quote, pos = 1, None, head.end()
+        while pos < len(sql) and depth:
+            char = sql[pos]
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in "'\"`":
+                quote = char
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            pos += 1
+        if depth:
+            return ""
+        separator = _CTE_SEPARATOR.match(sql, pos)
+        if not separator:
+            return sql[pos:]
+        pos = separator.end()
+
+
+def is_idempotent_statement(sql: str) -> bool:
+    """判断语句重复执行是否安全：INSERT、UPDATE、DELETE 等写入语句（包括 WITH ... INSERT）不自动重试"""
+    return bool(_IDEMPOTENT_STATEMENT.match(_main_statement(sql)))
+
+
+def backoff_delay(attempt: int, base_delay: Optional[float] = None, max_delay: Optional[float] = None) -> float:
+    """第 attempt 次重试（从 0 开始）前的等待时间：指数退避加全抖动"""
+    base_delay = RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = RETRY_MAX_DELAY if max_delay is None else max_delay
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retry(func: Callable[[], Any], max_retries: int = DEFAULT_MAX_RETRIES,
+                    on_retry: Optional[Callable[[int, BaseException], None]] = None) -> Any:
+    """
+    调用 func，遇到临时错误时按指数退避重试，最多重试 max_retries 次
+    非临时错误和重试耗尽后的错误原样抛出；每次重试前调用 on_retry(重试序号, 错误)
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient_error(e):
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"临时错误，{delay:.2f} 秒后第 {attempt + 1} 次重试：{str(e)}")
+            if on_retry is not None:
+                on_retry(attempt + 1, e)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+from tools.admission_control import admission_controller
+from tools.plugin_metrics import metrics
+from tools.retry import (
+    DEFAULT_MAX_RETRIES, ERROR_NETWORK, backoff_delay, classify_error, is_idempotent_statement, is_transient_error
+)
+from tools.tool_timing import current_timer
+
+logger = logging.getLogger(__name__)
+
+# 超过该阈值（毫秒）的语句会被记录到慢语句日志
+SLOW_STATEMENT_MS = float(os.getenv("LAKEHOUSE_SLOW_STATEMENT_MS", "1000"))
+# 幂等语句遇到网络中断、限流等临时错误时的自动重试次数
+STATEMENT_MAX_RETRIES = int(os.getenv("LAKEHOUSE_STATEMENT_MAX_RETRIES", str(DEFAULT_MAX_RETRIES)))
+# 重建连接后需要重放的会话级语句
+_SESSION_STATEMENT = re.compile(r"^\s*(?:use|set)\b", re.IGNORECASE)
+_USE_VCLUSTER = re.compile(r"^\s*use\s+vcluster\s+`?(\w+)`?", re.IGNORECASE)
+# 指纹最大长度，避免超长 DDL / 过滤条件刷屏
+MAX_FINGERPRINT_LENGTH = 1000
+
+_VECTOR_LITERAL = re.compile(r"VECTOR\s*\(\s*[-+0-9.eE,\s]*\)", re.IGNORECASE)
+# metadata['key'] 中的键名保留，便于区分不同的过滤形态
+_STRING_LITERAL = re.compile(r"\['(?:[^']|'')*'\]|'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_REPEATED_TUPLE = re.compile(r"(\((?:[^()]|\([^()]*\))*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    生成语句指纹：去掉向量、字符串和数字字面量，合并重复的值列表
+    例如 1536 维的 VECTOR(...) 字面量会被替换为 VECTOR(?)
+    """
+    fingerprint = _VECTOR_LITERAL.sub("VECTOR(?)", sql)
+    fingerprint = _STRING_LITERAL.sub(lambda m: m.group(0) if m.group(0).startswith("[") else "?", fingerprint)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    fingerprint = _WHITESPACE.sub(" ", fingerprint).strip()
+    fingerprint = _PLACEHOLDER_LIST.sub("?, ...", fingerprint)
+    fingerprint = _REPEATED_TUPLE.sub(r"\1, ...", fingerprint)
+    if len(fingerprint) > MAX_FINGERPRINT_LENGTH:
+        fingerprint = fingerprint[:MAX_FINGERPRINT_LENGTH] + "..."
+    return fingerprint
+
+
+class SlowStatementLog:
+    """最近的慢语句记录（进程内，固定容量）"""
+
+    def __init__(self, capacity: int = 100):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=capacity)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_statement_log = SlowStatementLog()
+
+
+def _statement_context() -> Dict[str, Optional[str]]:
+    timer = current_timer()
+    if timer is None:
+        return {"tool": None, "collection": None}
+    return {"tool": timer.tool_name, "collection": timer.collection}
+
+
+class InstrumentedCursor:
+    """
+    包装连接器游标：统计发送字节数，记录慢语句和失败语句的指纹
+    网络中断后通过 reconnect 换用新连接上的游标（并重放 USE / SET 会话语句），
+    幂等语句遇到临时错误时按指数退避自动重试，写入语句只换连接不重试
+    vcluster 不为空时每条语句需先通过该 vcluster 的准入控制，执行 USE VCLUSTER 后改用新 vcluster 的名额
+    """
+
+    def __init__(self, cursor: Any, reconnect: Optional[Callable[[], Any]] = None, vcluster: Optional[str] = None):
+        self._cursor = cursor
+        self._reconnect = reconnect
+        self._vcluster = vcluster
+        self._session_statements: List[str] = []
+        self._stale = False
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._cursor.__exit__(exc_type, exc_val, exc_tb)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation: str, *args, **kwargs) -> Any:
+        context = _statement_context()
+        timer = current_timer()
+        metrics.inc("sql_bytes_sent_total", len(operation.encode("utf-8")), tool=context["tool"] or "")
+
+        attempt = 0
+        while True:
+            with self._admission():
+                start = time.perf_counter()
+                try:
+                    if self._stale:
+                        self._reopen()
+                    result = self._cursor.execute(operation, *args, **kwargs)
+                    break
+                except Exception as e:
+                    duration_ms = (time.perf_counter() - start) * 1000
+                    error_type = classify_error(e)
+                    # 网络中断后连接不可再用，下次执行前先换用新连接（写入语句失败时由调用方决定是否重试）
+                    if error_type == ERROR_NETWORK and self._reconnect is not None:
+                        self._stale = True
+                    retry = (attempt < STATEMENT_MAX_RETRIES and is_transient_error(e)
+                             and is_idempotent_statement(operation))
+                    logger.warning("Statement failed: " + json.dumps({
+                        "fingerprint": fingerprint_sql(operation),
+                        "duration_ms": round(duration_ms, 1),
+                        "error": str(e)[:500],
+                        "error_type": error_type,
+                        "attempt": attempt + 1,
+                        "will_retry": retry,
+                        **context
+                    }, ensure_ascii=False))
+                    metrics.inc("statement_errors_total", tool=context["tool"] or "", error_type=error_type)
+                    if not retry:
+                        if timer is not None:
+                            timer.error_type = error_type
+                        raise
+                    metrics.inc("statement_retries_total", tool=context["tool"] or "", error_type=error_type)
+                    if timer is not None:
+                        timer.count_retry()
+            # 退避等待期间不占用 vcluster 的执行名额
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+        if timer is not None:
+            timer.error_type = None
+        if _SESSION_STATEMENT.match(operation):
+            self._session_statements.append(operation)
+            use_vcluster = _USE_VCLUSTER.match(operation)
+            if use_vcluster and self._vcluster is not None:
+                self._vcluster = use_vcluster.group(1)
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= SLOW_STATEMENT_MS:
+            rows = getattr(self._cursor, "rowcount", -1)
+            entry = {
+                "fingerprint": fingerprint_sql(operation),
+                "duration_ms": round(duration_ms, 1),
+                "rows": rows if isinstance(rows, int) and rows >= 0 else None,
+                **context
+            }
+            slow_statement_log.record(entry)
+            metrics.inc("slow_statements_total", tool=context["tool"] or "")
+            logger.warning("Slow statement: " + json.dumps(entry, ensure_ascii=False))
+        return result
+
+    def _admission(self):
+        if self._vcluster is None:
+            return nullcontext()
+        return admission_controller.admit(self._vcluster)
+
+    def _reopen(self) -> None:
+        """换用新连接上的游标，并按顺序重放此前执行过的会话语句"""
+        try:
+            self._cursor.close()
+        except Exception as e:
+            logger.debug(f"关闭中断连接上的游标失败：{str(e)}")
+        self._cursor = self._reconnect().cursor()
+        self._stale = False
+        for statement in self._session_statements:
+            self._cursor.execute(statement)
+
+
+class InstrumentedConnection:
+    """
+    包装连接器连接，使 cursor() 返回 InstrumentedCursor
+    reconnect(中断的连接) 返回可用的新连接，由游标在网络中断后调用；vcluster 为语句准入控制使用的 vcluster
+    """
+
+    def __init__(self, connection: Any, reconnect: Optional[Callable[[Any], Any]] = None,
+                 vcluster: Optional[str] = None):
+        self._connection = connection
+        self._reconnect = reconnect
+        self._vcluster = vcluster
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    def cursor(self) -> InstrumentedCursor:
+        reconnect = self._reopen_connection if self._reconnect is not None else None
+        return InstrumentedCursor(self._connection.cursor(), reconnect, self._vcluster)
+
+    def _reopen_connection(self) -> Any:
+        self._connection = self._reconnect(self._connection)
+        return self._connection
+
+
+def get_slow_statements() -> List[Dict[str, Any]]:
+    """获取最近记录的慢语句"""
+    return slow_statement_log.entries()
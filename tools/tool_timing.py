@@ -0,0 +1,154 @@
+import time
+import functools
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from dify_plugin.entities.tool import ToolInvokeMessage
+from tools.plugin_metrics import metrics
+
+_local = threading.local()
+
+
+class ToolTimer:
+    """
+    记录单次工具调用各阶段的耗时
+    run_concurrently 的任务在多个线程中同时更新计时器，更新时持有锁；并发任务中的阶段相互重叠，
+    单独累计为 <阶段>_cumulative，并发部分的墙钟时间记为 concurrent 阶段，其余阶段之和不超过 total
+    """
+
+    def __init__(self, tool_name: str, collection: Optional[str] = None):
+        self.tool_name = tool_name
+        self.collection = collection
+        self.phases: Dict[str, float] = {}
+        # 本次调用中语句的自动重试次数，以及最近一次失败语句的错误分类（成功执行后清空）
+        self.statement_retries = 0
+        self.error_type: Optional[str] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        if getattr(_local, "concurrent", False):
+            name += "_cumulative"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count_retry(self) -> None:
+        """记录一次语句自动重试"""
+        with self._lock:
+            self.statement_retries += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def timings_ms(self) -> Dict[str, float]:
+        """各阶段耗时（毫秒），total 为调用开始至今的总耗时"""
+        with self._lock:
+            timings = {name: round(value, 3) for name, value in self.phases.items()}
+        timings["total"] = round(self.elapsed_ms(), 3)
+        return timings
+
+    def record(self) -> None:
+        """将本次调用的耗时写入进程内直方图"""
+        with self._lock:
+            phases = dict(self.phases)
+        for name, value in phases.items():
+            metrics.observe("tool_phase_duration_milliseconds", value, tool=self.tool_name, phase=name)
+        metrics.observe("tool_phase_duration_milliseconds", self.elapsed_ms(), tool=self.tool_name, phase="total")
+
+
+def current_timer() -> Optional[ToolTimer]:
+    """返回当前线程中正在执行的工具调用的计时器"""
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def use_timer(timer: Optional[ToolTimer], concurrent: bool = False):
+    """
+    在当前线程中临时激活指定的计时器（把工具调用的上下文带到执行器的工作线程中）
+    concurrent 为 true 表示与同一调用的其他任务并发执行，阶段耗时记为 <阶段>_cumulative
+    """
+    previous, _local.timer = current_timer(), timer
+    previous_concurrent, _local.concurrent = getattr(_local, "concurrent", False), concurrent
+    try:
+        yield
+    finally:
+        _local.timer = previous
+        _local.concurrent = previous_concurrent
+
+
+@contextmanager
+def timed_phase(name: str):
+    """在当前工具调用的计时器中记录一个阶段；不在工具调用中时不做任何事"""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def timed_invoke(tool_name: str):
+    """
+    工具 _invoke 的计时装饰器
+    只在生成器实际执行时激活计时器，工具参数 include_timings 为 true 时在 JSON 消息中附加 timings_ms
+    发生过语句自动重试时附加 statement_retries，失败结果附加导致失败的连接器错误分类 error_type
+    同时记录调用次数、失败次数（抛出异常或返回 success=false）和正在执行的调用数
+    """
+    def decorator(invoke):
+        @functools.wraps(invoke)
+        def wrapper(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+            timer = ToolTimer(tool_name, tool_parameters.get("collection_name") or None)
+            include_timings = bool(tool_parameters.get("include_timings", False))
+            failed = False
+            metrics.inc("tool_calls_total", tool=tool_name)
+            metrics.add_gauge("tool_in_flight", 1, tool=tool_name)
+            messages = invoke(self, tool_parameters)
+            try:
+                while True:
+                    previous, _local.timer = current_timer(), timer
+                    try:
+                        message = next(messages)
+                    except StopIteration:
+                        break
+                    except Exception:
+                        failed = True
+                        raise
+                    finally:
+                        _local.timer = previous
+
+                    if message.type == ToolInvokeMessage.MessageType.JSON \
+                            and isinstance(message.message.json_object, dict):
+                        if message.message.json_object.get("success") is False:
+                            failed = True
+                            if timer.error_type:
+                                message.message.json_object.setdefault("error_type", timer.error_type)
+                        if timer.statement_retries:
+                            message.message.json_object["statement_retries"] = timer.statement_retries
+                        if include_timings:
+                            message.message.json_object["timings_ms"] = timer.timings_ms()
+                    yield message
+            finally:
+                messages.close()
+                timer.record()
+                metrics.add_gauge("tool_in_flight", -1, tool=tool_name)
+                if failed:
+                    metrics.inc("tool_errors_total", tool=tool_name)
+        return wrapper
+    return decorator
+
+
+def get_timing_snapshot() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """获取进程内聚合的延迟直方图，返回 {工具: {阶段: 直方图}} 结构"""
+    result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for key, snapshot in metrics.histogram_snapshot("tool_phase_duration_milliseconds").items():
+        labels = dict(key)
+        result.setdefault(labels["tool"], {})[labels["phase"]] = snapshot
+    return result
@@ -1,15 +1,18 @@
 from collections.abc import Generator
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 import json
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import TYPED_COLUMN_COMMENT, sql_literal
+from tools.tool_timing import timed_invoke, timed_phase
 from tools.vector_tool_mixin import VectorToolMixin
 
 class VectorCollectionCreateTool(Tool, VectorToolMixin):
     """创建向量集合（表）工具"""
     
+    @timed_invoke("vector_collection_create")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
@@ -17,11 +20,31 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
         id_type = tool_parameters.get("id_type", "string")
         metadata_fields = tool_parameters.get("metadata_fields", "")
         create_index = tool_parameters.get("create_index", True)
+        partition_by = (tool_parameters.get("partition_by") or "").strip()
+        cluster_by = tool_parameters.get("cluster_by") or ""
+        cluster_buckets = tool_parameters.get("cluster_buckets", 16)
         
         if not collection_name:
             yield self.create_text_message("错误：集合名称不能为空")
             return
         
+        typed_fields = self._parse_metadata_fields(metadata_fields)
+        
+        # 分区列和聚簇列必须是 id 或 metadata_fields 中声明的类型化列
+        declared_columns = {"id"} | {name.lower() for name, _ in typed_fields}
+        cluster_columns = [c.strip() for c in cluster_by.split(",") if c.strip()]
+        for column in ([partition_by] if partition_by else []) + cluster_columns:
+            if column.lower() not in declared_columns:
+                yield self.create_text_message(f"错误：分区/聚簇列 {column} 必须是 id 或 metadata_fields 中声明的字段")
+                return
+        try:
+            cluster_buckets = int(cluster_buckets)
+        except (TypeError, ValueError):
+            cluster_buckets = 0
+        if cluster_columns and cluster_buckets <= 0:
+            yield self.create_text_message("错误：cluster_buckets 必须是正整数")
+            return
+        
         # 获取连接配置
         config = self._get_connection_config(tool_parameters)
         
@@ -49,30 +72,39 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                 # 构建创建表的 SQL (与dify主项目保持一致)
                 id_column_type = "STRING" if id_type == "string" else "BIGINT"
                 
+                column_definitions = [
+                    f"id {id_column_type} NOT NULL",
+                    "page_content STRING NOT NULL",
+                    "metadata JSON",
+                    f"vector VECTOR(FLOAT, {dimension}) NOT NULL"
+                ]
+                
+                # 添加额外的元数据字段，注释标记为插件声明的类型化列
+                for field_name, field_type in typed_fields:
+                    column_definitions.append(f"{field_name} {field_type} COMMENT {sql_literal(TYPED_COLUMN_COMMENT)}")
+                
+                # 分区表的主键需要包含分区列
+                if partition_by and partition_by.lower() != "id":
+                    column_definitions.append(f"PRIMARY KEY (id, {partition_by})")
+                else:
+                    column_definitions.append("PRIMARY KEY (id)")
+                columns_sql = ",\n                    ".join(column_definitions)
                 create_table_sql = f"""
                 CREATE TABLE IF NOT EXISTS {schema}.{collection_name} (
-                    id {id_column_type} NOT NULL,
-                    page_content STRING NOT NULL,
-                    metadata JSON,
-                    vector VECTOR(FLOAT, {dimension}) NOT NULL,
-                    PRIMARY KEY (id)
+                    {columns_sql}
                 )
                 """
-                
-                # 添加额外的元数据字段
-                if metadata_fields:
-                    fields = [f.strip() for f in metadata_fields.split(",")]
-                    for field in fields:
-                        if ":" in field:
-                            field_name, field_type = field.split(":", 1)
-                            field_type = field_type.strip().upper()
-                            if field_type in ["STRING", "INT", "BIGINT", "FLOAT", "DOUBLE", "BOOLEAN", "DATE", "TIMESTAMP"]:
-                                create_table_sql += f",\n    {field_name.strip()} {field_type}"
-                
-                create_table_sql += ",\n    PRIMARY KEY (id)\n)"
+                # 按分区列和聚簇列组织数据文件，过滤这些列时可以跳过无关文件
+                if partition_by:
+                    create_table_sql += f"PARTITIONED BY ({partition_by})\n"
+                if cluster_columns:
+                    create_table_sql += f"CLUSTERED BY ({', '.join(cluster_columns)}) INTO {cluster_buckets} BUCKETS\n"
                 
                 # 执行创建表
-                cursor.execute(create_table_sql)
+                with timed_phase("execute"):
+                    cursor.execute(create_table_sql)
+                conn_manager.invalidate_metadata(f"columns:{schema}.{collection_name}")
+                conn_manager.invalidate_metadata(f"partition:{schema}.{collection_name}")
                 
                 # 创建向量索引 (与dify主项目保持一致)
                 if create_index:
@@ -89,7 +121,8 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                         "ef.construction" = "128"
                     )
                     """
-                    cursor.execute(vector_index_sql)
+                    with timed_phase("create_index"):
+                        cursor.execute(vector_index_sql)
                     
                     # 创建倒排索引用于全文搜索
                     text_index_name = f"idx_{collection_name}_text"
@@ -103,7 +136,8 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                     )
                     """
                     try:
-                        cursor.execute(text_index_sql)
+                        with timed_phase("create_index"):
+                            cursor.execute(text_index_sql)
                     except Exception as e:
                         # 倒排索引失败不影响主要功能
                         pass
@@ -115,6 +149,10 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                 success_msg += f"- 表结构：id, page_content, metadata, vector\n"
                 if metadata_fields:
                     success_msg += f"- 元数据字段：{metadata_fields}\n"
+                if partition_by:
+                    success_msg += f"- 分区列：{partition_by}\n"
+                if cluster_columns:
+                    success_msg += f"- 聚簇列：{', '.join(cluster_columns)}（{cluster_buckets} 个桶）\n"
                 if create_index:
                     success_msg += f"- 已创建 HNSW 向量索引\n"
                     success_msg += f"- 已创建倒排索引（全文搜索）"
@@ -127,6 +165,8 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                     "dimension": dimension,
                     "id_type": id_type,
                     "metadata_fields": metadata_fields,
+                    "partition_by": partition_by or None,
+                    "cluster_by": cluster_columns,
                     "index_created": create_index
                 })
                 
@@ -139,3 +179,15 @@ class VectorCollectionCreateTool(Tool, VectorToolMixin):
                 "collection_name": collection_name
             })
     
+    def _parse_metadata_fields(self, metadata_fields: str) -> List[Tuple[str, str]]:
+        """解析 "field1:TYPE,field2:TYPE" 形式的元数据字段定义，忽略不支持的类型"""
+        fields = []
+        if metadata_fields:
+            for field in metadata_fields.split(","):
+                field = field.strip()
+                if ":" in field:
+                    field_name, field_type = field.split(":", 1)
+                    field_type = field_type.strip().upper()
+                    if field_type in ["STRING", "INT", "BIGINT", "FLOAT", "DOUBLE", "BOOLEAN", "DATE", "TIMESTAMP"]:
+                        fields.append((field_name.strip(), field_type))
+        return fields
@@ -5,11 +5,13 @@ import json
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.lakehouse_connection import LakehouseConnection
+from tools.tool_timing import timed_invoke, timed_phase
 from tools.vector_tool_mixin import VectorToolMixin
 
 class VectorCollectionDeleteTool(Tool, VectorToolMixin):
     """删除向量集合工具"""
     
+    @timed_invoke("vector_collection_delete")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
@@ -87,7 +89,10 @@ class VectorCollectionDeleteTool(Tool, VectorToolMixin):
                 
                 # 执行删除操作
                 drop_sql = f"DROP TABLE IF EXISTS {schema}.{collection_name}"
-                cursor.execute(drop_sql)
+                with timed_phase("execute"):
+                    cursor.execute(drop_sql)
+                conn_manager.invalidate_metadata(f"columns:{schema}.{collection_name}")
+                conn_manager.invalidate_metadata(f"partition:{schema}.{collection_name}")
                 
                 # 构建成功消息
                 success_msg = f"成功删除向量集合：{collection_name}\n"
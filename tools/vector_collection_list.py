@@ -5,11 +5,14 @@ import json
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.lakehouse_connection import LakehouseConnection
+from tools.progress import ProgressReporter
+from tools.tool_timing import timed_invoke, timed_phase
 from tools.vector_tool_mixin import VectorToolMixin
 
 class VectorCollectionListTool(Tool, VectorToolMixin):
     """列出所有向量集合工具"""
     
+    @timed_invoke("vector_collection_list")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取连接配置
         config = self._get_connection_config(tool_parameters)
@@ -17,7 +20,7 @@ class VectorCollectionListTool(Tool, VectorToolMixin):
         try:
             # 获取连接
             conn_manager = LakehouseConnection()
-            connection = conn_manager.get_connection(config)
+            connection = conn_manager.get_connection(config, read_only=True)
             
             with connection.cursor() as cursor:
                 # 获取schema，如果工具参数中没有指定，则使用当前schema
@@ -34,8 +37,9 @@ class VectorCollectionListTool(Tool, VectorToolMixin):
                     return
                 
                 # 首先获取所有表
-                cursor.execute(f"SHOW TABLES IN {schema}")
-                tables = cursor.fetchall()
+                with timed_phase("show_tables"):
+                    cursor.execute(f"SHOW TABLES IN {schema}")
+                    tables = cursor.fetchall()
                 
                 collections = []
                 
@@ -45,7 +49,14 @@ class VectorCollectionListTool(Tool, VectorToolMixin):
                     first_row = tables[0]
                     # print(f"DEBUG: SHOW TABLES returned {len(first_row)} columns: {first_row}")
                 
-                for table_row in tables:
+                progress = ProgressReporter("已检查", "张表", len(tables), enabled=tool_parameters.get("progress", True))
+                for table_index, table_row in enumerate(tables):
+                    # 上一张表已检查完（循环体中有多处 continue，因此在下一轮开始时报告进度）
+                    if table_index:
+                        progress_text = progress.advance(1, f"找到 {len(collections)} 个向量集合")
+                        if progress_text:
+                            yield self.create_text_message(progress_text)
+                    
                     # SHOW TABLES 返回格式: schema_name, table_name, is_view, is_materialized_view, is_external, is_dynamic
                     if not table_row or len(table_row) < 2:
                         continue
@@ -65,11 +76,12 @@ class VectorCollectionListTool(Tool, VectorToolMixin):
                     
                     # 检查这个表是否有 vector 列（与dify主项目保持一致）
                     try:
-                        cursor.execute(f"SHOW COLUMNS IN {schema}.{table_name}")
+                        with timed_phase("show_columns"):
+                            cursor.execute(f"SHOW COLUMNS IN {schema}.{table_name}")
+                            columns = cursor.fetchall()
                     except Exception as e:
                         # 如果查询失败，跳过这个表
                         continue
-                    columns = cursor.fetchall()
                     
                     has_vector = False
                     vector_type = None
@@ -103,15 +115,17 @@ class VectorCollectionListTool(Tool, VectorToolMixin):
                             pass
                     
                     # 获取表的记录数
-                    cursor.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}")
-                    count_result = cursor.fetchone()
+                    with timed_phase("count"):
+                        cursor.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}")
+                        count_result = cursor.fetchone()
                     row_count = count_result[0] if count_result else 0
                     
                     # 检查是否有向量索引
                     has_index = False
                     try:
-                        cursor.execute(f"SHOW INDEX FROM {schema}.{table_name}")
-                        index_rows = cursor.fetchall()
+                        with timed_phase("show_index"):
+                            cursor.execute(f"SHOW INDEX FROM {schema}.{table_name}")
+                            index_rows = cursor.fetchall()
                         for index_row in index_rows:
                             # 检查索引名或类型中是否包含向量相关信息
                             # SHOW INDEX 返回的格式可能因版本而异
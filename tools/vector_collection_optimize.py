@@ -5,11 +5,13 @@ import json
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.lakehouse_connection import LakehouseConnection
+from tools.tool_timing import timed_invoke, timed_phase
 from tools.vector_tool_mixin import VectorToolMixin
 
 class VectorCollectionOptimizeTool(Tool, VectorToolMixin):
     """优化向量集合工具"""
     
+    @timed_invoke("vector_collection_optimize")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
@@ -60,7 +62,8 @@ class VectorCollectionOptimizeTool(Tool, VectorToolMixin):
                 yield self.create_text_message(f"验证优化集群：{optimize_vcluster}")
                 
                 # 步骤3：验证优化集群是否存在且类型正确
-                vcluster_info = self._validate_vcluster(cursor, optimize_vcluster)
+                with timed_phase("vcluster_validation"):
+                    vcluster_info = self._validate_vcluster(cursor, optimize_vcluster)
                 if not vcluster_info["exists"]:
                     yield self.create_text_message(f"❌ 优化集群不存在：{optimize_vcluster}")
                     return
@@ -87,7 +90,8 @@ class VectorCollectionOptimizeTool(Tool, VectorToolMixin):
                 # 步骤5：执行optimize命令
                 try:
                     optimize_sql = f"optimize {schema}.{collection_name}"
-                    cursor.execute(optimize_sql)
+                    with timed_phase("execute"):
+                        cursor.execute(optimize_sql)
                     yield self.create_text_message(f"✓ 向量集合优化命令已执行")
                 except Exception as e:
                     yield self.create_text_message(f"❌ 优化命令执行失败：{str(e)}")
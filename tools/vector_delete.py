@@ -1,30 +1,49 @@
 from collections.abc import Generator
 from typing import Any, Dict, List
-import json
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
+from tools import json_codec
 from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import FilterError, parse_filter, parse_partition_values
+from tools.ndjson_reader import batched
+from tools.progress import ProgressReporter
+from tools.tool_timing import timed_invoke, timed_phase
 from tools.vector_tool_mixin import VectorToolMixin
 
+# 按 ID 删除时每条 DELETE 语句的 ID 数
+DELETE_BATCH_SIZE = 1000
+
 class VectorDeleteTool(Tool, VectorToolMixin):
     """向量删除工具"""
     
+    @timed_invoke("vector_delete")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
         ids = tool_parameters.get("ids", "")
         filter_expr = tool_parameters.get("filter_expr", "")
+        metadata_filter = tool_parameters.get("metadata_filter", "")
+        partition_values = tool_parameters.get("partition_values", "")
         
         if not collection_name:
             yield self.create_text_message("错误：集合名称不能为空")
             return
         
-        if not ids and not filter_expr:
-            yield self.create_text_message("错误：必须提供 ID 列表或过滤条件")
+        try:
+            filter_spec = parse_filter(metadata_filter)
+            partition_values = parse_partition_values(partition_values)
+        except FilterError as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+        
+        has_filter = bool(filter_expr) or filter_spec is not None
+        # 单独提供分区值时删除整个分区；与 ID 列表或过滤条件同时提供时只在这些分区内删除
+        if not ids and not has_filter and not partition_values:
+            yield self.create_text_message("错误：必须提供 ID 列表、过滤条件或分区值")
             return
         
-        if ids and filter_expr:
+        if ids and has_filter:
             yield self.create_text_message("错误：不能同时使用 ID 列表和过滤条件")
             return
         
@@ -33,7 +52,7 @@ class VectorDeleteTool(Tool, VectorToolMixin):
         if ids:
             try:
                 if isinstance(ids, str):
-                    ids = json.loads(ids)
+                    ids = json_codec.loads(ids)
                 if not isinstance(ids, list):
                     ids = [ids]
                 parsed_ids = ids
@@ -43,6 +62,8 @@ class VectorDeleteTool(Tool, VectorToolMixin):
         
         # 获取连接配置
         config = self._get_connection_config(tool_parameters)
+        # 分批删除不是原子的，失败时报告此前的批次已删除的数量
+        delete_count = 0
         
         try:
             # 获取连接
@@ -64,6 +85,10 @@ class VectorDeleteTool(Tool, VectorToolMixin):
                     })
                     return
                 
+                partition_predicate = ""
+                if partition_values:
+                    partition_predicate = self._partition_predicate(cursor, schema, collection_name, partition_values)
+                
                 # 首先获取要删除的记录数（用于反馈）
                 if parsed_ids:
                     # 构建 ID 列表字符串
@@ -74,29 +99,55 @@ class VectorDeleteTool(Tool, VectorToolMixin):
                         else:
                             id_list.append(str(id_val))
                     
-                    count_sql = f"""
-                    SELECT COUNT(*) FROM {schema}.{collection_name}
-                    WHERE id IN ({','.join(id_list)})
-                    """
-                    delete_sql = f"""
-                    DELETE FROM {schema}.{collection_name}
-                    WHERE id IN ({','.join(id_list)})
-                    """
+                    partition_clause = f" AND {partition_predicate}" if partition_predicate else ""
+                    # ID 较多时分批统计并删除，每批之后报告进度
+                    delete_batches = []
+                    for chunk in batched(id_list, DELETE_BATCH_SIZE):
+                        chunk_clause = f"id IN ({','.join(chunk)}){partition_clause}"
+                        delete_batches.append((
+                            f"SELECT COUNT(*) FROM {schema}.{collection_name} WHERE {chunk_clause}",
+                            f"DELETE FROM {schema}.{collection_name} WHERE {chunk_clause}",
+                            len(chunk),
+                        ))
                 else:
-                    # 使用过滤条件
+                    # 使用过滤条件（原始表达式和结构化条件同时提供时取交集）
+                    conditions = []
+                    if partition_predicate:
+                        conditions.append(partition_predicate)
+                    if filter_expr:
+                        conditions.append(f"({filter_expr})")
+                    if filter_spec is not None:
+                        conditions.append(self._compile_metadata_filter(cursor, schema, collection_name, filter_spec))
+                    where_clause = " AND ".join(conditions)
+                    
                     count_sql = f"""
                     SELECT COUNT(*) FROM {schema}.{collection_name}
-                    WHERE {filter_expr}
+                    WHERE {where_clause}
                     """
                     delete_sql = f"""
                     DELETE FROM {schema}.{collection_name}
-                    WHERE {filter_expr}
+                    WHERE {where_clause}
                     """
+                    delete_batches = [(count_sql, delete_sql, 0)]
                 
-                # 获取将被删除的记录数
-                cursor.execute(count_sql)
-                count_result = cursor.fetchone()
-                delete_count = count_result[0] if count_result else 0
+                # 每批先统计将被删除的记录数（用于反馈），有匹配时再删除
+                report_progress = tool_parameters.get("progress", True)
+                progress = ProgressReporter("已处理", "个 ID", len(parsed_ids), enabled=report_progress)
+                for batch_index, (count_sql, delete_sql, id_count) in enumerate(delete_batches):
+                    with timed_phase("count"):
+                        cursor.execute(count_sql)
+                        count_result = cursor.fetchone()
+                    batch_count = count_result[0] if count_result else 0
+                    if batch_count:
+                        if report_progress and not parsed_ids and batch_count >= DELETE_BATCH_SIZE:
+                            # 按条件删除只有一条语句，执行前先告知匹配的数量
+                            yield self.create_text_message(f"⏳ 匹配到 {batch_count:,} 个向量，正在删除...\n")
+                        with timed_phase("execute"):
+                            cursor.execute(delete_sql)
+                        delete_count += batch_count
+                    progress_text = progress.advance(id_count, f"第 {batch_index + 1} 批")
+                    if progress_text:
+                        yield self.create_text_message(progress_text)
                 
                 if delete_count == 0:
                     yield self.create_text_message("没有找到匹配的记录")
@@ -108,9 +159,6 @@ class VectorDeleteTool(Tool, VectorToolMixin):
                     })
                     return
                 
-                # 执行删除
-                cursor.execute(delete_sql)
-                
                 # 成功消息
                 if parsed_ids:
                     success_msg = f"成功从集合 {collection_name} 中删除 {delete_count} 个向量"
@@ -118,7 +166,7 @@ class VectorDeleteTool(Tool, VectorToolMixin):
                         success_msg += f"\n注意：请求删除 {len(parsed_ids)} 个，实际删除 {delete_count} 个"
                 else:
                     success_msg = f"成功从集合 {collection_name} 中删除 {delete_count} 个向量\n"
-                    success_msg += f"使用的过滤条件：{filter_expr}"
+                    success_msg += f"使用的过滤条件：{where_clause}"
                 
                 yield self.create_text_message(success_msg)
                 
@@ -126,16 +174,20 @@ class VectorDeleteTool(Tool, VectorToolMixin):
                     "success": True,
                     "collection_name": collection_name,
                     "deleted_count": delete_count,
-                    "method": "ids" if parsed_ids else "filter",
-                    "criteria": parsed_ids if parsed_ids else filter_expr
+                    "method": "ids" if parsed_ids else ("filter" if has_filter else "partition"),
+                    "partition_values": partition_values or None,
+                    "criteria": parsed_ids if parsed_ids else where_clause
                 })
                 
         except Exception as e:
             error_msg = f"删除向量失败：{str(e)}"
+            if delete_count:
+                error_msg += f"（此前已删除 {delete_count} 个向量）"
             yield self.create_text_message(error_msg)
             yield self.create_json_message({
                 "success": False,
                 "error": str(e),
-                "collection_name": collection_name
+                "collection_name": collection_name,
+                "deleted_count": delete_count
             })
     
@@ -0,0 +1,50 @@
+import base64
+import binascii
+from typing import Any, Optional
+
+from tools import json_codec
+
+# 向量参数支持的编码：JSON 浮点数组，或 base64 编码的小端 float32 字节
+VECTOR_ENCODINGS = ("json", "base64_float32")
+
+
+def decode_base64_float32(data: Any, dimension: Optional[int] = None):
+    """
+    将 base64 编码的小端 float32 字节解码为 NumPy 数组（直接引用解码后的缓冲区，不复制）
+    未指定维度时视为单个向量；指定维度时按行优先拆分为矩阵，返回形状为 (向量数, 维度) 的二维数组
+    """
+    import numpy as np
+
+    if isinstance(data, str):
+        data = data.strip()
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError(f"base64 解码失败：{str(e)}")
+    if not raw or len(raw) % 4:
+        raise ValueError(f"float32 数据长度必须是 4 的正整数倍，实际 {len(raw)} 字节")
+
+    values = np.frombuffer(raw, dtype="<f4")
+    if not np.isfinite(values).all():
+        raise ValueError("向量中包含 NaN 或无穷大")
+    if not dimension:
+        return values.reshape(1, -1)
+    dimension = int(dimension)
+    if dimension <= 0 or len(values) % dimension:
+        raise ValueError(f"数据包含 {len(values)} 个 float32，不能按维度 {dimension} 拆分")
+    return values.reshape(-1, dimension)
+
+
+def parse_vectors(data: Any, encoding: str = "json", dimension: Optional[int] = None):
+    """按编码解析一个或多个向量，返回可按行迭代的向量序列（列表或二维 NumPy 数组）"""
+    encoding = (encoding or "json").lower()
+    if encoding == "json":
+        return json_codec.loads_vectors(data)
+    if encoding == "base64_float32":
+        return decode_base64_float32(data, dimension)
+    raise ValueError(f"不支持的向量编码：{encoding}。支持的选项：{', '.join(VECTOR_ENCODINGS)}")
+
+
+def format_vector(vector: Any) -> str:
+    """将向量格式化为 SQL 的 VECTOR(...) 字面量"""
+    return f"VECTOR({','.join(map(str, vector))})"
@@ -0,0 +1,332 @@
+from collections.abc import Generator
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import sql_literal, typed_column_literal
+from tools.plugin_metrics import metrics
+from tools.tool_timing import timed_invoke, timed_phase
+from tools.vector_tool_mixin import VectorToolMixin
+
+# 每批写入的默认行数和上限
+DEFAULT_INGEST_BATCH_SIZE = 50000
+MAX_INGEST_BATCH_SIZE = 1000000
+
+# append：只追加；sync：按水位增量同步，已存在的 ID 先删后写，并按删除标记列删除
+INGEST_MODES = ("append", "sync")
+# 保存每个集合同步水位的状态表
+SYNC_STATE_TABLE = "vector_sync_state"
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _check_identifier(name: str, label: str) -> str:
+    if not _IDENTIFIER.match(name or ""):
+        raise ValueError(f"无效的{label}：{name}")
+    return name
+
+
+def bound_literal(value: Any) -> str:
+    """将水位或 ID 边界值转为 SQL 字面量：数字原样输出，时间按 TIMESTAMP 字面量输出，其余按字符串输出"""
+    if isinstance(value, datetime):
+        return f"TIMESTAMP {sql_literal(value.strftime('%Y-%m-%d %H:%M:%S.%f'))}"
+    if isinstance(value, date):
+        return f"DATE {sql_literal(value.isoformat())}"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return sql_literal(value)
+    return sql_literal(str(value))
+
+
+class VectorIngestTableTool(Tool, VectorToolMixin):
+    """从 Lakehouse 源表导入向量的工具（INSERT ... SELECT，数据不经过 Dify）"""
+
+    @timed_invoke("vector_ingest_table")
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        # 获取参数
+        collection_name = tool_parameters.get("collection_name", "").strip()
+        source_table = (tool_parameters.get("source_table") or "").strip()
+        id_column = (tool_parameters.get("id_column") or "id").strip()
+        content_column = (tool_parameters.get("content_column") or "content").strip()
+        vector_column = (tool_parameters.get("vector_column") or "vector").strip()
+        metadata_column = (tool_parameters.get("metadata_column") or "").strip()
+        metadata_columns = tool_parameters.get("metadata_columns") or ""
+        watermark_column = (tool_parameters.get("watermark_column") or "").strip()
+        watermark_from = tool_parameters.get("watermark_from")
+        batch_size = tool_parameters.get("batch_size", DEFAULT_INGEST_BATCH_SIZE)
+        mode = (tool_parameters.get("mode") or "append").strip().lower()
+        tombstone_column = (tool_parameters.get("tombstone_column") or "").strip()
+
+        if not collection_name:
+            yield self.create_text_message("错误：集合名称不能为空")
+            return
+
+        if not source_table:
+            yield self.create_text_message("错误：源表不能为空")
+            return
+
+        try:
+            source = ".".join(_check_identifier(part, "源表名") for part in source_table.split("."))
+            if source.count(".") > 1:
+                raise ValueError(f"无效的源表名：{source_table}")
+            for column, label in ((id_column, "ID 列"), (content_column, "内容列"), (vector_column, "向量列")):
+                _check_identifier(column, label)
+            if metadata_column:
+                _check_identifier(metadata_column, "元数据列")
+            metadata_columns = [_check_identifier(c.strip(), "元数据列")
+                                for c in str(metadata_columns).split(",") if c.strip()]
+            if metadata_column and metadata_columns:
+                raise ValueError("metadata_column 和 metadata_columns 只能提供一个")
+            if watermark_column:
+                _check_identifier(watermark_column, "水位列")
+            if mode not in INGEST_MODES:
+                raise ValueError(f"不支持的导入模式：{mode}。支持的选项：{', '.join(INGEST_MODES)}")
+            if mode == "sync" and not watermark_column:
+                raise ValueError("sync 模式需要指定 watermark_column")
+            if tombstone_column:
+                if mode != "sync":
+                    raise ValueError("tombstone_column 只能在 sync 模式下使用")
+                _check_identifier(tombstone_column, "删除标记列")
+            batch_size = int(batch_size)
+            if not 1 <= batch_size <= MAX_INGEST_BATCH_SIZE:
+                raise ValueError(f"batch_size 必须在 1 到 {MAX_INGEST_BATCH_SIZE} 之间")
+        except (TypeError, ValueError) as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+
+        # 获取连接配置
+        config = self._get_connection_config(tool_parameters)
+
+        try:
+            # 获取连接
+            conn_manager = LakehouseConnection()
+            connection = conn_manager.get_connection(config)
+
+            with connection.cursor() as cursor:
+                # 获取schema，如果工具参数中没有指定，则使用当前schema
+                schema = tool_parameters.get("schema")
+                if not schema:
+                    schema = self._get_current_schema(cursor)
+                # 验证schema是否存在
+                if not self._validate_schema(cursor, schema):
+                    yield self.create_text_message(f"❌ 数据库模式不存在：{schema}")
+                    yield self.create_json_message({
+                        "success": False,
+                        "error": f"数据库模式不存在：{schema}",
+                        "collection_name": collection_name
+                    })
+                    return
+                if "." not in source:
+                    source = f"{schema}.{source}"
+
+                with timed_phase("sql_build"):
+                    column_list, select_list = self._build_projection(
+                        cursor, schema, collection_name, id_column, content_column, vector_column,
+                        metadata_column, metadata_columns)
+
+                # 同步模式：未显式指定起始水位时，从状态表读取上一次同步到的水位
+                if mode == "sync" and watermark_from in (None, ""):
+                    watermark_from = self._load_sync_state(cursor, schema, collection_name, source)
+
+                # 水位范围：(watermark_from, 本次开始时的最大水位]，之后到达的行留给下一次导入
+                conditions = []
+                next_watermark = watermark_from
+                if watermark_column:
+                    if watermark_from not in (None, ""):
+                        watermark_from, literal = self._typed_watermark(cursor, source, watermark_column, watermark_from)
+                        conditions.append(f"{watermark_column} > {literal}")
+                    with timed_phase("count"):
+                        cursor.execute(f"SELECT MAX({watermark_column}) FROM {source}"
+                                       + (f" WHERE {' AND '.join(conditions)}" if conditions else ""))
+                        row = cursor.fetchone()
+                    high_watermark = row[0] if row else None
+                    if high_watermark is None:
+                        yield self.create_text_message(f"源表 {source} 中没有新的数据")
+                        yield self.create_json_message({
+                            "success": True,
+                            "collection_name": collection_name,
+                            "source_table": source,
+                            "mode": mode,
+                            "inserted_count": 0,
+                            "deleted_count": 0,
+                            "batches": 0,
+                            "next_watermark": watermark_from
+                        })
+                        return
+                    conditions.append(f"{watermark_column} <= {bound_literal(high_watermark)}")
+                    next_watermark = high_watermark
+
+                tombstone_predicate = f"{tombstone_column} = TRUE" if tombstone_column else ""
+                inserted_count, deleted_count, batches = 0, 0, 0
+                for lower, upper in self._key_ranges(cursor, source, id_column, conditions, batch_size):
+                    range_conditions = list(conditions)
+                    if lower is not None:
+                        range_conditions.append(f"{id_column} > {bound_literal(lower)}")
+                    if upper is not None:
+                        range_conditions.append(f"{id_column} <= {bound_literal(upper)}")
+                    where_clause = f" WHERE {' AND '.join(range_conditions)}" if range_conditions else ""
+
+                    # 有上界的批次正好包含 batch_size 个 ID（ID 在源表中唯一），只需统计最后一批
+                    batch_rows = batch_size
+                    if upper is None:
+                        with timed_phase("count"):
+                            cursor.execute(f"SELECT COUNT(*) FROM {source}{where_clause}")
+                            row = cursor.fetchone()
+                        batch_rows = int(row[0]) if row else 0
+                        if batch_rows == 0:
+                            continue
+
+                    insert_where = where_clause
+                    if mode == "sync":
+                        # 先删除集合中本批涉及的旧版本（包括被标记删除的行），再写入新版本
+                        with timed_phase("execute"):
+                            cursor.execute(f"DELETE FROM {schema}.{collection_name} WHERE id IN "
+                                           f"(SELECT {id_column} FROM {source}{where_clause})")
+                        if tombstone_predicate:
+                            with timed_phase("count"):
+                                cursor.execute(f"SELECT COUNT(*) FROM {source}{where_clause} AND {tombstone_predicate}")
+                                row = cursor.fetchone()
+                            tombstones = int(row[0]) if row else 0
+                            deleted_count += tombstones
+                            batch_rows -= tombstones
+                            insert_where += f" AND ({tombstone_column} IS NULL OR NOT {tombstone_predicate})"
+
+                    with timed_phase("execute"):
+                        cursor.execute(f"INSERT INTO {schema}.{collection_name} ({column_list}) "
+                                       f"SELECT {select_list} FROM {source}{insert_where}")
+                    inserted_count += batch_rows
+                    batches += 1
+
+                metrics.inc("rows_inserted_total", inserted_count, tool="vector_ingest_table")
+
+                if isinstance(next_watermark, (datetime, date)):
+                    next_watermark = next_watermark.isoformat(sep=" ") if isinstance(next_watermark, datetime) \
+                        else next_watermark.isoformat()
+
+                # 所有批次成功后才推进水位；中途失败时下次从原水位重新同步，先删后写保证重复处理是幂等的
+                if mode == "sync":
+                    self._save_sync_state(cursor, schema, collection_name, source, watermark_column, next_watermark)
+
+                success_msg = f"成功从 {source} 导入 {inserted_count} 个向量到集合 {collection_name}（{batches} 批）"
+                if deleted_count:
+                    success_msg += f"\n按删除标记移除 {deleted_count} 个向量"
+                if watermark_column:
+                    success_msg += f"\n下次导入的水位：{next_watermark}"
+                yield self.create_text_message(success_msg)
+
+                yield self.create_json_message({
+                    "success": True,
+                    "collection_name": collection_name,
+                    "source_table": source,
+                    "mode": mode,
+                    "inserted_count": inserted_count,
+                    "deleted_count": deleted_count,
+                    "batches": batches,
+                    "next_watermark": next_watermark
+                })
+
+        except Exception as e:
+            error_msg = f"导入向量失败：{str(e)}"
+            yield self.create_text_message(error_msg)
+            yield self.create_json_message({
+                "success": False,
+                "error": str(e),
+                "collection_name": collection_name
+            })
+
+    def _build_projection(self, cursor, schema: str, collection_name: str, id_column: str, content_column: str,
+                          vector_column: str, metadata_column: str, metadata_columns: List[str]):
+        """生成目标列列表和源表的 SELECT 表达式，类型化列从同名的元数据列取值"""
+        if metadata_column:
+            metadata_expr = metadata_column
+        elif metadata_columns:
+            pairs = ", ".join(f"{sql_literal(c)}, {c}" for c in metadata_columns)
+            metadata_expr = f"PARSE_JSON(TO_JSON(NAMED_STRUCT({pairs})))"
+        else:
+            metadata_expr = "JSON '{}'"
+
+        typed_columns = self._get_typed_columns(cursor, schema, collection_name)
+        source_by_name = {c.lower(): c for c in metadata_columns}
+        typed_exprs = [source_by_name.get(column.lower(), "NULL") for column in typed_columns]
+
+        partition_column = self._get_partition_column(cursor, schema, collection_name)
+        if partition_column and partition_column.lower() != "id" and partition_column.lower() not in source_by_name:
+            raise ValueError(f"集合 {collection_name} 按 {partition_column} 分区，metadata_columns 中必须包含该列")
+
+        column_list = ", ".join(["id", "page_content", "metadata", "vector", *typed_columns])
+        select_list = ", ".join([id_column, content_column, metadata_expr, vector_column, *typed_exprs])
+        return column_list, select_list
+
+    def _typed_watermark(self, cursor, source: str, watermark_column: str, watermark_from: Any) -> Tuple[Any, str]:
+        """
+        起始水位按源表中水位列的类型转换，返回 (转换后的水位, SQL 字面量)
+        工具参数和状态表中的水位都是字符串：数字列转为数字，避免 id > '100'；
+        字符串列保持原样，避免 '0012' 被当作 12；列类型查不到时按值本身的类型输出
+        """
+        if not isinstance(watermark_from, str):
+            return watermark_from, bound_literal(watermark_from)
+        with timed_phase("column_lookup"):
+            cursor.execute(f"SHOW COLUMNS IN {source}")
+            rows = cursor.fetchall()
+        data_type = next((str(row[3]) for row in rows
+                          if len(row) >= 4 and str(row[2]).lower() == watermark_column.lower()), None)
+        if not data_type:
+            return watermark_from, bound_literal(watermark_from)
+        base_type = re.match(r"[a-z]*", data_type.lower()).group(0)
+        value: Any = watermark_from.strip()
+        try:
+            if base_type in ("int", "bigint", "tinyint", "smallint"):
+                value = int(value)
+            elif base_type in ("float", "double", "decimal"):
+                value = float(value)
+            return value, typed_column_literal(value, data_type)
+        except ValueError:
+            raise ValueError(f"起始水位 {watermark_from} 与水位列 {watermark_column} 的类型 {data_type} 不匹配")
+
+    def _load_sync_state(self, cursor, schema: str, collection_name: str, source: str) -> Optional[str]:
+        """读取上一次同步到的水位（字符串，由 _typed_watermark 按水位列的类型转换），没有记录时返回 None"""
+        with timed_phase("sync_state"):
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{SYNC_STATE_TABLE} ("
+                           f"collection_name STRING, source_table STRING, watermark_column STRING, "
+                           f"watermark STRING, synced_at TIMESTAMP)")
+            cursor.execute(f"SELECT watermark FROM {schema}.{SYNC_STATE_TABLE} "
+                           f"WHERE collection_name = {sql_literal(collection_name)} "
+                           f"AND source_table = {sql_literal(source)}")
+            row = cursor.fetchone()
+        if not row or row[0] is None:
+            return None
+        return str(row[0])
+
+    def _save_sync_state(self, cursor, schema: str, collection_name: str, source: str,
+                         watermark_column: str, watermark: Any) -> None:
+        """记录本次同步到的水位"""
+        key = f"collection_name = {sql_literal(collection_name)} AND source_table = {sql_literal(source)}"
+        with timed_phase("sync_state"):
+            cursor.execute(f"DELETE FROM {schema}.{SYNC_STATE_TABLE} WHERE {key}")
+            cursor.execute(f"INSERT INTO {schema}.{SYNC_STATE_TABLE} "
+                           f"(collection_name, source_table, watermark_column, watermark, synced_at) VALUES ("
+                           f"{sql_literal(collection_name)}, {sql_literal(source)}, {sql_literal(watermark_column)}, "
+                           f"{sql_literal(str(watermark))}, CURRENT_TIMESTAMP)")
+
+    def _key_ranges(self, cursor, source: str, id_column: str, conditions: List[str], batch_size: int):
+        """
+        按 ID 范围切分批次，依次产出 (下界, 上界)，区间为左开右闭，None 表示不限
+        每批的上界为下界之后第 batch_size 个 ID
+        """
+        lower: Optional[Any] = None
+        while True:
+            range_conditions = list(conditions)
+            if lower is not None:
+                range_conditions.append(f"{id_column} > {bound_literal(lower)}")
+            where_clause = f" WHERE {' AND '.join(range_conditions)}" if range_conditions else ""
+            with timed_phase("count"):
+                cursor.execute(f"SELECT {id_column} FROM {source}{where_clause} "
+                               f"ORDER BY {id_column} LIMIT 1 OFFSET {batch_size - 1}")
+                row = cursor.fetchone()
+            if not row:
+                yield lower, None
+                return
+            yield lower, row[0]
+            lower = row[0]
@@ -1,16 +1,37 @@
-from collections.abc import Generator
-from typing import Any, Dict, List
-import json
+from collections.abc import Generator, Iterable, Iterator
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
 import uuid
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
+from tools import json_codec
 from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import sql_literal, typed_column_literal
+from tools.ndjson_reader import batched, iter_file_lines, iter_ndjson_records
+from tools.plugin_metrics import metrics
+from tools.progress import ProgressReporter
+from tools.retry import DEFAULT_MAX_RETRIES, call_with_retry
+from tools.tool_timing import timed_invoke, timed_phase
+from tools.vector_encoding import format_vector, parse_vectors
 from tools.vector_tool_mixin import VectorToolMixin
 
+# 每条 INSERT 的默认行数和上限
+DEFAULT_INSERT_BATCH_SIZE = 1000
+MAX_INSERT_BATCH_SIZE = 10000
+# 记录已完成批次的检查点表
+CHECKPOINT_TABLE = "vector_ingest_checkpoint"
+
+# 结果消息中列出的自动生成 ID 数量
+GENERATED_ID_PREVIEW = 5
+
+# (id, 内容, 元数据, 向量)
+Row = Tuple[Any, Any, Any, Any]
+
 class VectorInsertTool(Tool, VectorToolMixin):
     """向量插入工具"""
     
+    @timed_invoke("vector_insert")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
@@ -19,11 +40,44 @@ class VectorInsertTool(Tool, VectorToolMixin):
         metadata = tool_parameters.get("metadata", "")
         content = tool_parameters.get("content", "")  # 新增content参数
         auto_id = tool_parameters.get("auto_id", False)
+        vector_encoding = tool_parameters.get("vector_encoding", "json")
+        dimension = tool_parameters.get("dimension")
+        partition_value = tool_parameters.get("partition_value")
+        data_file = tool_parameters.get("data_file")
+        batch_size = tool_parameters.get("batch_size", DEFAULT_INSERT_BATCH_SIZE)
+        ingest_key = (tool_parameters.get("ingest_key") or "").strip()
+        max_retries = tool_parameters.get("max_retries")
         
         if not collection_name:
             yield self.create_text_message("错误：集合名称不能为空")
             return
         
+        try:
+            batch_size = int(batch_size)
+            if not 1 <= batch_size <= MAX_INSERT_BATCH_SIZE:
+                raise ValueError(f"batch_size 必须在 1 到 {MAX_INSERT_BATCH_SIZE} 之间")
+        except (TypeError, ValueError) as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+        
+        try:
+            max_retries = DEFAULT_MAX_RETRIES if max_retries in (None, "") else int(max_retries)
+            if max_retries < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            yield self.create_text_message(f"错误：max_retries 必须是非负整数：{tool_parameters.get('max_retries')}")
+            return
+        
+        if data_file:
+            # 文件输入：逐行解析、分批写入，内存占用与文件大小无关
+            generated_ids: List[str] = []
+            row_batches = batched(self._iter_file_rows(data_file, auto_id, vector_encoding, ingest_key, generated_ids),
+                                  batch_size)
+            yield from self._insert_batches(tool_parameters, collection_name, row_batches, partition_value,
+                                            auto_id, ingest_key, max_retries, from_file=True,
+                                            generated_ids=generated_ids)
+            return
+        
         if not vectors:
             yield self.create_text_message("错误：向量数据不能为空")
             return
@@ -34,18 +88,10 @@ class VectorInsertTool(Tool, VectorToolMixin):
         
         # 解析向量数据
         try:
-            if isinstance(vectors, str):
-                vectors = json.loads(vectors)
-            
-            if not isinstance(vectors, list):
-                vectors = [vectors]
-            
-            # 确保所有向量都是列表格式
-            parsed_vectors = []
-            for v in vectors:
-                if isinstance(v, str):
-                    v = json.loads(v)
-                parsed_vectors.append(v)
+            with timed_phase("parse"):
+                # JSON：支持单个向量、向量数组或元素为 JSON 字符串的数组，每个向量只解析一次
+                # base64_float32：小端 float32 字节，按 dimension 拆分为多个向量
+                parsed_vectors = parse_vectors(vectors, vector_encoding, dimension)
             
             vector_count = len(parsed_vectors)
             
@@ -54,10 +100,11 @@ class VectorInsertTool(Tool, VectorToolMixin):
             return
         
         # 解析 IDs
+        generated_ids = None
         if ids:
             try:
                 if isinstance(ids, str):
-                    ids = json.loads(ids)
+                    ids = json_codec.loads(ids)
                 if not isinstance(ids, list):
                     ids = [ids]
                 if len(ids) != vector_count:
@@ -68,7 +115,8 @@ class VectorInsertTool(Tool, VectorToolMixin):
                 return
         elif auto_id:
             # 自动生成 UUID
-            ids = [str(uuid.uuid4()) for _ in range(vector_count)]
+            ids = [self._generate_id(ingest_key, i) for i in range(vector_count)]
+            generated_ids = ids
         else:
             yield self.create_text_message("错误：必须提供 ID 或启用自动生成 ID")
             return
@@ -78,7 +126,7 @@ class VectorInsertTool(Tool, VectorToolMixin):
         if metadata:
             try:
                 if isinstance(metadata, str):
-                    metadata = json.loads(metadata)
+                    metadata = json_codec.loads(metadata)
                 
                 if isinstance(metadata, dict):
                     # 单个元数据，应用到所有向量
@@ -101,7 +149,7 @@ class VectorInsertTool(Tool, VectorToolMixin):
         # 解析content数据
         try:
             if isinstance(content, str):
-                content_data = json.loads(content)
+                content_data = json_codec.loads(content)
             else:
                 content_data = content
             
@@ -118,8 +166,27 @@ class VectorInsertTool(Tool, VectorToolMixin):
             yield self.create_text_message(f"错误：解析内容数据失败 - {str(e)}")
             return
         
+        rows = list(zip(ids, content_list, metadata_list, parsed_vectors))
+        yield from self._insert_batches(tool_parameters, collection_name, batched(rows, batch_size), partition_value,
+                                        auto_id, ingest_key, max_retries, total_rows=len(rows),
+                                        generated_ids=generated_ids)
+    
+    def _insert_batches(self, tool_parameters: dict[str, Any], collection_name: str, row_batches: Iterable[List[Row]],
+                        partition_value: Any, auto_id: bool, ingest_key: str = "",
+                        max_retries: int = DEFAULT_MAX_RETRIES, from_file: bool = False,
+                        total_rows: Optional[int] = None,
+                        generated_ids: Optional[List[str]] = None) -> Generator[ToolInvokeMessage]:
+        """
+        逐批写入 (id, 内容, 元数据, 向量) 行，每批一条 INSERT 语句
+        提供 ingest_key 时每批有确定的批次 ID，完成的批次记录在检查点表中，重新执行时跳过已完成的批次
+        批次之间产出进度消息（total_rows 已知时附带预计剩余时间）
+        generated_ids 为自动生成的 ID（文件输入时只保留前几个，随读取逐步填充），用于结果消息
+        """
         # 获取连接配置
         config = self._get_connection_config(tool_parameters)
+        inserted_count = 0
+        skipped_batches = 0
+        retries = 0
         
         try:
             # 获取连接
@@ -141,48 +208,223 @@ class VectorInsertTool(Tool, VectorToolMixin):
                     })
                     return
                 
-                # 构建批量插入 SQL (与dify主项目保持一致)
-                values = []
-                for i in range(vector_count):
-                    vector_str = f"VECTOR({','.join(map(str, parsed_vectors[i]))})"
-                    metadata_str = json.dumps(metadata_list[i], ensure_ascii=False).replace("'", "''")  # 转义单引号
-                    content_str = str(content_list[i]).replace("'", "''")  # 转义单引号
-                    
-                    # 根据 ID 类型决定是否加引号
-                    id_value = f"'{ids[i]}'" if isinstance(ids[i], str) else str(ids[i])
-                    
-                    values.append(f"({id_value}, '{content_str}', JSON '{metadata_str}', {vector_str})")
+                # 集合中通过 metadata_fields 创建的类型化列，写入时从同名 metadata 键取值
+                typed_columns = self._get_typed_columns(cursor, schema, collection_name)
+                conversion_failures = 0
+                
+                partition_column = self._get_partition_column(cursor, schema, collection_name)
+                if partition_value not in (None, "") and not partition_column:
+                    raise ValueError(f"集合 {collection_name} 未声明分区列，不能使用 partition_value")
                 
-                insert_sql = f"""
-                INSERT INTO {schema}.{collection_name} (id, page_content, metadata, vector)
-                VALUES {','.join(values)}
-                """
+                completed_batches = set()
+                if ingest_key:
+                    completed_batches = self._load_checkpoints(cursor, schema, ingest_key)
                 
-                cursor.execute(insert_sql)
+                def count_retry(attempt, error):
+                    nonlocal retries
+                    retries += 1
+                
+                progress = ProgressReporter("已处理", "行", total_rows, enabled=tool_parameters.get("progress", True))
+                ids: List[Any] = []
+                batches = 0
+                for batch_index, rows in enumerate(row_batches):
+                    # 文件输入只保留前几个 ID 用于提示，避免结果随文件大小增长
+                    if from_file:
+                        ids.extend(row[0] for row in rows[:max(0, 5 - len(ids))])
+                    else:
+                        ids.extend(row[0] for row in rows)
+                    
+                    batch_id = self._batch_id(schema, collection_name, batch_index, rows) if ingest_key else None
+                    if batch_id in completed_batches:
+                        # 已完成的批次直接跳过，从第一个未完成的批次继续
+                        skipped_batches += 1
+                        progress.advance(len(rows))
+                        continue
+                    rows = self._apply_partition(rows, partition_column, partition_value)
+                    
+                    # 构建批量插入 SQL (与dify主项目保持一致)
+                    with timed_phase("sql_build"):
+                        insert_sql, failures = self._build_insert_sql(schema, collection_name, rows, typed_columns)
+                    conversion_failures += failures
+                    
+                    def write_batch():
+                        with timed_phase("execute"):
+                            if ingest_key:
+                                # 先删除本批 ID，写入成功但检查点未记录时重试也不会产生重复数据
+                                cursor.execute(f"DELETE FROM {schema}.{collection_name} "
+                                               f"WHERE id IN ({', '.join(sql_literal(row[0]) for row in rows)})")
+                            cursor.execute(insert_sql)
+                            if ingest_key:
+                                self._save_checkpoint(cursor, schema, ingest_key, batch_id, len(rows))
+                    
+                    # 只有带检查点的写入是幂等的，才对临时错误自动重试
+                    call_with_retry(write_batch, max_retries if ingest_key else 0, on_retry=count_retry)
+                    metrics.inc("rows_inserted_total", len(rows), tool="vector_insert")
+                    inserted_count += len(rows)
+                    batches += 1
+                    progress_text = progress.advance(len(rows), f"第 {batch_index + 1} 批")
+                    if progress_text:
+                        yield self.create_text_message(progress_text)
                 
                 # 成功消息
-                success_msg = f"成功插入 {vector_count} 个向量到集合 {collection_name}"
-                if auto_id:
-                    success_msg += f"\n生成的 ID: {', '.join(ids[:5])}"
-                    if vector_count > 5:
-                        success_msg += f"... (共 {vector_count} 个)"
+                success_msg = f"成功插入 {inserted_count} 个向量到集合 {collection_name}"
+                if from_file or batches > 1:
+                    success_msg += f"（{batches} 批）"
+                if skipped_batches:
+                    success_msg += f"\n跳过了 {skipped_batches} 个已完成的批次"
+                if retries:
+                    success_msg += f"\n临时错误重试 {retries} 次"
+                if auto_id and generated_ids:
+                    success_msg += f"\n生成的 ID: {', '.join(map(str, generated_ids[:GENERATED_ID_PREVIEW]))}"
+                    if len(generated_ids) > GENERATED_ID_PREVIEW:
+                        # 文件输入只保留了前几个生成的 ID，总数未知
+                        success_msg += "..." if from_file else f"... (共 {len(generated_ids)} 个)"
+                if conversion_failures:
+                    success_msg += f"\n注意：{conversion_failures} 个元数据值无法转换为对应列的类型，已写入 NULL"
                 
                 yield self.create_text_message(success_msg)
                 
-                yield self.create_json_message({
+                result = {
                     "success": True,
                     "collection_name": collection_name,
-                    "inserted_count": vector_count,
-                    "ids": ids,
-                    "auto_id": auto_id
-                })
+                    "inserted_count": inserted_count,
+                    "ids": None if from_file else ids,
+                    "auto_id": auto_id,
+                    "typed_columns": list(typed_columns),
+                    "typed_conversion_failures": conversion_failures,
+                    "partition_column": partition_column
+                }
+                result["batches"] = batches
+                if ingest_key:
+                    result["ingest_key"] = ingest_key
+                    result["skipped_batches"] = skipped_batches
+                result["retries"] = retries
+                yield self.create_json_message(result)
                 
         except Exception as e:
             error_msg = f"插入向量失败：{str(e)}"
+            if inserted_count:
+                error_msg += f"（此前已写入 {inserted_count} 个向量）"
             yield self.create_text_message(error_msg)
             yield self.create_json_message({
                 "success": False,
                 "error": str(e),
-                "collection_name": collection_name
+                "collection_name": collection_name,
+                "inserted_count": inserted_count,
+                "skipped_batches": skipped_batches,
+                "retries": retries,
+                "resumable": bool(ingest_key)
             })
     
+    def _iter_file_rows(self, data_file: Any, auto_id: bool, vector_encoding: str, ingest_key: str = "",
+                        generated_ids: Optional[List[str]] = None) -> Iterator[Row]:
+        """
+        从 NDJSON / JSONL 文件逐行产出 (id, 内容, 元数据, 向量)，每行形如 {"id", "content", "metadata", "vector"}
+        缺少 id 的行自动生成，前 GENERATED_ID_PREVIEW + 1 个生成的 ID 追加到 generated_ids（多一个用于判断是否还有更多）
+        """
+        for line_no, record in iter_ndjson_records(iter_file_lines(data_file)):
+            try:
+                vector = record.get("vector")
+                if vector is None:
+                    raise ValueError("缺少 vector")
+                if isinstance(vector, str):
+                    vector = parse_vectors(vector, vector_encoding)[0]
+                else:
+                    vector = [float(v) for v in vector]
+                content = record.get("content", record.get("page_content"))
+                if content is None:
+                    raise ValueError("缺少 content")
+                metadata = record.get("metadata") or {}
+                if not isinstance(metadata, dict):
+                    raise ValueError("metadata 必须是 JSON 对象")
+                row_id = record.get("id")
+                if row_id is None:
+                    if not auto_id:
+                        raise ValueError("缺少 id，请在每行中提供或启用自动生成 ID")
+                    row_id = self._generate_id(ingest_key, line_no)
+                    if generated_ids is not None and len(generated_ids) <= GENERATED_ID_PREVIEW:
+                        generated_ids.append(row_id)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"第 {line_no} 行：{str(e)}")
+            yield row_id, content, metadata, vector
+    
+    def _generate_id(self, ingest_key: str, position: int) -> str:
+        """自动生成 ID：有 ingest_key 时由批次任务和行号确定，重新执行生成相同的 ID"""
+        if ingest_key:
+            return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{ingest_key}/{position}"))
+        return str(uuid.uuid4())
+    
+    def _batch_id(self, schema: str, collection_name: str, batch_index: int, rows: List[Row]) -> str:
+        """由集合、批次序号和批内 ID 确定的批次 ID"""
+        digest = hashlib.sha1(f"{schema}.{collection_name}/{batch_index}".encode("utf-8"))
+        for row in rows:
+            digest.update(b"\0" + str(row[0]).encode("utf-8"))
+        return digest.hexdigest()[:20]
+    
+    def _load_checkpoints(self, cursor, schema: str, ingest_key: str) -> set:
+        """读取 ingest_key 下已完成的批次 ID"""
+        with timed_phase("checkpoint"):
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{CHECKPOINT_TABLE} ("
+                           f"ingest_key STRING, batch_id STRING, row_count INT, completed_at TIMESTAMP)")
+            cursor.execute(f"SELECT batch_id FROM {schema}.{CHECKPOINT_TABLE} "
+                           f"WHERE ingest_key = {sql_literal(ingest_key)}")
+            return {row[0] for row in cursor.fetchall()}
+    
+    def _save_checkpoint(self, cursor, schema: str, ingest_key: str, batch_id: str, row_count: int) -> None:
+        """记录完成的批次"""
+        cursor.execute(f"INSERT INTO {schema}.{CHECKPOINT_TABLE} (ingest_key, batch_id, row_count, completed_at) "
+                       f"VALUES ({sql_literal(ingest_key)}, {sql_literal(batch_id)}, {row_count}, CURRENT_TIMESTAMP)")
+    
+    def _apply_partition(self, rows: List[Row], partition_column: Optional[str], partition_value: Any) -> List[Row]:
+        """
+        分区集合：partition_value 写入每行 metadata 的分区键，再由类型化列落到对应分区
+        有记录缺少分区值时在执行前报错
+        """
+        if partition_value not in (None, ""):
+            rows = [(row_id, content, {**(m if isinstance(m, dict) else {}), partition_column: partition_value}, vector)
+                    for row_id, content, m, vector in rows]
+        if partition_column and partition_column.lower() != "id":
+            missing = sum(
+                1 for _, _, m, _ in rows
+                if not isinstance(m, dict)
+                or all(v is None for k, v in m.items() if str(k).lower() == partition_column.lower())
+            )
+            if missing:
+                raise ValueError(f"{missing} 条记录缺少分区列 {partition_column} 的值，"
+                                 f"请在 metadata 中提供或使用 partition_value 参数")
+        return rows
+    
+    def _build_insert_sql(self, schema: str, collection_name: str, rows: List[Row],
+                          typed_columns: Dict[str, str]) -> Tuple[str, int]:
+        """生成一批行的 INSERT 语句，返回 (SQL, 无法转换为类型化列的值的数量)"""
+        conversion_failures = 0
+        values = []
+        for row_id, content, metadata, vector in rows:
+            vector_str = format_vector(vector)
+            metadata_str = json_codec.dumps(metadata).replace("'", "''")  # 转义单引号
+            content_str = str(content).replace("'", "''")  # 转义单引号
+            
+            # 根据 ID 类型决定是否加引号
+            id_value = f"'{row_id}'" if isinstance(row_id, str) else str(row_id)
+            
+            row = f"{id_value}, '{content_str}', JSON '{metadata_str}', {vector_str}"
+            if typed_columns:
+                # 键名匹配不区分大小写；缺失或类型不符时写入 NULL，原值仍保留在 metadata 中
+                row_metadata = metadata if isinstance(metadata, dict) else {}
+                row_metadata = {str(k).lower(): v for k, v in row_metadata.items()}
+                typed_values = []
+                for column, data_type in typed_columns.items():
+                    try:
+                        typed_values.append(typed_column_literal(row_metadata.get(column.lower()), data_type))
+                    except (TypeError, ValueError):
+                        conversion_failures += 1
+                        typed_values.append("NULL")
+                row += ", " + ", ".join(typed_values)
+            values.append(f"({row})")
+        
+        column_list = ", ".join(["id", "page_content", "metadata", "vector", *typed_columns])
+        insert_sql = f"""
+        INSERT INTO {schema}.{collection_name} ({column_list})
+        VALUES {','.join(values)}
+        """
+        return insert_sql, conversion_failures
@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+from tools.json_codec import loads_float_array
+
+# 精确重排或 MMR 时每个最终结果默认多取的候选倍数
+DEFAULT_RERANK_FACTOR = 4
+# 候选倍数上限，避免一次拉取过多向量
+MAX_RERANK_FACTOR = 50
+# MMR 中相关性所占的权重，1 表示只看相关性，0 表示只看多样性
+DEFAULT_MMR_LAMBDA = 0.5
+
+
+def parse_vector(value: Any) -> List[float]:
+    """将 Lakehouse 返回的向量列（"[0.1,0.2]" 字符串或数组）解析为浮点数列表"""
+    return loads_float_array(value)
+
+
+def exact_distances(query_vector: Sequence[float], candidate_vectors: Sequence[Sequence[float]], metric: str):
+    """
+    用 NumPy 批量计算查询向量到候选向量的精确距离，与 SQL 中的距离函数定义一致：
+    cosine 为 1 - 余弦相似度，l2 为欧氏距离
+    """
+    import numpy as np
+
+    query = np.asarray(query_vector, dtype=np.float64)
+    candidates = np.asarray(candidate_vectors, dtype=np.float64)
+    if candidates.ndim != 2 or candidates.shape[1] != query.shape[0]:
+        raise ValueError(f"向量维度不一致：查询向量 {query.shape[0]} 维，候选向量形状 {candidates.shape}")
+
+    if metric == "l2":
+        return np.linalg.norm(candidates - query, axis=1)
+    if metric == "cosine":
+        norms = np.linalg.norm(candidates, axis=1) * np.linalg.norm(query)
+        similarity = np.divide(candidates @ query, norms, out=np.zeros(len(candidates)), where=norms > 0)
+        return 1.0 - similarity
+    raise ValueError(f"不支持的距离度量：{metric}。支持的选项：l2, cosine")
+
+
+def _normalize_rows(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def mmr_select(query_vector: Sequence[float], candidates: List[Dict[str, Any]], top_k: int,
+               lambda_mult: float = DEFAULT_MMR_LAMBDA) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    最大边际相关性（MMR）选择：每一步选取 lambda * 与查询的相似度 - (1 - lambda) * 与已选结果的最大相似度
+    最高的候选，相似度均为余弦相似度。
+    返回 (按选择顺序排列的结果, 因冗余被挤出的候选数)，后者为按相关性本应进入前 top_k、但未被选中的候选数量
+    """
+    import numpy as np
+
+    if not candidates:
+        return [], 0
+    top_k = min(top_k, len(candidates))
+    vectors = _normalize_rows(np.asarray([c["vector"] for c in candidates], dtype=np.float64))
+    query = _normalize_rows(np.asarray(query_vector, dtype=np.float64))
+    if vectors.shape[1] != query.shape[0]:
+        raise ValueError(f"向量维度不一致：查询向量 {query.shape[0]} 维，候选向量形状 {vectors.shape}")
+
+    relevance = vectors @ query
+    pairwise = vectors @ vectors.T
+    max_similarity = np.full(len(candidates), -np.inf)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+
+    for _ in range(top_k):
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        chosen = int(scores.argmax())
+        selected.append(chosen)
+        available[chosen] = False
+        max_similarity = np.maximum(max_similarity, pairwise[chosen])
+
+    most_relevant = set(np.argsort(-relevance, kind="stable")[:top_k].tolist())
+    dropped = len(most_relevant - set(selected))
+    return [candidates[i] for i in selected], dropped
+
+
+def rerank_exact(query_vector: Sequence[float], candidates: List[Dict[str, Any]], metric: str,
+                 top_k: int) -> List[Dict[str, Any]]:
+    """按精确距离对候选结果重新排序，返回前 top_k 个，并用精确值覆盖 distance 字段"""
+    if not candidates:
+        return []
+    distances = exact_distances(query_vector, [c["vector"] for c in candidates], metric)
+    order = distances.argsort(kind="stable")[:top_k]
+    reranked = []
+    for index in order:
+        candidate = candidates[index]
+        candidate["distance"] = float(distances[index])
+        reranked.append(candidate)
+    return reranked
@@ -1,16 +1,26 @@
 from collections.abc import Generator
 from typing import Any, Dict, List, Optional
-import json
-import pandas as pd
+import functools
+import re
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
+from tools import json_codec
+from tools.concurrent_execution import run_concurrently
 from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import FilterError, parse_filter, parse_partition_values
+from tools.plugin_metrics import metrics
+from tools.tool_timing import timed_invoke, timed_phase
+from tools.vector_rerank import (
+    DEFAULT_MMR_LAMBDA, DEFAULT_RERANK_FACTOR, MAX_RERANK_FACTOR, mmr_select, parse_vector, rerank_exact
+)
+from tools.vector_encoding import format_vector, parse_vectors
 from tools.vector_tool_mixin import VectorToolMixin
 
 class VectorSearchTool(Tool, VectorToolMixin):
     """向量相似度搜索工具"""
     
+    @timed_invoke("vector_search")
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         # 获取参数
         collection_name = tool_parameters.get("collection_name", "").strip()
@@ -18,7 +28,20 @@ class VectorSearchTool(Tool, VectorToolMixin):
         top_k = tool_parameters.get("top_k", 10)
         metric_type = tool_parameters.get("metric_type", "cosine").lower()
         filter_expr = tool_parameters.get("filter_expr", "")
+        metadata_filter = tool_parameters.get("metadata_filter", "")
+        partition_values = tool_parameters.get("partition_values", "")
         output_fields = tool_parameters.get("output_fields", "")
+        return_fields = tool_parameters.get("return_fields", "")
+        parse_metadata = tool_parameters.get("parse_metadata", True)
+        rerank = tool_parameters.get("rerank", False)
+        rerank_factor = tool_parameters.get("rerank_factor", DEFAULT_RERANK_FACTOR)
+        include_vectors = tool_parameters.get("include_vectors", False)
+        vector_encoding = tool_parameters.get("vector_encoding", "json")
+        dimension = tool_parameters.get("dimension")
+        mmr = tool_parameters.get("mmr", False)
+        mmr_lambda = tool_parameters.get("mmr_lambda", DEFAULT_MMR_LAMBDA)
+        max_distance = tool_parameters.get("max_distance")
+        min_similarity = tool_parameters.get("min_similarity")
         
         if not collection_name:
             yield self.create_text_message("错误：集合名称不能为空")
@@ -30,12 +53,9 @@ class VectorSearchTool(Tool, VectorToolMixin):
         
         # 解析查询向量
         try:
-            if isinstance(query_vectors, str):
-                query_vectors = json.loads(query_vectors)
-            
-            # 支持单个向量或多个向量
-            if not isinstance(query_vectors[0], list):
-                query_vectors = [query_vectors]
+            with timed_phase("parse"):
+                # 支持单个向量或多个向量，base64_float32 编码时按 dimension 拆分
+                query_vectors = parse_vectors(query_vectors, vector_encoding, dimension)
             
             query_count = len(query_vectors)
             
@@ -43,11 +63,63 @@ class VectorSearchTool(Tool, VectorToolMixin):
             yield self.create_text_message(f"错误：解析查询向量失败 - {str(e)}")
             return
         
-        # 确定返回的字段 (与dify主项目保持一致)
-        if output_fields:
-            select_fields = f"id, page_content, {output_fields}, metadata"
+        try:
+            filter_spec = parse_filter(metadata_filter)
+            partition_values = parse_partition_values(partition_values)
+        except FilterError as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+        
+        # 距离阈值在 SQL 中过滤，超出阈值的行不会返回
+        try:
+            distance_threshold = self._resolve_distance_threshold(metric_type, max_distance, min_similarity)
+        except ValueError as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+        
+        if mmr:
+            try:
+                mmr_lambda = float(mmr_lambda)
+            except (TypeError, ValueError):
+                mmr_lambda = -1
+            if not 0 <= mmr_lambda <= 1:
+                yield self.create_text_message("错误：mmr_lambda 必须在 0 到 1 之间")
+                return
+        
+        try:
+            top_k = int(top_k)
+            if top_k < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            yield self.create_text_message(f"错误：top_k 必须是正整数：{tool_parameters.get('top_k')}")
+            return
+        
+        # 精确重排 / MMR：多取 top_k * rerank_factor 个候选，在本地重新排序或做多样化选择
+        over_fetch = rerank or mmr
+        if over_fetch:
+            try:
+                rerank_factor = int(rerank_factor)
+                if rerank_factor < 1:
+                    raise ValueError
+            except (TypeError, ValueError):
+                yield self.create_text_message(f"错误：rerank_factor 必须是正整数：{tool_parameters.get('rerank_factor')}")
+                return
+            rerank_factor = min(rerank_factor, MAX_RERANK_FACTOR)
+            fetch_k = int(top_k) * rerank_factor
         else:
-            select_fields = "id, page_content, metadata"
+            fetch_k = top_k
+        
+        # 确定返回的字段 (与dify主项目保持一致)，未请求的列不从 Lakehouse 拉取
+        try:
+            selected_columns = self._resolve_return_fields(return_fields)
+        except ValueError as e:
+            yield self.create_text_message(f"错误：{str(e)}")
+            return
+        if output_fields:
+            selected_columns.insert(min(2, len(selected_columns)), output_fields)
+        if over_fetch or include_vectors:
+            selected_columns.append("vector")
+        select_fields = ", ".join(selected_columns)
         
         # 获取连接配置
         config = self._get_connection_config(tool_parameters)
@@ -55,9 +127,7 @@ class VectorSearchTool(Tool, VectorToolMixin):
         try:
             # 获取连接
             conn_manager = LakehouseConnection()
-            connection = conn_manager.get_connection(config)
-            
-            all_results = []
+            connection = conn_manager.get_connection(config, read_only=True)
             
             with connection.cursor() as cursor:
                 # 获取schema，如果工具参数中没有指定，则使用当前schema
@@ -74,62 +144,121 @@ class VectorSearchTool(Tool, VectorToolMixin):
                     })
                     return
                 
-                for idx, query_vector in enumerate(query_vectors):
-                    # 构建向量搜索查询 (与dify主项目保持一致)
-                    vector_str = f"VECTOR({','.join(map(str, query_vector))})"
-                    distance_func = self._get_distance_function(metric_type)
-                    
-                    # 基础查询
-                    query = f"""
-                    SELECT {select_fields},
-                           {distance_func}(vector, {vector_str}) AS distance
-                    FROM {schema}.{collection_name}
-                    """
-                    
-                    # 添加过滤条件
-                    if filter_expr:
-                        # 处理元数据字段的过滤
-                        # 例如：metadata['category'] = 'electronics'
-                        query += f" WHERE {filter_expr}"
-                    
-                    # 添加排序和限制
-                    query += f"""
-                    ORDER BY distance
-                    LIMIT {top_k}
-                    """
+                # 结构化过滤条件只编译一次，所有查询向量共用
+                compiled_filter = ""
+                if filter_spec is not None:
+                    compiled_filter = self._compile_metadata_filter(cursor, schema, collection_name, filter_spec)
+                # 限定分区：只扫描指定租户 / 数据集所在的分区
+                partition_predicate = ""
+                if partition_values:
+                    partition_predicate = self._partition_predicate(cursor, schema, collection_name, partition_values)
+            
+            def search_one(idx: int, query_vector: Any) -> Dict[str, Any]:
+                # 每个查询向量使用独立的游标，多个查询并发执行
+                with connection.cursor() as cursor:
+                    with timed_phase("sql_build"):
+                        # 构建向量搜索查询 (与dify主项目保持一致)
+                        vector_str = format_vector(query_vector)
+                        distance_func = self._get_distance_function(metric_type)
+                        
+                        distance_expr = f"{distance_func}(vector, {vector_str})"
+                        
+                        # 基础查询
+                        query = f"""
+                        SELECT {select_fields},
+                               {distance_expr} AS distance
+                        FROM {schema}.{collection_name}
+                        """
+                        
+                        # 添加过滤条件
+                        conditions = []
+                        if partition_predicate:
+                            conditions.append(partition_predicate)
+                        if filter_expr:
+                            # 处理元数据字段的过滤
+                            # 例如：metadata['category'] = 'electronics'
+                            conditions.append(f"({filter_expr})")
+                        if compiled_filter:
+                            conditions.append(compiled_filter)
+                        if distance_threshold is not None:
+                            # WHERE 中不能引用 SELECT 的别名，直接使用距离表达式
+                            conditions.append(f"{distance_expr} <= {distance_threshold!r}")
+                        if conditions:
+                            query += f" WHERE {' AND '.join(conditions)}"
+                        
+                        # 添加排序和限制
+                        query += f"""
+                        ORDER BY distance
+                        LIMIT {fetch_k}
+                        """
                     
-                    cursor.execute(query)
+                    with timed_phase("execute"):
+                        cursor.execute(query)
                     
                     # 获取结果
-                    columns = [desc[0] for desc in cursor.description]
-                    rows = cursor.fetchall()
+                    with timed_phase("fetch"):
+                        columns = [desc[0] for desc in cursor.description]
+                        rows = cursor.fetchall()
                     
                     # 转换结果
-                    query_results = []
-                    for row in rows:
-                        result = {}
-                        for i, col in enumerate(columns):
-                            if col == 'metadata' and row[i]:
-                                # 解析 JSON 元数据
-                                try:
-                                    result[col] = json.loads(row[i]) if isinstance(row[i], str) else row[i]
-                                except:
+                    with timed_phase("convert"):
+                        query_results = []
+                        for row in rows:
+                            result = {}
+                            for i, col in enumerate(columns):
+                                if col == 'vector' and row[i] is not None:
+                                    result[col] = parse_vector(row[i])
+                                else:
                                     result[col] = row[i]
-                            else:
-                                result[col] = row[i]
-                        query_results.append(result)
+                            query_results.append(result)
+                    
+                    candidate_count = len(query_results)
+                    redundant_dropped = 0
+                    if rerank:
+                        with timed_phase("rerank"):
+                            # 开启 MMR 时保留全部候选，只更新为精确距离
+                            keep = candidate_count if mmr else int(top_k)
+                            query_results = rerank_exact(query_vector, query_results, metric_type, keep)
+                    if mmr:
+                        with timed_phase("mmr"):
+                            query_results, redundant_dropped = mmr_select(query_vector, query_results,
+                                                                          int(top_k), mmr_lambda)
+                    with timed_phase("convert"):
+                        for result in query_results:
+                            if not include_vectors:
+                                result.pop("vector", None)
+                            # 元数据只对最终返回的结果解析，多取的候选不解析
+                            if parse_metadata and isinstance(result.get("metadata"), str):
+                                try:
+                                    result["metadata"] = json_codec.loads(result["metadata"])
+                                except ValueError:
+                                    pass
                     
-                    all_results.append({
+                    query_result = {
                         "query_index": idx,
                         "results": query_results
-                    })
+                    }
+                    if over_fetch:
+                        query_result["candidate_count"] = candidate_count
+                    if mmr:
+                        query_result["redundant_dropped"] = redundant_dropped
+                return query_result
+            
+            all_results = run_concurrently(
+                [functools.partial(search_one, idx, query_vector) for idx, query_vector in enumerate(query_vectors)]
+            )
             
             # 生成结果
             total_results = sum(len(r["results"]) for r in all_results)
+            metrics.inc("rows_returned_total", total_results, tool="vector_search")
             
             # 文本预览
             preview_text = f"搜索完成，共执行 {query_count} 个查询\n"
-            preview_text += f"总共找到 {total_results} 个结果\n\n"
+            preview_text += f"总共找到 {total_results} 个结果\n"
+            if mmr:
+                dropped_total = sum(r["redundant_dropped"] for r in all_results)
+                preview_text += f"MMR 多样化（lambda={mmr_lambda}）剔除了 {dropped_total} 个冗余候选\n"
+            preview_text += "\n"
             
             for query_result in all_results[:2]:  # 只显示前两个查询的结果
                 idx = query_result["query_index"]
@@ -139,7 +268,8 @@ class VectorSearchTool(Tool, VectorToolMixin):
                 for i, res in enumerate(results[:3]):
                     preview_text += f"  {i+1}. ID: {res['id']}, 距离: {res['distance']:.4f}\n"
                     if 'metadata' in res and res['metadata']:
-                        preview_text += f"     元数据: {json.dumps(res['metadata'], ensure_ascii=False)}\n"
+                        metadata_text = res['metadata'] if isinstance(res['metadata'], str) else json_codec.dumps(res['metadata'])
+                        preview_text += f"     元数据: {metadata_text}\n"
                 preview_text += "\n"
             
             if query_count > 2:
@@ -154,6 +284,13 @@ class VectorSearchTool(Tool, VectorToolMixin):
                 "top_k": top_k,
                 "metric_type": metric_type,
                 "total_results": total_results,
+                "rerank": bool(rerank),
+                "distance_threshold": distance_threshold,
+                "partition_values": partition_values or None,
+                "return_fields": [c for c in selected_columns if c != "vector"],
+                "mmr": bool(mmr),
+                "mmr_lambda": mmr_lambda if mmr else None,
+                "rerank_factor": rerank_factor if over_fetch else None,
                 "results": all_results
             })
             
@@ -166,6 +303,51 @@ class VectorSearchTool(Tool, VectorToolMixin):
                 "collection_name": collection_name
             })
     
+    def _resolve_return_fields(self, return_fields: Any) -> List[str]:
+        """
+        解析要返回的字段，id 和 distance 总是返回
+        空值返回 page_content 和 metadata；"id" 表示只返回 id 和距离
+        """
+        if return_fields is None or str(return_fields).strip() == "":
+            return ["id", "page_content", "metadata"]
+        fields = [f.strip() for f in str(return_fields).split(",") if f.strip()]
+        columns = ["id"]
+        for field in fields:
+            if field.lower() in ("id", "distance"):
+                continue
+            if field.lower() == "vector":
+                raise ValueError("返回向量请使用 include_vectors 参数")
+            if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", field):
+                raise ValueError(f"无效的字段名：{field}")
+            if field not in columns:
+                columns.append(field)
+        return columns
+    
+    def _resolve_distance_threshold(self, metric: str, max_distance: Any, min_similarity: Any) -> Optional[float]:
+        """
+        将 max_distance / min_similarity 统一换算为距离上限
+        min_similarity 只适用于余弦距离（相似度 = 1 - 距离）；同时指定时取更严格的一个
+        """
+        thresholds = []
+        if max_distance is not None and max_distance != "":
+            try:
+                thresholds.append(float(max_distance))
+            except (TypeError, ValueError):
+                raise ValueError(f"max_distance 必须是数字：{max_distance}")
+        if min_similarity is not None and min_similarity != "":
+            if metric != "cosine":
+                raise ValueError("min_similarity 只适用于 cosine 距离度量，l2 请使用 max_distance")
+            try:
+                thresholds.append(1.0 - float(min_similarity))
+            except (TypeError, ValueError):
+                raise ValueError(f"min_similarity 必须是数字：{min_similarity}")
+        if not thresholds:
+            return None
+        threshold = min(thresholds)
+        if threshold != threshold or threshold in (float("inf"), float("-inf")):
+            raise ValueError("距离阈值必须是有限数字")
+        return threshold
+    
     def _get_distance_function(self, metric: str) -> str:
         """获取距离计算函数"""
         if metric == "l2":
@@ -1,14 +1,25 @@
-from typing import Any, Dict
+import re
+from typing import Any, Dict, List, Optional
+
+from tools.lakehouse_connection import LakehouseConnection
+from tools.metadata_filter import compile_filter, typed_columns_from_show_columns
+from tools.tool_timing import timed_phase
 
 class VectorToolMixin:
     """向量工具混入类，提供通用的验证方法"""
     
     def _get_current_schema(self, cursor) -> str:
         """获取当前schema"""
+        cached_schema = LakehouseConnection().get_metadata("current_schema")
+        if cached_schema:
+            return cached_schema
+        
         try:
-            cursor.execute("select current_schema()")
-            result = cursor.fetchone()
+            with timed_phase("schema_lookup"):
+                cursor.execute("select current_schema()")
+                result = cursor.fetchone()
             current_schema = result[0] if result and result[0] else "dify"
+            LakehouseConnection().set_metadata("current_schema", current_schema)
             return current_schema
         except Exception as e:
             # 如果获取失败，使用默认值
@@ -16,13 +27,20 @@ class VectorToolMixin:
     
     def _validate_schema(self, cursor, schema_name: str) -> bool:
         """验证数据库模式是否存在"""
+        # 只缓存验证通过的结果，不存在的schema每次都重新检查
+        cache_key = f"schema_exists:{schema_name}"
+        if LakehouseConnection().get_metadata(cache_key):
+            return True
+        
         try:
             # 执行desc schema命令
             desc_sql = f"desc schema {schema_name}"
-            cursor.execute(desc_sql)
-            
-            # 如果没有异常，说明schema存在
-            results = cursor.fetchall()
+            with timed_phase("schema_validation"):
+                cursor.execute(desc_sql)
+                
+                # 如果没有异常，说明schema存在
+                results = cursor.fetchall()
+            LakehouseConnection().set_metadata(cache_key, True)
             return True
             
         except Exception as e:
@@ -34,6 +52,50 @@ class VectorToolMixin:
                 # 其他错误，重新抛出
                 raise e
     
+    def _get_typed_columns(self, cursor, schema: str, collection_name: str) -> Dict[str, str]:
+        """获取集合中通过 metadata_fields 创建的类型化列（列名 -> 类型）"""
+        cache_key = f"columns:{schema}.{collection_name}"
+        cached_columns = LakehouseConnection().get_metadata(cache_key)
+        if cached_columns is not None:
+            return cached_columns
+        
+        with timed_phase("column_lookup"):
+            cursor.execute(f"SHOW COLUMNS IN {schema}.{collection_name}")
+            columns = typed_columns_from_show_columns(cursor.fetchall())
+        LakehouseConnection().set_metadata(cache_key, columns)
+        return columns
+    
+    def _compile_metadata_filter(self, cursor, schema: str, collection_name: str, spec: Dict[str, Any]) -> str:
+        """将结构化过滤条件编译为 WHERE 谓词，字段优先匹配集合的类型化列"""
+        compiled = compile_filter(spec, self._get_typed_columns(cursor, schema, collection_name))
+        return compiled.render()
+    
+    def _get_partition_column(self, cursor, schema: str, collection_name: str) -> Optional[str]:
+        """获取集合的分区列（从 SHOW CREATE TABLE 的 PARTITIONED BY 子句解析），未分区时返回 None"""
+        cache_key = f"partition:{schema}.{collection_name}"
+        cached_column = LakehouseConnection().get_metadata(cache_key)
+        if cached_column is not None:
+            return cached_column or None
+        
+        with timed_phase("column_lookup"):
+            cursor.execute(f"SHOW CREATE TABLE {schema}.{collection_name}")
+            row = cursor.fetchone()
+        match = re.search(r"PARTITIONED\s+BY\s*\(\s*`?(\w+)`?", str(row[0]) if row else "", re.IGNORECASE)
+        partition_column = match.group(1) if match else ""
+        # 未分区的集合缓存为空字符串，避免每次都重新查询
+        LakehouseConnection().set_metadata(cache_key, partition_column)
+        return partition_column or None
+    
+    def _partition_predicate(self, cursor, schema: str, collection_name: str, partition_values: List[Any]) -> str:
+        """生成限定分区的谓词，集合未分区时抛出 ValueError"""
+        partition_column = self._get_partition_column(cursor, schema, collection_name)
+        if not partition_column:
+            raise ValueError(f"集合 {collection_name} 未声明分区列，不能使用 partition_values")
+        typed_columns = self._get_typed_columns(cursor, schema, collection_name)
+        compiled = compile_filter({"field": partition_column, "op": "in", "value": partition_values},
+                                  {**typed_columns, partition_column: typed_columns.get(partition_column, "string")})
+        return compiled.render()
+    
     def _get_connection_config(self, tool_parameters: dict[str, Any]) -> Dict[str, Any]:
         """从工具参数中提取连接配置"""
         # 优先使用工具参数，如果没有则使用提供商凭据